@@ -5,11 +5,18 @@ import tempfile
 
 from pathlib import PurePath, Path
 
-from PyQt5.QtCore import *
-from PyQt5.QtGui import *
-from PyQt5.QtWidgets import *
+from PyQt5.QtCore import QDir, QMetaObject, QSize, Qt, QThreadPool, QUrl, pyqtSlot
+from PyQt5.QtGui import QDesktopServices
+from PyQt5.QtWidgets import (QApplication, QCheckBox, QFileDialog, QGridLayout, QLabel, QLineEdit, QMainWindow,
+	QMessageBox, QPushButton, QSizePolicy, QSpacerItem, QVBoxLayout, QWidget)
 
+# Feature modules are imported where they are used, the window opens without them
 from lib.MaxZipFile import MaxFileZip
+from lib.AssetCache import AssetCache
+from lib.BlobCache import BlobCache
+from lib.CompressionPolicy import CompressionPolicy
+from lib.TransferStats import combineStats
+from lib.JobScheduler import JobScheduler, volumeOf
 from lib.DarkPalette import QtDarkPalette
 from lib.AppIcons import AppIcons
 from lib.Threading import Worker
@@ -24,7 +31,7 @@ APPICONS = AppIcons()
 
 class MainWindow(QMainWindow):
 	
-	def __init__(self, droppedFiles: set, zipFileDir: str):
+	def __init__(self, droppedFiles: set, zipFileDir: str, assetCache: AssetCache=None, blobCache: BlobCache=None, parser: 'ProcessParser'=None):
 		super().__init__()
 		self.left = 150
 		self.top = 150
@@ -33,13 +40,25 @@ class MainWindow(QMainWindow):
 		self.fileTable = None
 		self.droppedFiles = droppedFiles
 		self.zipFileDir = zipFileDir
+		self.assetCache = assetCache
+		self.blobCache = blobCache
+		self.parser = parser
 		self.threadpool = QThreadPool().globalInstance()
 		self.threadpoolQLength = 0
-		self.threadpool.setMaxThreadCount(2)
+		# Archive jobs of the current run, see [Scheduler] in the ini file
+		self.scheduler = None
+		# Phase timings of the current run when traceFile is set
+		self.tracer = None
+		# Finds missing assets under the [Relocation] search roots, one index per run
+		self.relocator = None
+		# (rows, ArchivePlan) of the last plan, its sizes order the jobs of the same rows
+		self.lastPlan = None
 
 		self.archiveDir = False
 		self.singleCheck = False
 		self.singleFile = False
+		# row -> latest TransferStats of the running archive jobs
+		self.rowStats = {}
 
 		self.diskIcon = APPICONS.qIconFromBase64(APPICONS.diskIconB)		
 		self.folderIcon = APPICONS.qIconFromBase64(APPICONS.folderIconB)
@@ -62,7 +81,7 @@ class MainWindow(QMainWindow):
 		self.table_gl.setSpacing(6)
 		self.table_gl.setObjectName('table_gl')
 
-		self.fileTable = FileTable(0, 4, self)
+		self.fileTable = FileTable(self)
 		self.fileTable.setObjectName('table')
 		self.fileTable.addFilesToView(self.droppedFiles)
 		
@@ -130,12 +149,18 @@ class MainWindow(QMainWindow):
 		self.singleZipFile_txt.setMinimumSize(QSize(0, 22))
 		self.singleZipFile_txt.setObjectName('singleZipFile_txt')
 
+		self.updateZip_chb = QCheckBox('Update Existing Archives', self.centralwidget)
+		self.updateZip_chb.setCheckState(False)
+		self.updateZip_chb.setToolTip('Copy unchanged files from an existing archive instead of compressing them again')
+		self.updateZip_chb.setObjectName('updateZip_chb')
+
 
 		self.processDir_gl.addWidget(self.zipFileDir_lbl, 0, 0, 1, 1)
 		self.processDir_gl.addWidget(self.zipFileDir_txt, 0, 1, 1, 1)
 		self.processDir_gl.addWidget(self.zipFileDir_btn, 0, 2, 1, 1)
 		self.processDir_gl.addWidget(self.singleZipFile_chb, 1, 0, 1, 1)
 		self.processDir_gl.addWidget(self.singleZipFile_txt, 1, 1, 1, 2)
+		self.processDir_gl.addWidget(self.updateZip_chb, 2, 0, 1, 1)
 		self.processDir_gl.setColumnStretch(1, 1)
 
 		#PROCESS BUTTON AREA
@@ -157,6 +182,12 @@ class MainWindow(QMainWindow):
 		self.list_assets_btn.setMaximumSize(QSize(16777215, 40))
 		self.list_assets_btn.setObjectName('list_assets_btn')
 
+		self.plan_btn = QPushButton(self.centralwidget)
+		self.plan_btn.setText('Plan Archive')
+		self.plan_btn.setMinimumSize(QSize(80, 40))
+		self.plan_btn.setMaximumSize(QSize(16777215, 40))
+		self.plan_btn.setObjectName('plan_btn')
+
 		
 		if Path(self.zipFileDir.strip()).is_dir() == False or (self.zipFileDir) == '':
 			self.process_btn.setEnabled(False)
@@ -167,6 +198,7 @@ class MainWindow(QMainWindow):
 
 		self.process_gl.addWidget(self.process_btn, 1, 1, 1, 1)
 		self.process_gl.addWidget(self.list_assets_btn, 2, 1, 1, 1)
+		self.process_gl.addWidget(self.plan_btn, 3, 1, 1, 1)
 		self.process_gl.setColumnStretch(1, 1)
 			
 		self.verticalLayout.addLayout(self.gridLayoutAddMore)
@@ -175,6 +207,12 @@ class MainWindow(QMainWindow):
 		self.verticalLayout.addLayout(self.process_gl)
 
 		MainWindow.setCentralWidget(self.centralwidget)
+		
+		# Overall bytes, MB/s and ETA of the running jobs
+		self.throughput_lbl = QLabel('', self)
+		self.throughput_lbl.setObjectName('throughput_lbl')
+		self.statusBar().addPermanentWidget(self.throughput_lbl)
+		
 		QMetaObject.connectSlotsByName(self)
 		
 		# Enable dragging and dropping onto the GUI
@@ -195,13 +233,133 @@ class MainWindow(QMainWindow):
 		with open(configFileName, 'w') as configfile:
 			config.write(configfile)
 
+	def readFromConfig(self, setting, key, fallback):
+		try:
+			value = config[setting][key]
+		except:
+			return fallback
+		
+		if isinstance(fallback, bool):
+			return value.strip().lower() in ('1', 'true', 'yes', 'on')
+		if isinstance(fallback, int):
+			return int(value)
+		if isinstance(fallback, float):
+			return float(value)
+		return value
+
+	def newMaxFileZip(self, data, zipFileDir, outPutZipFile):
+		# All archive options come from the ini file
+		statWorkers = self.readFromConfig('ArchiveMaxSettings', 'statWorkers', 8)
+		compressionWorkers = self.readFromConfig('ArchiveMaxSettings', 'compressionWorkers', 0)
+		progressRate = self.readFromConfig('ArchiveMaxSettings', 'progressRate', 30.0)
+		
+		# Each archive job gets its own policy so savings are reported per run
+		policy = None
+		if self.readFromConfig('Compression', 'usePolicy', True):
+			policy = CompressionPolicy.fromSettings(config['Compression'] if config.has_section('Compression') else {})
+		
+		update = self.updateZip_chb.checkState() == 2
+		
+		return MaxFileZip(data, zipFileDir, outPutZipFile, True, self.assetCache, statWorkers, compressionWorkers, policy, self.blobCache, update, progressRate, self.parser, self.tracer, self.relocator)
+
+	def newArchiver(self, data, zipFileDir, outPutZipFile):
+		# Several scenes without a single zip only come from shared assets mode, see sharedAssetsZip
+		if outPutZipFile is None and len(data) > 1:
+			from lib.SharedAssets import SharedAssetsArchiver
+			return SharedAssetsArchiver(data, zipFileDir, self.readFromConfig('ArchiveMaxSettings', 'sharedAssetsZip', ''),
+				lambda rows, zipFile: self.newMaxFileZip(rows, zipFileDir, zipFile), self.newScheduler())
+		
+		# The single zip can be split into shards written in parallel, see [ArchiveMaxSettings] shards and partSizeMB
+		shards = self.readFromConfig('ArchiveMaxSettings', 'shards', 1)
+		partSizeMB = self.readFromConfig('ArchiveMaxSettings', 'partSizeMB', 0)
+		if outPutZipFile is not None and (shards > 1 or partSizeMB > 0):
+			from lib.ZipShards import ShardedArchiver
+			return ShardedArchiver(data, outPutZipFile, shards, partSizeMB * 1024 * 1024,
+				lambda rows, zipFile: self.newMaxFileZip(rows, zipFileDir, zipFile))
+		return self.newMaxFileZip(data, zipFileDir, outPutZipFile)
+
+	def newRelocator(self):
+		# roots, maps and minMatch from [Relocation], the index is cached next to the ini file
+		if not config.has_section('Relocation'):
+			return None
+		cacheFile = self.readFromConfig('Relocation', 'cacheFile', 'ArchiveMax.relocation.sqlite')
+		if cacheFile != '':
+			cacheFile = str(PurePath(configFileName).parent.joinpath(cacheFile))
+		from lib.Relocator import Relocator
+		return Relocator.fromSettings(config['Relocation'], cacheFile)
+
+	def newScheduler(self):
+		# maxJobs, jobsPerVolume, volumeLimits and largestFirst from [Scheduler]
+		return JobScheduler.fromSettings(config['Scheduler'] if config.has_section('Scheduler') else {})
+
+	def estimateJobs(self, archivers, **kwargs):
+		# Runs on the threadpool, the scenes parsed here are not parsed again by the jobs
+		return [archiver.estimateBytes() for archiver in archivers]
+
+	def scheduleJobs(self, archivers, costs):
+		for archiver, cost in zip(archivers, costs):
+			self.scheduler.add(archiver, cost, volumeOf(next(iter(archiver.inFileDict.values()))))
+		self.startScheduledJobs()
+
+	def startScheduledJobs(self):
+		scheduledJob = self.scheduler.next()
+		while scheduledJob is not None:
+			worker = Worker(scheduledJob.job.main)
+			worker.signals.started.connect(self.fileTable.setIconData)
+			worker.signals.progressValue.connect(self.fileTable.setPBData)
+			worker.signals.error.connect(self.fileTable.setIconData)
+			worker.signals.finished.connect(lambda data, job=scheduledJob: self.jobFinished(job, data))
+			worker.signals.finished.connect(self.fileTable.setFinishedData)
+			worker.signals.progressLog.connect(self.statusBar().showMessage)
+			worker.signals.progressStats.connect(self.setStatsData)
+
+			self.threadpool.start(worker)
+			scheduledJob = self.scheduler.next()
+
+	def jobFinished(self, scheduledJob, data):
+		# Rows finish with (row, state), the job itself with its result
+		if isinstance(data, tuple):
+			return
+		
+		self.scheduler.done(scheduledJob)
+		if self.scheduler.idle():
+			self.setEnabledControlls(True)
+			self.exportTrace()
+		else:
+			self.startScheduledJobs()
+
+	def exportTrace(self):
+		# Chrome trace of the run and its per phase summary, see traceFile
+		if self.tracer is None:
+			return
+		
+		traceFile = self.readFromConfig('ArchiveMaxSettings', 'traceFile', '')
+		try:
+			self.tracer.export(traceFile, traceFile + '.summary.txt')
+			self.statusBar().showMessage(f'Trace written to {traceFile}')
+		except OSError as e:
+			self.statusBar().showMessage(f'Could not write trace {traceFile}: {e}')
+		self.tracer = None
+
+	def setStatsData(self, stats):
+		# Jobs report their own totals too, the window sums the rows of all jobs instead
+		if stats.row is None:
+			return
+		
+		self.rowStats[stats.row] = stats
+		self.fileTable.setStatsData(stats)
+		overall = combineStats(self.rowStats.values())
+		self.throughput_lbl.setText(f'{overall.percent}% of {overall.totalBytes/1048576:.1f} MB, {overall.describe()}')
+
 	def setEnabledControlls(self, state):
 		self.fileTable.setEnabled(state)
 		self.zipFileDir_btn.setEnabled(state)
 		self.zipFileDir_txt.setEnabled(state)
 		self.process_btn.setEnabled(state)
 		self.singleZipFile_chb.setEnabled(state)
+		self.updateZip_chb.setEnabled(state)
 		self.list_assets_btn.setEnabled(state)
+		self.plan_btn.setEnabled(state)
 		
 		if self.singleZipFile_chb.checkState() == 2:
 			self.singleZipFile_txt.setEnabled(state)
@@ -263,9 +421,16 @@ class MainWindow(QMainWindow):
 	def on_process_btn_clicked(self):
 		self.fileTable.resetProgressBars()
 		self.setEnabledControlls(False)
+		self.rowStats.clear()
+		self.throughput_lbl.setText('')
+		self.tracer = None
+		if self.readFromConfig('ArchiveMaxSettings', 'traceFile', '') != '':
+			from lib.Tracer import Tracer
+			self.tracer = Tracer()
+		self.relocator = self.newRelocator()
 		
 		#collect row data into a dict {row: maxfilepath}
-		rowData = { row: self.fileTable.item(row,1).data(0) for row in range(self.fileTable.rowCount()) }
+		rowData = dict(enumerate(self.fileTable.fileNames()))
 		processData = None
 		outPutZipFile = None
 		zipFileDir = self.zipFileDir_txt.text()
@@ -280,46 +445,119 @@ class MainWindow(QMainWindow):
 				zipFileName = zipFileName + '.zip'
 			
 			outPutZipFile = PurePath(zipFileDir, zipFileName)
+		elif self.readFromConfig('ArchiveMaxSettings', 'sharedAssetsZip', '') != '':
+			#zip per file, assets used by several files go into one shared zip
+			processData = [rowData]
 		else:
 			#for multi files make a list of dicts
 			processData = [{c:rowData[c]} for c in range(len(rowData))]
 				
-		for data in processData:		
-			maxZip = MaxFileZip(data, PurePath(zipFileDir), outPutZipFile, True)
-			
-			worker = Worker(maxZip.main)
-			worker.signals.started.connect(self.fileTable.setIconData)
-			worker.signals.progressValue.connect(self.fileTable.setPBData)
-			worker.signals.error.connect(self.fileTable.setIconData)
-			worker.signals.finished.connect(self.fileTable.setFinishedData)
+		archivers = [self.newArchiver(data, PurePath(zipFileDir), outPutZipFile) for data in processData]
+		self.scheduler = self.newScheduler()
+		# One extra thread for the size estimate
+		self.threadpool.setMaxThreadCount(self.scheduler.maxJobs + 1)
+		
+		if len(archivers) == 1:
+			self.scheduleJobs(archivers, [0])
+			return
+		
+		# A plan of the same rows already has their sizes
+		if self.lastPlan is not None and self.lastPlan[0] == rowData:
+			self.scheduleJobs(archivers, [self.lastPlan[1].rowBytes.get(row, 0) for row in rowData])
+			return
+		
+		# Largest jobs start first, their sizes are estimated off the GUI thread
+		self.statusBar().showMessage('Estimating job sizes...')
+		worker = Worker(self.estimateJobs, None, archivers)
+		worker.signals.result.connect(lambda costs: self.scheduleJobs(archivers, costs))
+		worker.signals.error.connect(lambda error: self.scheduleJobs(archivers, [0] * len(archivers)))
+		self.threadpool.start(worker)
+
+	def listAssets(self, rowData, fileName, **kwargs):
+		# Runs on the threadpool, one graph for all files so shared XRefs are parsed once
+		from lib.AssetReport import AssetReport
+		maxZip = self.newMaxFileZip(None, None, None)
+		return AssetReport(maxZip, self.readFromConfig('ArchiveMaxSettings', 'reportWorkers', 4)).write(rowData, fileName, **kwargs)
+
+	def planArchive(self, rowData, zipFileDir, outPutZipFile, **kwargs):
+		# Runs on the threadpool, all rows in one job so files shared by scenes are counted once
+		return self.newMaxFileZip(rowData, zipFileDir, outPutZipFile).plan(self.readFromConfig('ArchiveMaxSettings', 'planSampleFiles', 32))
+
+	def planDone(self, rowData, plan):
+		self.lastPlan = (rowData, plan)
+		for row, inMaxFile in rowData.items():
+			if inMaxFile in plan.errors:
+				self.fileTable.setIconData((row, 'error'))
+		self.statusBar().showMessage(plan.describe())
+		lines = [plan.describe(), '',
+			f'Single zip: {plan.uniqueBytes/1048576:.1f} MB read, zip per scene: {plan.rawBytes/1048576:.1f} MB read',
+			f'Stored {plan.storedBytes/1048576:.1f} MB, deflated {plan.deflatedBytes/1048576:.1f} MB',
+			f'Measured on {plan.sampledFiles} files: read {plan.readRate/1048576:.0f} MB/s, deflate {plan.deflateRate/1048576:.0f} MB/s '
+			f'on {plan.compressionWorkers} workers, write {plan.writeRate/1048576:.0f} MB/s']
+		QMessageBox.information(self, 'Archive Plan', '\n'.join(lines))
 
-			self.threadpool.start(worker)
+	@pyqtSlot()
+	def on_plan_btn_clicked(self):
+		rowData = dict(enumerate(self.fileTable.fileNames()))
+		if not rowData:
+			return
+		
+		zipFileDir = self.zipFileDir_txt.text()
+		zipFileDir = PurePath(zipFileDir) if zipFileDir != '' and Path(zipFileDir).is_dir() else None
+		outPutZipFile = None
+		zipFileName = self.singleZipFile_txt.text()
+		if self.singleZipFile_chb.checkState() == 2 and zipFileDir is not None and zipFileName != '':
+			outPutZipFile = zipFileDir.joinpath(zipFileName if zipFileName.endswith('.zip') else zipFileName + '.zip')
+		
+		self.relocator = self.newRelocator()
+		self.setEnabledControlls(False)
+		self.statusBar().showMessage('Planning the archive...')
+		worker = Worker(self.planArchive, None, rowData, zipFileDir, outPutZipFile)
+		worker.signals.result.connect(lambda plan: self.planDone(rowData, plan))
+		worker.signals.error.connect(lambda error: self.statusBar().showMessage(f'Planning failed: {error[1]}'))
+		worker.signals.finished.connect(lambda data: self.setEnabledControlls(True))
+		self.threadpool.start(worker)
+
+	def assetReportError(self, data):
+		# Rows that are not max files send (row, 'error'), a failed report the exception
+		if len(data) == 2:
+			self.fileTable.setIconData(data)
+		else:
+			self.statusBar().showMessage(f'Asset report failed: {data[1]}')
+
+	def assetReportDone(self, summary):
+		self.statusBar().showMessage(f'{summary["rows"]} assets of {summary["scenes"]} scenes, {summary["missing"]} missing, written to {summary["file"]}')
+		# Opens the report in the default application on every platform
+		QDesktopServices.openUrl(QUrl.fromLocalFile(summary['file']))
+
+	def assetReportFinished(self, data):
+		if not isinstance(data, tuple):
+			self.setEnabledControlls(True)
 
 	@pyqtSlot()
 	def on_list_assets_btn_clicked(self):
-		#collect row data into a dict
-		maxFiles = [self.fileTable.item(row,1).data(0) for row in range(self.fileTable.rowCount())]
-		allAssetsPaths = set()
-		for maxFile in maxFiles:
-			# init class
-			maxZip = MaxFileZip(None, None, None, True)
-			fileAssetsPaths = maxZip.collectAssetsPathsFromFile(maxFile, [])
-			allAssetsPaths.update(fileAssetsPaths)
-		
-		allAssetsPaths = list(allAssetsPaths)
-		allAssetsPaths.sort()
-		tempFile = tempfile.NamedTemporaryFile(mode = 'w+', newline='\n',suffix='.txt',delete=False)
-		dataWritten = False
-		with tempFile as assetLogFile:
-			for p in allAssetsPaths :
-				# if 'X:\\' in p: # and not os.path.exists(p):
-				try:
-					assetLogFile.write(p+'\n')
-					dataWritten = True
-				except:
-					print(p)
-		if dataWritten:
-			os.startfile(tempFile.name, 'open')
+		#collect row data into a dict {row: maxfilepath}
+		rowData = dict(enumerate(self.fileTable.fileNames()))
+		if not rowData:
+			return
+		
+		# assetReportFile in [ArchiveMaxSettings], .json or .jsonl for JSON lines, anything else CSV
+		fileName = self.readFromConfig('ArchiveMaxSettings', 'assetReportFile', '')
+		if fileName == '':
+			fileName = os.path.join(tempfile.gettempdir(), 'ArchiveMax Assets.csv')
+		fileName = str(PurePath(configFileName).parent.joinpath(fileName))
+		
+		self.fileTable.resetProgressBars()
+		self.setEnabledControlls(False)
+		worker = Worker(self.listAssets, None, rowData, fileName)
+		worker.signals.started.connect(self.fileTable.setIconData)
+		worker.signals.progressValue.connect(self.fileTable.setPBData)
+		worker.signals.error.connect(self.assetReportError)
+		worker.signals.finished.connect(self.fileTable.setFinishedData)
+		worker.signals.finished.connect(self.assetReportFinished)
+		worker.signals.progressLog.connect(self.statusBar().showMessage)
+		worker.signals.result.connect(self.assetReportDone)
+		self.threadpool.start(worker)
 
 
 	###########################
@@ -361,6 +599,9 @@ class MainWindow(QMainWindow):
 
 if __name__ == '__main__':
 	import sys
+	import multiprocessing
+	# Parser processes of a frozen build start through here
+	multiprocessing.freeze_support()
 	app = QApplication(sys.argv)
 	app.setStyle('Fusion')
 	app.setPalette(PALETTE)
@@ -378,17 +619,54 @@ if __name__ == '__main__':
 	config = configparser.ConfigParser()
 
 	zipFileDir: str = ''
+	assetCacheFile: str = 'ArchiveMax.cache.sqlite'
+	assetCacheSizeMB: int = 64
+	blobCacheDir: str = ''
+	blobCacheSizeMB: int = 10240
+	parserBackend: str = 'thread'
+	parseWorkers: int = 0
 	
 	appIcon = APPICONS.qIconFromBase64(APPICONS.clampB)
 	
 	try:
 		config.read(configFileName)
 		zipFileDir = (config['ArchiveMaxSettings']['zipFileDir'])
+		assetCacheFile = config['ArchiveMaxSettings'].get('assetCacheFile', assetCacheFile)
+		assetCacheSizeMB = config['ArchiveMaxSettings'].getint('assetCacheSizeMB', assetCacheSizeMB)
+		blobCacheDir = config['ArchiveMaxSettings'].get('blobCacheDir', blobCacheDir)
+		blobCacheSizeMB = config['ArchiveMaxSettings'].getint('blobCacheSizeMB', blobCacheSizeMB)
+		parserBackend = config['ArchiveMaxSettings'].get('parser', parserBackend)
+		parseWorkers = config['ArchiveMaxSettings'].getint('parseWorkers', parseWorkers)
 	except:
 		print('Didnt Pass')
 		config['ArchiveMaxSettings'] = {'zipFileDir':''}
 		with open(configFileName, 'w') as configfile:
 			config.write(configfile)
 
-	ex = MainWindow(dirSet, zipFileDir)
+	# Parsed asset tables are kept next to the ini file between sessions
+	assetCache = None
+	if assetCacheFile != '':
+		assetCache = AssetCache(str(PurePath(configFileName).parent.joinpath(assetCacheFile)), assetCacheSizeMB * 1024 * 1024)
+
+	# Scenes saved into the [Watch] folders are parsed into the asset cache in the background
+	if config.has_section('Watch'):
+		from lib.FolderWatch import PreScanner
+		preScanner = PreScanner.fromSettings(config['Watch'], assetCache)
+		if preScanner is not None:
+			preScanner.start()
+			app.aboutToQuit.connect(preScanner.stop)
+
+	# Compressed entries shared between archives, off unless a directory is set
+	blobCache = None
+	if blobCacheDir != '':
+		blobCache = BlobCache(blobCacheDir, blobCacheSizeMB * 1024 * 1024)
+
+	# Scenes parsed in a process pool instead of the archive threads, see parser and parseWorkers
+	parser = None
+	if parserBackend == 'process':
+		from lib.ParsePool import ProcessParser
+		parser = ProcessParser(parseWorkers, assetCache)
+		app.aboutToQuit.connect(parser.close)
+
+	ex = MainWindow(dirSet, zipFileDir, assetCache, blobCache, parser)
 	sys.exit(app.exec_())
@@ -0,0 +1,438 @@
+'''
+Headless batch archiver, runs MaxFileZip without Qt.
+
+Prints one JSON object per line on stdout for every progress event
+and a final summary, exit codes are listed below.
+
+Example:
+	python ArchiveMaxCli.py -o /mnt/archive "/mnt/projects/**/*.max"
+	python ArchiveMaxCli.py -o /mnt/archive --single Project.zip --list scenes.txt
+	python ArchiveMaxCli.py -o /mnt/archive --single Project.zip --shards 4 --part-size 4096 "/mnt/projects/**/*.max"
+	python ArchiveMaxCli.py -o /mnt/archive --merge /mnt/archive/Project.manifest.json
+	python ArchiveMaxCli.py -o /mnt/archive --list-assets assets.csv "/mnt/projects/**/*.max"
+	python ArchiveMaxCli.py -o /mnt/archive --single Project.zip --plan "/mnt/projects/**/*.max"
+	python ArchiveMaxCli.py --asset-cache /var/cache/archivemax.sqlite --watch /mnt/projects
+'''
+import sys
+import json
+import glob
+import signal
+import argparse
+import configparser
+import threading
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from pathlib import PurePath, Path
+
+from lib.MaxZipFile import MaxFileZip
+from lib.AssetCache import AssetCache
+from lib.BlobCache import BlobCache
+from lib.CompressionPolicy import CompressionPolicy
+from lib.TransferStats import TransferStats
+from lib.ZipShards import ShardedArchiver, mergeManifest, readManifest
+from lib.SharedAssets import SharedAssetsArchiver
+from lib.JobScheduler import JobScheduler, volumeOf
+from lib.ParsePool import ProcessParser
+from lib.Tracer import Tracer
+from lib.Relocator import Relocator
+from lib.AssetReport import AssetReport
+from lib.FolderWatch import PreScanner
+
+EXIT_OK = 0
+# Some inputs were not valid max files
+EXIT_SCENE_ERRORS = 1
+# Bad arguments or nothing to archive
+EXIT_USAGE = 2
+# An archive job raised an exception
+EXIT_FAILED = 3
+# Assets were missing and --fail-on-missing was given
+EXIT_MISSING = 4
+
+
+class JsonLinesOutput():
+	'''
+	Thread safe JSON lines writer, one event per line
+	'''
+
+	def __init__(self, stream=sys.stdout):
+		self.stream = stream
+		self._lock = threading.Lock()
+
+	def emit(self, event: str, **data):
+		line = json.dumps(dict(event=event, **data))
+		with self._lock:
+			self.stream.write(line + '\n')
+			self.stream.flush()
+
+def expandInputs(patterns: list) -> list:
+	"""Max files from paths and glob patterns, in order without duplicates
+
+	Args:
+		patterns (list): File paths or glob patterns, ** is recursive
+
+	Returns:
+		list: Max file paths
+	"""
+	files = {}
+	for pattern in patterns:
+		pattern = pattern.strip()
+		if pattern == '':
+			continue
+		matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+		for match in matches:
+			if PurePath(match).suffix.lower() == '.max':
+				files[match] = None
+	return list(files)
+
+def readListFile(listFile: str) -> list:
+	stream = sys.stdin if listFile == '-' else open(listFile, 'r')
+	with stream:
+		return [line.rstrip('\n') for line in stream]
+
+def parseArgs(argv: list) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(description='Archive 3ds Max files and their assets to zip files without the GUI.')
+	parser.add_argument('inputs', nargs='*', help='Max files or glob patterns')
+	parser.add_argument('--list', dest='listFiles', action='append', default=[], help='File with one max file or glob per line, - for stdin')
+	parser.add_argument('-o', '--output-dir', dest='outputDir', default='', help='Directory the zip files are written to')
+	parser.add_argument('--single', dest='singleZip', default='', help='Archive everything into this single zip file')
+	parser.add_argument('--update', action='store_true', help='Refresh existing archives, copying unchanged entries')
+	parser.add_argument('--shards', type=int, default=None, help='Parallel jobs writing separate parts of the --single archive')
+	parser.add_argument('--part-size', dest='partSizeMB', type=int, default=None, help='Start a new part of the --single archive every this many MB')
+	parser.add_argument('--shared-assets', dest='sharedAssetsZip', default=None, help='Per-scene mode, put assets used by several scenes into this zip once')
+	parser.add_argument('--list-assets', dest='listAssets', default='', help='Write the assets of every scene to this CSV (or .jsonl) file in the output directory instead of archiving')
+	parser.add_argument('--watch', dest='watchFolders', action='append', default=[], help='Parse max files saved under this folder into the asset cache until stopped, can be repeated')
+	parser.add_argument('--poll', action='store_true', help='Watch by walking the folders instead of inotify, for network shares')
+	parser.add_argument('--plan', action='store_true', help='Estimate the archive size and time without writing it')
+	parser.add_argument('--plan-samples', dest='planSampleFiles', type=int, default=None, help='Files read and deflated for the --plan estimate')
+	parser.add_argument('--merge', default='', help='Join the parts listed in a manifest into one zip in the output directory')
+	parser.add_argument('--jobs', type=int, default=None, help='Scenes archived at the same time in per-scene mode, largest first')
+	parser.add_argument('--jobs-per-volume', dest='jobsPerVolume', type=int, default=None, help='Scenes archived at the same time from one drive or share')
+	parser.add_argument('--config', default='', help='ArchiveMax.ini to read settings from')
+	parser.add_argument('--stat-workers', dest='statWorkers', type=int, default=None)
+	parser.add_argument('--parser', choices=('thread', 'process'), default=None, help='Parse scenes on the job threads or in a process pool')
+	parser.add_argument('--parse-workers', dest='parseWorkers', type=int, default=None, help='Processes of the process parser, 0 uses all cores')
+	parser.add_argument('--compression-workers', dest='compressionWorkers', type=int, default=None, help='0 uses all cores')
+	parser.add_argument('--no-policy', dest='noPolicy', action='store_true', help='Deflate every entry')
+	parser.add_argument('--asset-cache', dest='assetCacheFile', default=None, help='SQLite file caching parsed asset tables')
+	parser.add_argument('--blob-cache', dest='blobCacheDir', default=None, help='Directory caching compressed entries')
+	parser.add_argument('--progress-rate', dest='progressRate', type=float, default=None, help='Progress events per second per scene, 0 removes the limit')
+	parser.add_argument('--search-root', dest='searchRoots', action='append', default=[], help='Look for missing assets under this directory, can be repeated')
+	parser.add_argument('--map', dest='maps', action='append', default=[], help='OLD=NEW path prefix tried first for missing assets, can be repeated')
+	parser.add_argument('--relocation-cache', dest='relocationCache', default=None, help='SQLite file caching the search root index')
+	parser.add_argument('--trace', dest='traceFile', default=None, help='Write a Chrome trace of the run phases to this file')
+	parser.add_argument('--fail-on-missing', dest='failOnMissing', action='store_true', help='Exit with %d when assets are missing' % EXIT_MISSING)
+	return parser.parse_args(argv)
+
+class BatchArchiver():
+	'''
+	Runs MaxFileZip jobs for a list of scenes and reports through JsonLinesOutput
+	'''
+
+	def __init__(self, args: argparse.Namespace, output: JsonLinesOutput):
+		self.args = args
+		self.output = output
+		self.config = configparser.ConfigParser()
+		if args.config != '':
+			self.config.read(args.config)
+		self.settings = self.config['ArchiveMaxSettings'] if self.config.has_section('ArchiveMaxSettings') else {}
+
+		assetCacheFile = args.assetCacheFile if args.assetCacheFile is not None else self.settings.get('assetCacheFile', '')
+		self.assetCache = None
+		if assetCacheFile != '':
+			if args.config != '' and args.assetCacheFile is None:
+				assetCacheFile = str(PurePath(args.config).parent.joinpath(assetCacheFile))
+			self.assetCache = AssetCache(assetCacheFile, int(self.settings.get('assetCacheSizeMB', 64)) * 1024 * 1024)
+
+		blobCacheDir = args.blobCacheDir if args.blobCacheDir is not None else self.settings.get('blobCacheDir', '')
+		self.blobCache = None
+		if blobCacheDir != '':
+			self.blobCache = BlobCache(blobCacheDir, int(self.settings.get('blobCacheSizeMB', 10240)) * 1024 * 1024)
+
+		# One process pool parses the scenes of every job
+		parser = args.parser if args.parser is not None else self.settings.get('parser', 'thread')
+		self.parser = None
+		if parser == 'process':
+			self.parser = ProcessParser(self.setting(args.parseWorkers, 'parseWorkers', 0), self.assetCache)
+
+		# One tracer times the phases of every job
+		self.traceFile = args.traceFile if args.traceFile is not None else self.settings.get('traceFile', '')
+		self.tracer = Tracer() if self.traceFile != '' else None
+
+		# [Relocation] in the ini file, --search-root and --map add to it
+		relocation = dict(self.config['Relocation']) if self.config.has_section('Relocation') else {}
+		relocation['roots'] = ';'.join([relocation.get('roots', '')] + args.searchRoots)
+		relocation['maps'] = ';'.join([relocation.get('maps', '')] + args.maps)
+		relocationCache = args.relocationCache if args.relocationCache is not None else relocation.get('cacheFile', '')
+		if relocationCache != '' and args.config != '' and args.relocationCache is None:
+			relocationCache = str(PurePath(args.config).parent.joinpath(relocationCache))
+		self.relocator = Relocator.fromSettings(relocation, relocationCache)
+
+	def setting(self, argValue, key: str, fallback: int) -> int:
+		if argValue is not None:
+			return argValue
+		return int(self.settings.get(key, fallback))
+
+	def newMaxFileZip(self, data: dict, outPutZipFile) -> MaxFileZip:
+		policy = None
+		if not self.args.noPolicy:
+			policy = CompressionPolicy.fromSettings(self.config['Compression'] if self.config.has_section('Compression') else {})
+
+		return MaxFileZip(data, PurePath(self.args.outputDir), outPutZipFile, True, self.assetCache,
+			self.setting(self.args.statWorkers, 'statWorkers', 8),
+			self.setting(self.args.compressionWorkers, 'compressionWorkers', 0),
+			policy, self.blobCache, self.args.update,
+			self.args.progressRate if self.args.progressRate is not None else float(self.settings.get('progressRate', 30.0)),
+			self.parser, self.tracer, self.relocator)
+
+	def emitStats(self, data: dict, stats: TransferStats):
+		# Byte weighted progress with MB/s and ETA, per scene and for the whole job
+		numbers = dict(percent=stats.percent, doneBytes=stats.doneBytes, totalBytes=stats.totalBytes,
+			bytesPerSecond=round(stats.bytesPerSecond), eta=None if stats.eta is None else round(stats.eta, 1))
+		if stats.row is None:
+			self.output.emit('throughput', files=list(data.values()), **numbers)
+		else:
+			self.output.emit('progress', file=data[stats.row], **numbers)
+
+	def newArchiver(self, data: dict, outPutZipFile):
+		# The single archive can be split into shards written in parallel
+		shards = self.setting(self.args.shards, 'shards', 1)
+		partSizeMB = self.setting(self.args.partSizeMB, 'partSizeMB', 0)
+		if outPutZipFile is not None and (shards > 1 or partSizeMB > 0):
+			return ShardedArchiver(data, outPutZipFile, shards, partSizeMB * 1024 * 1024, self.newMaxFileZip)
+		return self.newMaxFileZip(data, outPutZipFile)
+
+	def sharedAssetsZip(self) -> str:
+		return self.args.sharedAssetsZip if self.args.sharedAssetsZip is not None else self.settings.get('sharedAssetsZip', '')
+
+	def newScheduler(self) -> JobScheduler:
+		# [Scheduler] in the ini file, --jobs and --jobs-per-volume override it
+		scheduler = JobScheduler.fromSettings(self.config['Scheduler'] if self.config.has_section('Scheduler') else {})
+		if self.args.jobs is not None:
+			scheduler.maxJobs = max(1, self.args.jobs)
+		if self.args.jobsPerVolume is not None:
+			scheduler.jobsPerVolume = max(1, self.args.jobsPerVolume)
+		return scheduler
+
+	def runJob(self, data: dict, maxZip) -> dict:
+		emit = self.output.emit
+		try:
+			result = maxZip.main(
+				progress_stats=lambda stats: self.emitStats(data, stats),
+				progress_started=lambda var: emit('started', file=data[var[0]]),
+				progress_error=lambda var: emit('error', file=data[var[0]], message='Not a valid max file'),
+				progress_finished=lambda var: emit('finished', file=data[var[0]]),
+				progress_setlog=lambda var: emit('log', message=var))
+		except Exception as e:
+			emit('failed', files=list(data.values()), message=str(e), traceback=traceback.format_exc())
+			return None
+
+		# A scene that is not a valid max file gets no zip, only its error event
+		if result.zipFile != '':
+			emit('archived', **asdict(result))
+		return asdict(result)
+
+	def run(self, maxFiles: list) -> int:
+		try:
+			if self.args.listAssets != '':
+				return self.listAssets(maxFiles)
+			if self.args.plan:
+				return self.plan(maxFiles)
+			return self.archive(maxFiles)
+		finally:
+			if self.parser is not None:
+				self.parser.close()
+
+	def exportTrace(self):
+		# Trace for chrome://tracing, the summary goes next to it and to stderr
+		try:
+			self.tracer.export(self.traceFile, self.traceFile + '.summary.txt')
+		except OSError as e:
+			self.output.emit('log', message=f'Could not write trace {self.traceFile}: {e}')
+			return
+		self.output.emit('trace', traceFile=self.traceFile, phases=self.tracer.summary())
+		print(self.tracer.summaryTable(), file=sys.stderr)
+
+	def listAssets(self, maxFiles: list) -> int:
+		rowData = {row: maxFile for row, maxFile in enumerate(maxFiles)}
+		emit = self.output.emit
+		try:
+			summary = AssetReport(self.newMaxFileZip(None, None), self.setting(None, 'reportWorkers', 4)).write(
+				rowData, str(PurePath(self.args.outputDir, self.args.listAssets)),
+				progress_error=lambda var: emit('error', file=rowData[var[0]], message='Not a valid max file'),
+				progress_finished=lambda var: emit('listed', file=rowData[var[0]]))
+		except Exception as e:
+			emit('failed', files=maxFiles, message=str(e), traceback=traceback.format_exc())
+			emit('summary', exitCode=EXIT_FAILED)
+			return EXIT_FAILED
+
+		if summary['errors']:
+			exitCode = EXIT_SCENE_ERRORS
+		elif self.args.failOnMissing and summary['missing']:
+			exitCode = EXIT_MISSING
+		else:
+			exitCode = EXIT_OK
+		emit('summary', exitCode=exitCode, report=summary['file'], scenes=len(maxFiles), listedScenes=summary['scenes'],
+			sceneErrors=len(summary['errors']), assets=summary['rows'], missingFiles=summary['missing'], bytes=summary['bytes'])
+		return exitCode
+
+	def plan(self, maxFiles: list) -> int:
+		# All scenes as one job, rowBytes are the per-scene sizes and uniqueBytes the --single archive
+		rowData = {row: maxFile for row, maxFile in enumerate(maxFiles)}
+		outPutZipFile = None
+		if self.args.singleZip != '':
+			outPutZipFile = PurePath(self.args.outputDir, self.args.singleZip if self.args.singleZip.endswith('.zip') else self.args.singleZip + '.zip')
+		emit = self.output.emit
+		try:
+			plan = self.newMaxFileZip(rowData, outPutZipFile).plan(self.setting(self.args.planSampleFiles, 'planSampleFiles', 32))
+		except Exception as e:
+			emit('failed', files=maxFiles, message=str(e), traceback=traceback.format_exc())
+			emit('summary', exitCode=EXIT_FAILED)
+			return EXIT_FAILED
+
+		result = asdict(plan)
+		result['rowBytes'] = {rowData[row]: nBytes for row, nBytes in plan.rowBytes.items()}
+		emit('plan', **result)
+
+		if plan.errors:
+			exitCode = EXIT_SCENE_ERRORS
+		elif self.args.failOnMissing and plan.missingFiles:
+			exitCode = EXIT_MISSING
+		else:
+			exitCode = EXIT_OK
+		emit('summary', exitCode=exitCode, scenes=len(maxFiles), sceneErrors=len(plan.errors), files=plan.uniqueFiles,
+			rawBytes=plan.rawBytes, uniqueBytes=plan.uniqueBytes, compressedBytes=plan.compressedBytes,
+			missingFiles=plan.missingFiles, seconds=round(plan.seconds, 1))
+		return exitCode
+
+	def watch(self) -> int:
+		# [Watch] in the ini file, --watch and --poll add to it
+		settings = dict(self.config['Watch']) if self.config.has_section('Watch') else {}
+		settings['folders'] = ';'.join([settings.get('folders', '')] + self.args.watchFolders)
+		if self.args.poll:
+			settings['polling'] = 'true'
+		emit = self.output.emit
+		preScanner = PreScanner.fromSettings(settings, self.assetCache)
+		if preScanner is None:
+			emit('summary', exitCode=EXIT_USAGE, message='--watch needs --asset-cache or assetCacheFile')
+			return EXIT_USAGE
+
+		# A service manager's SIGTERM ends the watch like Ctrl+C
+		signal.signal(signal.SIGTERM, lambda signum, frame: preScanner.stop())
+		try:
+			preScanner.run(
+				progress_finished=lambda scanned: emit('prescanned', **scanned),
+				progress_error=lambda var: emit('error', file=var[0], message=var[1]),
+				progress_setlog=lambda var: emit('log', message=var))
+		except KeyboardInterrupt:
+			pass
+		emit('summary', exitCode=EXIT_OK, scannedScenes=preScanner.scannedFiles, sceneErrors=preScanner.errors)
+		return EXIT_OK
+
+	def archive(self, maxFiles: list) -> int:
+		rowData = {row: maxFile for row, maxFile in enumerate(maxFiles)}
+		if self.parser is not None:
+			# Every scene starts parsing at once instead of when its job gets to it
+			self.parser.prefetch(maxFiles)
+
+		if self.args.singleZip != '':
+			zipFileName = self.args.singleZip if self.args.singleZip.endswith('.zip') else self.args.singleZip + '.zip'
+			results = [self.runJob(rowData, self.newArchiver(rowData, PurePath(self.args.outputDir, zipFileName)))]
+		elif self.sharedAssetsZip() != '':
+			results = [self.runJob(rowData, SharedAssetsArchiver(rowData, PurePath(self.args.outputDir), self.sharedAssetsZip(), self.newMaxFileZip, self.newScheduler()))]
+		else:
+			scheduler = self.newScheduler()
+			jobs = [({row: maxFile}, self.newArchiver({row: maxFile}, None)) for row, maxFile in rowData.items()]
+			# Scenes parsed for the estimate stay in each job's XRef graph
+			def estimate(job):
+				try:
+					return job[1].estimateBytes()
+				except Exception:
+					# Unreadable scene, runJob reports it as a failed job
+					return 0
+			with ThreadPoolExecutor(max_workers=scheduler.maxJobs) as pool:
+				costs = list(pool.map(estimate, jobs))
+			for job, cost in zip(jobs, costs):
+				scheduler.add(job, cost, volumeOf(next(iter(job[0].values()))))
+			results = scheduler.runAll(lambda job: self.runJob(*job))
+
+		failed = sum(1 for r in results if r is None)
+		done = [r for r in results if r is not None]
+		summary = dict(
+			scenes=len(maxFiles),
+			# Zip files written, shared assets mode writes one per scene besides the common archive
+			archives=sum(len(r['parts']) for r in done),
+			failedJobs=failed,
+			sceneErrors=sum(len(r['errors']) for r in done),
+			writtenFiles=sum(r['writtenFiles'] for r in done),
+			writtenBytes=sum(r['writtenBytes'] for r in done),
+			compressedBytes=sum(r['compressedBytes'] for r in done),
+			missingFiles=sum(r['missingFiles'] for r in done),
+			reusedFiles=sum(r['reusedFiles'] for r in done),
+			relocatedFiles=sum(r['relocatedFiles'] for r in done),
+			savedBytes=sum(r['savedBytes'] for r in done),
+			savedSeconds=round(sum(r['savedSeconds'] for r in done), 1))
+
+		if failed:
+			exitCode = EXIT_FAILED
+		elif summary['sceneErrors']:
+			exitCode = EXIT_SCENE_ERRORS
+		elif self.args.failOnMissing and summary['missingFiles']:
+			exitCode = EXIT_MISSING
+		else:
+			exitCode = EXIT_OK
+
+		if self.tracer is not None:
+			self.exportTrace()
+		self.output.emit('summary', exitCode=exitCode, **summary)
+		return exitCode
+
+def merge(args: argparse.Namespace, output: JsonLinesOutput) -> int:
+	try:
+		zipFileName = args.singleZip or readManifest(args.merge)['archive']
+		if not zipFileName.endswith('.zip'):
+			zipFileName += '.zip'
+		zipFile = str(PurePath(args.outputDir, zipFileName))
+		stats = mergeManifest(args.merge, zipFile)
+	except Exception as e:
+		output.emit('failed', files=[args.merge], message=str(e), traceback=traceback.format_exc())
+		output.emit('summary', exitCode=EXIT_FAILED)
+		return EXIT_FAILED
+
+	output.emit('merged', zipFile=zipFile, **stats)
+	output.emit('summary', exitCode=EXIT_OK)
+	return EXIT_OK
+
+def main(argv: list) -> int:
+	args = parseArgs(argv)
+	output = JsonLinesOutput()
+
+	if args.watchFolders:
+		return BatchArchiver(args, output).watch()
+	if args.outputDir == '':
+		output.emit('summary', exitCode=EXIT_USAGE, message='-o/--output-dir is required')
+		return EXIT_USAGE
+
+	if args.merge != '':
+		if not Path(args.outputDir).is_dir():
+			output.emit('summary', exitCode=EXIT_USAGE, message=f'Output directory {args.outputDir} does not exist')
+			return EXIT_USAGE
+		return merge(args, output)
+
+	patterns = list(args.inputs)
+	for listFile in args.listFiles:
+		patterns += readListFile(listFile)
+	maxFiles = expandInputs(patterns)
+
+	if not maxFiles:
+		output.emit('summary', exitCode=EXIT_USAGE, message='No max files to archive')
+		return EXIT_USAGE
+	if not Path(args.outputDir).is_dir():
+		output.emit('summary', exitCode=EXIT_USAGE, message=f'Output directory {args.outputDir} does not exist')
+		return EXIT_USAGE
+
+	return BatchArchiver(args, output).run(maxFiles)
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
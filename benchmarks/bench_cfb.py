@@ -0,0 +1,110 @@
+'''
+Latency and memory benchmark for the asset stream reader.
+Writes large synthetic scenes, a big filler Scene stream pushes the
+FAT past the header DIFAT, then reads FileAssetMetaData3 with olefile
+and with the memory mapped CfbReader. Each reader runs in a fresh
+process so its peak RSS can be reported. Fails when the readers return
+different data or CfbReader is not faster on the large files.
+
+Usage: python benchmarks/bench_cfb.py [sceneMB] [scenes] [assetsPerScene]
+'''
+import os
+import sys
+import json
+import subprocess
+import tempfile
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from maxfixture import writeMaxFile
+
+STREAM = 'FileAssetMetaData3'
+
+# Runs in a child process, prints seconds per file, peak RSS and a digest of the data
+READER = r'''
+import sys, time, json, hashlib
+sys.path.insert(0, sys.argv[1])
+try:
+	import resource
+except ImportError:
+	resource = None
+import olefile
+from lib.CfbReader import CfbReader
+
+def readOlefile(file):
+	with olefile.OleFileIO(file) as ole:
+		return ole.openstream('{stream}').read()
+
+def readCfb(file):
+	with CfbReader(file) as reader:
+		return reader.read('{stream}')
+
+read = readOlefile if sys.argv[2] == 'olefile' else readCfb
+files = sys.argv[3:]
+digest = hashlib.sha1()
+times = []
+for file in files:
+	start = time.perf_counter()
+	data = read(file)
+	times.append(time.perf_counter() - start)
+	digest.update(data)
+# VmHWM starts over at exec, ru_maxrss keeps the parent's peak on Linux
+rss = 0
+try:
+	with open('/proc/self/status') as status:
+		rss = next(int(line.split()[1]) * 1024 for line in status if line.startswith('VmHWM'))
+except OSError:
+	if resource:
+		# KB on Linux, bytes on macOS
+		rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+print(json.dumps(dict(seconds=sum(times) / len(times) if times else 0.0, rss=rss, digest=digest.hexdigest())))
+'''.replace('{stream}', STREAM)
+
+
+def runReader(reader: str, files: list) -> dict:
+	output = subprocess.run([sys.executable, '-c', READER, str(Path(__file__).resolve().parent.parent), reader] + files,
+		check=True, capture_output=True, text=True).stdout
+	return json.loads(output)
+
+def baselineRss() -> int:
+	# Interpreter, olefile and CfbReader imported, nothing read
+	return runReader('cfb', [])['rss']
+
+def main():
+	sceneBytes = (int(sys.argv[1]) if len(sys.argv) > 1 else 256) * 1024 * 1024
+	scenes = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+	assets = int(sys.argv[3]) if len(sys.argv) > 3 else 400
+
+	failed = False
+	with tempfile.TemporaryDirectory() as directory:
+		sizes = (('small', 0), ('large', sceneBytes))
+		fileSets = {}
+		for label, filler in sizes:
+			fileSets[label] = []
+			for i in range(scenes):
+				fileName = os.path.join(directory, f'{label}_{i}.max')
+				writeMaxFile(fileName, [('Bitmap', f'P:\\Maps\\texture_{n:05d}.png', f'P:\\Maps\\texture_{n:05d}.png') for n in range(assets)], sceneBytes=filler)
+				fileSets[label].append(fileName)
+
+		base = baselineRss()
+		print(f'{scenes} scenes of {assets} assets, large ones {sceneBytes // 1048576} MB, warm page cache')
+		for label, filler in sizes:
+			results = {reader: runReader(reader, fileSets[label]) for reader in ('olefile', 'cfb')}
+			for reader, result in results.items():
+				rss = f'{(result["rss"] - base) / 1048576:7.1f} MB over baseline' if result['rss'] else ''
+				print(f'  {label:6} {reader:8} {result["seconds"] * 1000:9.2f} ms/file  {rss}')
+			if results['olefile']['digest'] != results['cfb']['digest']:
+				print(f'FAIL: readers return different {STREAM} data for the {label} files')
+				failed = True
+			if label == 'large' and results['cfb']['seconds'] >= results['olefile']['seconds']:
+				print('FAIL: CfbReader is not faster than olefile on the large files')
+				failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,72 @@
+'''
+Benchmark for ParallelZipWriter throughput against worker count.
+Writes the same set of generated files with zipfile.ZipFile.write
+and with the parallel writer at increasing worker counts.
+
+Usage: python benchmarks/bench_compress.py [fileCount] [fileSizeMB]
+'''
+import os
+import sys
+import time
+import random
+import tempfile
+import zipfile
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.ParallelZip import ParallelZipWriter
+
+
+def makeFiles(directory: str, count: int, size: int) -> list:
+	# Half random, half repeated data so deflate has real work to do
+	rng = random.Random(0)
+	files = []
+	for i in range(count):
+		block = rng.randbytes(4096) + bytes(4096)
+		fileName = os.path.join(directory, f'texture_{i:03d}.bin')
+		with open(fileName, 'wb') as f:
+			f.write((block * (size // len(block) + 1))[:size])
+		files.append(fileName)
+	return files
+
+def timeSerial(files: list, zipName: str) -> float:
+	start = time.perf_counter()
+	with zipfile.ZipFile(zipName, 'w', zipfile.ZIP_DEFLATED) as archFile:
+		for fileName in files:
+			archFile.write(fileName, os.path.basename(fileName))
+	return time.perf_counter() - start
+
+def timeParallel(files: list, zipName: str, workers: int) -> float:
+	start = time.perf_counter()
+	with zipfile.ZipFile(zipName, 'w', zipfile.ZIP_DEFLATED) as archFile, ParallelZipWriter(archFile, workers) as zipWriter:
+		for fileName in files:
+			zipWriter.write(fileName, os.path.basename(fileName))
+	return time.perf_counter() - start
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+	size = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 8 * 1024 * 1024
+	totalMB = count * size / 1048576
+
+	with tempfile.TemporaryDirectory() as tempDir:
+		files = makeFiles(tempDir, count, size)
+		zipName = os.path.join(tempDir, 'bench.zip')
+
+		serialTime = timeSerial(files, zipName)
+		print(f'{count} files, {totalMB:.0f} MB, {os.cpu_count()} cores')
+		print(f'  ZipFile.write:       {totalMB/serialTime:8.1f} MB/s')
+
+		workers = 1
+		while workers <= (os.cpu_count() or 1):
+			parallelTime = timeParallel(files, zipName, workers)
+			with zipfile.ZipFile(zipName) as archFile:
+				if archFile.testzip() is not None:
+					print('  archive failed CRC check')
+					sys.exit(1)
+			print(f'  {workers:2d} workers:          {totalMB/parallelTime:8.1f} MB/s  ({serialTime/parallelTime:.1f}x)')
+			workers *= 2
+
+if __name__ == '__main__':
+	main()
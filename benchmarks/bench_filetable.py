@@ -0,0 +1,104 @@
+'''
+Offscreen benchmark for the model/view FileTable.
+Adds rows in one batch, then updates state, progress and MB/s text
+for every row the way archive workers do, processing events as the
+GUI would. Fails when a budget is exceeded, an update signals more
+than the changed cell or the final data is wrong.
+
+Usage: python benchmarks/bench_filetable.py [--rows N] [--updates N] [--add-budget-ms MS] [--update-budget-ms MS]
+'''
+import os
+import sys
+import time
+import argparse
+
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout
+
+from lib.TableWidget import FileTable
+from lib.TransferStats import TransferStats
+
+
+class Window(QWidget):
+	# Stands in for MainWindow, the table re-enables its controls when jobs finish
+	def setEnabledControlls(self, state):
+		pass
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--rows', type=int, default=20000)
+	parser.add_argument('--updates', type=int, default=5, help='Progress updates per row')
+	parser.add_argument('--add-budget-ms', dest='addBudget', type=float, default=1000)
+	parser.add_argument('--update-budget-ms', dest='updateBudget', type=float, default=5000)
+	args = parser.parse_args()
+
+	app = QApplication(sys.argv)
+	window = Window()
+	layout = QVBoxLayout(window)
+	table = FileTable(window)
+	layout.addWidget(table)
+	window.resize(800, 480)
+	window.show()
+	app.processEvents()
+
+	files = [f'P:/Projects/Job_{i // 100:04d}/Scenes/scene_{i:06d}.max' for i in range(args.rows)]
+
+	start = time.perf_counter()
+	table.addFilesToView(files)
+	app.processEvents()
+	addMs = (time.perf_counter() - start) * 1000
+
+	changed = []
+	table.fileModel.dataChanged.connect(lambda topLeft, bottomRight, roles: changed.append(topLeft == bottomRight))
+
+	start = time.perf_counter()
+	for row in range(args.rows):
+		table.setIconData((row, 'proc'))
+		for update in range(1, args.updates + 1):
+			percent = round(update / args.updates * 100, 2)
+			table.setPBData((row, percent))
+			table.setStatsData(TransferStats(row, update * 1048576, args.updates * 1048576, percent, 50 * 1048576, args.updates - update))
+		table.setFinishedData((row, 'good'))
+		if row % 500 == 0:
+			# Repaints as the event loop would between queued signals
+			table.scrollTo(table.fileModel.index(row, 1))
+			app.processEvents()
+	app.processEvents()
+	updateMs = (time.perf_counter() - start) * 1000
+	updates = len(changed)
+
+	print(f'{args.rows} rows added in {addMs:.1f} ms')
+	print(f'{updates} cell updates in {updateMs:.1f} ms ({updateMs * 1000 / max(updates, 1):.1f} us each)')
+
+	failed = False
+	if addMs > args.addBudget:
+		print(f'FAIL: adding rows over budget of {args.addBudget:.0f} ms')
+		failed = True
+	if updateMs > args.updateBudget:
+		print(f'FAIL: updates over budget of {args.updateBudget:.0f} ms')
+		failed = True
+	if not all(changed):
+		print(f'FAIL: {changed.count(False)} updates signalled more than one cell')
+		failed = True
+	if table.rowCount() != args.rows or table.fileNames() != files:
+		print('FAIL: rows do not match the added files')
+		failed = True
+	model = table.fileModel
+	if any(p != 100.0 for p in model.progress) or any(s != 'good' for s in model.states):
+		print('FAIL: final progress or state is wrong')
+		failed = True
+
+	table.removeTableItem(0)
+	if table.rowCount() != args.rows - 1 or files[0] in table.droppedFiles:
+		print('FAIL: removing a row')
+		failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
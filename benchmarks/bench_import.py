@@ -0,0 +1,68 @@
+'''
+Cold import time guard for the headless CLI and the GUI.
+Runs each entry module under python -X importtime in a fresh
+interpreter, reports the best of several runs and fails when a
+budget is exceeded or the CLI pulls in PyQt5.
+
+Usage: python benchmarks/bench_import.py [--runs N] [--cli-budget-ms MS] [--gui-budget-ms MS]
+'''
+import os
+import sys
+import argparse
+import subprocess
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def importTime(module: str) -> tuple:
+	"""Imports module in a fresh interpreter
+
+	Args:
+		module (str): Module to import
+
+	Returns:
+		tuple: (cumulative import time in ms, set of top level packages imported)
+	"""
+	env = dict(os.environ, QT_QPA_PLATFORM='offscreen', PYTHONDONTWRITEBYTECODE='')
+	proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+	
+	totalUs = 0
+	packages = set()
+	for line in proc.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		selfUs, cumulativeUs, name = line[len('import time:'):].split('|')
+		packages.add(name.strip().split('.')[0])
+		if name.strip() == module:
+			totalUs = int(cumulativeUs)
+	return (totalUs / 1000, packages)
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--runs', type=int, default=5)
+	parser.add_argument('--cli-budget-ms', dest='cliBudget', type=float, default=150)
+	parser.add_argument('--gui-budget-ms', dest='guiBudget', type=float, default=130)
+	args = parser.parse_args()
+
+	failed = False
+	for module, budget, qtAllowed in (('ArchiveMaxCli', args.cliBudget, False), ('ArchiveMax', args.guiBudget, True)):
+		results = [importTime(module) for _ in range(args.runs)]
+		best = min(ms for ms, packages in results)
+		packages = results[0][1]
+		
+		status = 'ok'
+		if best > budget:
+			status = f'over budget of {budget:.0f} ms'
+			failed = True
+		if not qtAllowed and 'PyQt5' in packages:
+			status = 'imports PyQt5'
+			failed = True
+		print(f'{module:14s} {best:8.1f} ms  {status}')
+
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
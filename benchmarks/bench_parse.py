@@ -0,0 +1,96 @@
+'''
+Benchmark for the FileAssetMetaData stream parser.
+Compares the old 2-byte-at-a-time reader with the buffered
+parser in MaxFileZip.readStream and reports records per second.
+
+Usage: python benchmarks/bench_parse.py [assetCount]
+'''
+import io
+import sys
+import time
+import uuid
+import codecs
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.MaxZipFile import MaxFileZip, OleAsset
+
+
+def buildStream(count: int, hasResolvedPath: bool) -> bytes:
+	chunks = []
+	for i in range(count):
+		assetPath = f'C:\\Projects\\Library\\Textures\\set_{i % 97:03d}\\texture_{i:06d}_diffuse.png'
+		chunks.append(uuid.uuid4().bytes_le)
+		chunks.append(b'\x00' * 4)
+		chunks.append('Bitmap'.encode('utf-16-le') + b'\x00\x00')
+		chunks.append(b'\x00' * 4)
+		chunks.append(assetPath.encode('utf-16-le') + b'\x00\x00')
+		if hasResolvedPath:
+			chunks.append(b'\x00' * 4)
+			chunks.append(assetPath.encode('utf-16-le') + b'\x00\x00')
+	return b''.join(chunks)
+
+def legacyReadStream(oleStream, hasResolvedPath: bool):
+	# The parser as it was before the buffered rewrite, kept for comparison
+	def bitToGUID(bits):
+		def lEndian(bData):
+			return codecs.encode((bData)[::-1], 'hex').decode()
+		return(lEndian(bits[:4])+lEndian(bits[4:6])+lEndian(bits[6:8])+bits[8:10].hex()+bits[10:16].hex())
+
+	def readStreamByByte(stream, nBytes):
+		while True:
+			c = stream.read(nBytes)
+			if c == b'\x00\x00' or c == b'':
+				break
+			yield (str(c,'utf-16-le','ignore'))
+
+	while True:
+		oleAsset = OleAsset()
+		buf = oleStream.read(16)
+		if buf == b'':
+			break
+		oleAsset.guid = bitToGUID(buf)
+		oleStream.read(4)
+		buf = ''
+		for b in readStreamByByte(oleStream, 2):
+			buf = buf + b
+		oleAsset.assetType = buf
+		oleStream.read(4)
+		buf = ''
+		for b in readStreamByByte(oleStream, 2):
+			buf = buf + b
+		oleAsset.assetPath = buf
+		if hasResolvedPath:
+			oleStream.read(4)
+			buf = ''
+			for b in readStreamByByte(oleStream, 2):
+				buf = buf + b
+			oleAsset.resolvedPath = buf
+		yield oleAsset
+
+def timeParser(fn, data: bytes, hasResolvedPath: bool):
+	start = time.perf_counter()
+	records = list(fn(io.BytesIO(data), hasResolvedPath))
+	return (records, time.perf_counter() - start)
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	maxZip = MaxFileZip(None, None)
+	
+	for streamName, hasResolvedPath in (('FileAssetMetaData2', False), ('FileAssetMetaData3', True)):
+		data = buildStream(count, hasResolvedPath)
+		oldRecords, oldTime = timeParser(legacyReadStream, data, hasResolvedPath)
+		newRecords, newTime = timeParser(maxZip.readStream, data, hasResolvedPath)
+		
+		if oldRecords != newRecords:
+			print(f'{streamName}: parsers disagree')
+			sys.exit(1)
+
+		print(f'{streamName}: {count} records, {len(data)/1048576:.1f} MB')
+		print(f'  before: {count/oldTime:12,.0f} records/s')
+		print(f'  after:  {count/newTime:12,.0f} records/s  ({oldTime/newTime:.1f}x)')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,74 @@
+'''
+Benchmark for the dry-run archive planner.
+Plans a generated project into a single zip, then archives it and
+compares the plan with the result, with and without a compression
+policy. Fails when the plan writes anything, its bytes to read differ
+from what the archive wrote, the compressed size is off by more than
+10% or the time by more than a factor of 2.
+
+Usage: python benchmarks/bench_plan.py [scenes] [assetsPerScene] [assetKB]
+'''
+import os
+import sys
+import time
+import tempfile
+
+from pathlib import Path, PurePath
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.MaxZipFile import MaxFileZip
+from lib.CompressionPolicy import CompressionPolicy
+from maxfixture import makeProject
+
+
+def main():
+	scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+	assets = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+	assetKB = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+
+	failed = False
+	with tempfile.TemporaryDirectory() as directory:
+		project = makeProject(os.path.join(directory, 'project'), scenes=scenes, assets=assets, xrefDepth=1, shared=20, missing=1, assetBytes=assetKB * 1024)
+		print(f'{scenes} scenes, {len(project.assetFiles)} assets of {assetKB} KB')
+
+		for label, policy in (('deflate all', None), ('policy', CompressionPolicy())):
+			outDir = PurePath(directory, label.replace(' ', '_'))
+			os.makedirs(outDir)
+			maxZip = MaxFileZip(dict(enumerate(project.scenes)), outDir, outDir.joinpath('project.zip'), True, policy=policy)
+			start = time.perf_counter()
+			plan = maxZip.plan()
+			planSeconds = time.perf_counter() - start
+			if os.listdir(outDir):
+				print(f'FAIL: planning wrote {os.listdir(outDir)}')
+				failed = True
+
+			start = time.perf_counter()
+			result = maxZip.main()
+			seconds = time.perf_counter() - start
+			zipBytes = os.path.getsize(result.zipFile)
+
+			print(f'  {label}')
+			print(f'    plan        {planSeconds:7.3f} s  {plan.sampledFiles} files sampled, read {plan.readRate / 1048576:.0f} MB/s, '
+				f'deflate {plan.deflateRate / 1048576:.0f} MB/s, write {plan.writeRate / 1048576:.0f} MB/s')
+			print(f'    read        {plan.uniqueBytes / 1048576:9.1f} MB planned  {result.writtenBytes / 1048576:9.1f} MB archived  '
+				f'({plan.rawBytes / 1048576:.1f} MB counting shared files per scene)')
+			print(f'    zip         {plan.compressedBytes / 1048576:9.1f} MB planned  {zipBytes / 1048576:9.1f} MB written')
+			print(f'    time        {plan.seconds:9.2f} s  planned  {seconds:9.2f} s  taken')
+
+			if plan.uniqueBytes != result.writtenBytes or plan.missingFiles != result.missingFiles:
+				print('FAIL: the plan reads different files than the archive')
+				failed = True
+			if abs(plan.compressedBytes - zipBytes) > zipBytes * 0.1:
+				print('FAIL: the planned zip size is off by more than 10%')
+				failed = True
+			if not seconds / 2 <= plan.seconds <= seconds * 2:
+				print('FAIL: the planned time is off by more than a factor of 2')
+				failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
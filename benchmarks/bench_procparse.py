@@ -0,0 +1,91 @@
+'''
+Scaling benchmark for the process pool parser.
+Writes a batch of scenes with large asset tables, then parses all of
+them with threads and with ProcessParser for growing worker counts and
+reports scenes per second against one thread. Fails when the backends
+return different assets, or, on a machine with two or more cores, when
+two worker processes are not clearly faster than one thread.
+
+Usage: python benchmarks/bench_procparse.py [scenes] [assetsPerScene]
+'''
+import os
+import sys
+import time
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.MaxZipFile import MaxFileZip
+from lib.ParsePool import ProcessParser
+from maxfixture import writeMaxFile
+
+
+def writeScenes(directory: str, scenes: int, assets: int) -> list:
+	files = []
+	for i in range(scenes):
+		assetRows = [('Bitmap', f'P:\\Projects\\Job_{i:04d}\\Maps\\texture_{n:05d}_diffuse.png', f'P:\\Projects\\Job_{i:04d}\\Maps\\texture_{n:05d}_diffuse.png') for n in range(assets)]
+		fileName = os.path.join(directory, f'scene_{i:04d}.max')
+		writeMaxFile(fileName, assetRows)
+		files.append(fileName)
+	return files
+
+def parseThreads(files: list, workers: int) -> tuple:
+	reader = MaxFileZip({}, None)
+	start = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		results = list(pool.map(reader.readAssetsFromOle, files))
+	return time.perf_counter() - start, results
+
+def parseProcesses(files: list, workers: int) -> tuple:
+	# Pool start up is part of the time, as it is for a real batch
+	start = time.perf_counter()
+	parser = ProcessParser(workers)
+	try:
+		parser.prefetch(files)
+		results = [parser.parse(file) for file in files]
+	finally:
+		parser.close()
+	return time.perf_counter() - start, results
+
+def main():
+	scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+	assets = int(sys.argv[2]) if len(sys.argv) > 2 else 1500
+	cores = os.cpu_count() or 1
+	workerCounts = sorted({1, 2, cores} | {n for n in (4, 8, 16) if n < cores})
+
+	failed = False
+	with tempfile.TemporaryDirectory() as directory:
+		files = writeScenes(directory, scenes, assets)
+		print(f'{scenes} scenes of {assets} assets, {cores} cores')
+
+		baseline, expected = parseThreads(files, 1)
+		print(f'  {"threads, 1":16} {scenes / baseline:8.1f} scenes/s  1.00x')
+
+		speedups = {}
+		for backend, parse in (('threads', parseThreads), ('processes', parseProcesses)):
+			for workers in workerCounts:
+				if backend == 'threads' and workers == 1:
+					continue
+				seconds, results = parse(files, workers)
+				speedups[(backend, workers)] = baseline / seconds
+				print(f'  {backend + ", " + str(workers):16} {scenes / seconds:8.1f} scenes/s  {baseline / seconds:4.2f}x')
+				if results != expected:
+					print(f'FAIL: {backend} with {workers} workers returned different assets')
+					failed = True
+
+	if cores >= 2:
+		if speedups[('processes', 2)] < 1.3:
+			print('FAIL: two worker processes are not faster than one thread')
+			failed = True
+	else:
+		print('Single core, scaling is not checked')
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
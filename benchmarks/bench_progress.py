@@ -0,0 +1,76 @@
+'''
+Check and benchmark for ProgressChannel.
+Simulates archive workers reporting progress once per asset and
+counts the events the channel delivers. Fails when more events arrive
+than the rate allows or a row's final value is not delivered.
+
+Usage: python benchmarks/bench_progress.py [assets] [rows] [seconds] [rate]
+'''
+import sys
+import time
+import threading
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.ProgressChannel import ProgressChannel
+
+
+def simulate(assets: int, rows: int, seconds: float, rate: float) -> tuple:
+	"""Reports progress for every asset of every row over roughly seconds
+
+	Returns:
+		tuple: (elapsed seconds, ProgressChannel, {row: delivered values})
+	"""
+	received = {row: [] for row in range(rows)}
+	receivedLock = threading.Lock()
+
+	def deliver(progress):
+		row, value = progress
+		with receivedLock:
+			received[row].append(value)
+
+	perAsset = seconds / (assets * rows)
+	start = time.perf_counter()
+	with ProgressChannel(deliver, rate) as channel:
+		for row in range(rows):
+			for count in range(assets):
+				# Stands in for the time it takes to archive an asset
+				deadline = start + (row * assets + count + 1) * perAsset
+				while time.perf_counter() < deadline:
+					pass
+				channel.update(row, round((count + 1) / assets * 100, 2))
+	return (time.perf_counter() - start, channel, received)
+
+def main():
+	assets = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+	rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+	seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+	rate = float(sys.argv[4]) if len(sys.argv) > 4 else 30.0
+
+	elapsed, channel, received = simulate(assets, rows, seconds, rate)
+	# One batch per interval, plus the first and the final flush
+	allowedBatches = elapsed * rate + 2
+	allowed = allowedBatches * rows
+
+	print(f'{channel.updates} updates in {elapsed:.2f}s, {channel.delivered} events delivered '
+		f'in {channel.batches} batches ({channel.delivered / channel.updates * 100:.3f}%)')
+
+	failed = False
+	if channel.batches > allowedBatches or channel.delivered > allowed:
+		print(f'FAIL: more than {allowedBatches:.0f} batches or {allowed:.0f} events at {rate:g} Hz')
+		failed = True
+	for row, values in received.items():
+		if not values or values[-1] != 100.0:
+			print(f'FAIL: row {row} ended at {values[-1] if values else None}')
+			failed = True
+		elif values != sorted(values):
+			print(f'FAIL: row {row} values delivered out of order')
+			failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,113 @@
+'''
+Benchmark for relocating missing assets.
+Moves a generated project into a large search tree that also holds
+decoy folders with the same file names, then times a cold index build,
+a build from the cache, an incremental refresh after a few folders
+changed, and lookups against a naive os.walk search. Fails when an asset
+is relocated to a decoy, or an archive of the moved scenes still
+reports assets as missing.
+
+Usage: python benchmarks/bench_relocate.py [folders] [filesPerFolder]
+'''
+import os
+import sys
+import time
+import shutil
+import zipfile
+import tempfile
+
+from pathlib import Path, PurePath
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.MaxZipFile import MaxFileZip
+from lib.Relocator import AssetIndex, Relocator
+from maxfixture import makeProject
+
+
+def writeTree(root: str, folders: int, filesPerFolder: int, decoyNames: list):
+	# Empty files, a tenth of the folders hold decoys named like the project's maps
+	for i in range(folders):
+		folder = os.path.join(root, f'job_{i:04d}', 'maps')
+		os.makedirs(folder)
+		names = [f'file_{i:04d}_{n:05d}.png' for n in range(filesPerFolder)]
+		if i % 10 == 0:
+			names += decoyNames
+		for name in names:
+			open(os.path.join(folder, name), 'wb').close()
+
+def naiveFind(roots: list, name: str) -> list:
+	found = []
+	for root in roots:
+		for directory, dirs, files in os.walk(root):
+			found += [os.path.join(directory, f) for f in files if f.lower() == name.lower()]
+	return found
+
+def timed(fn) -> float:
+	start = time.perf_counter()
+	fn()
+	return time.perf_counter() - start
+
+def main():
+	folders = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+	filesPerFolder = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+
+	failed = False
+	with tempfile.TemporaryDirectory() as directory:
+		oldRoot = os.path.join(directory, 'old', 'ProjectX')
+		project = makeProject(oldRoot, scenes=10, assets=30, shared=10, assetBytes=1024)
+		tree = os.path.join(directory, 'tree')
+		writeTree(tree, folders, filesPerFolder, [os.path.basename(assetFile) for assetFile in project.assetFiles[:50]])
+		newRoot = os.path.join(tree, 'moved', 'ProjectX')
+		shutil.move(oldRoot, newRoot)
+		cacheFile = os.path.join(directory, 'index.sqlite')
+
+		index = AssetIndex([tree], 8, cacheFile)
+		coldSeconds = timed(index.build)
+		files = index.fileCount()
+		cachedSeconds = timed(AssetIndex([tree], 8, cacheFile).build)
+		for i in range(0, folders, folders // 5):
+			open(os.path.join(tree, f'job_{i:04d}', 'maps', 'added.png'), 'wb').close()
+		refreshed = AssetIndex([tree], 8, cacheFile)
+		refreshSeconds = timed(refreshed.build)
+		print(f'{files} files in {index.listedDirs} folders')
+		print(f'  cold build    {coldSeconds:7.3f} s')
+		print(f'  from cache    {cachedSeconds:7.3f} s')
+		print(f'  refresh       {refreshSeconds:7.3f} s  {refreshed.listedDirs} folders listed again')
+		if refreshed.lookup('added.png') == [] or refreshed.listedDirs > 10:
+			print('FAIL: the refresh did not pick up exactly the changed folders')
+			failed = True
+
+		relocator = Relocator([tree], cacheFile=cacheFile)
+		relocator.ensureIndex()
+		missing = project.assetFiles
+		start = time.perf_counter()
+		relocations = [relocator.relocate(assetFile) for assetFile in missing]
+		lookupSeconds = time.perf_counter() - start
+		naiveSeconds = timed(lambda: [naiveFind([tree], os.path.basename(assetFile)) for assetFile in missing[:5]]) / 5
+		print(f'  lookup        {lookupSeconds / len(missing) * 1e6:7.1f} us per asset')
+		print(f'  os.walk       {naiveSeconds * 1e6:7.0f} us per asset')
+
+		wrong = [relocation for relocation, assetFile in zip(relocations, missing)
+			if relocation is None or relocation.path != assetFile.replace(oldRoot, newRoot)]
+		if wrong:
+			print(f'FAIL: {len(wrong)} of {len(missing)} assets relocated to the wrong file')
+			failed = True
+
+		outDir = PurePath(directory, 'out')
+		os.makedirs(outDir)
+		scenes = {row: scene.replace(oldRoot, newRoot) for row, scene in enumerate(project.scenes)}
+		result = MaxFileZip(scenes, outDir, outDir.joinpath('moved.zip'), True, relocator=relocator).main()
+		with zipfile.ZipFile(result.zipFile) as archFile:
+			relocatedReport = archFile.read('Relocated Files.txt').decode().splitlines()
+		print(f'  archive       {result.relocatedFiles} relocated, {result.missingFiles} missing')
+		if result.missingFiles or result.relocatedFiles != len(set(project.assetFiles)) or len(relocatedReport) != result.relocatedFiles:
+			print('FAIL: the archive of the moved project is incomplete')
+			failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,106 @@
+'''
+Benchmark for the asset report behind "List All File Assets".
+Lists a generated project of about 100k scene/asset rows three ways:
+the old loop that parses scene after scene and keeps every path, a
+report that collects all rows before writing them, and AssetReport,
+which parses ahead on a pool and writes each scene as it is walked.
+Reports time and the peak of Python allocations. Fails when the CSV
+rows differ from the fixture's closures or AssetReport holds more
+memory than the collect-then-write report.
+
+Usage: python benchmarks/bench_report.py [scenes] [sharedAssets] [ownAssets]
+'''
+import os
+import sys
+import csv
+import time
+import tempfile
+import tracemalloc
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.MaxZipFile import MaxFileZip
+from lib.AssetReport import AssetReport, REPORT_FIELDS
+from maxfixture import makeProject
+
+
+def measure(fn) -> tuple:
+	# (seconds, peak traced bytes, result), tracing slows Python down so it gets a run of its own
+	start = time.perf_counter()
+	result = fn()
+	seconds = time.perf_counter() - start
+	tracemalloc.start()
+	fn()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return seconds, peak, result
+
+def oldLoop(scenes: list, fileName: str) -> int:
+	# What the button did before, sequential parsing and one sorted list at the end
+	maxZip = MaxFileZip({}, None)
+	allAssetsPaths = set()
+	for scene in scenes:
+		allAssetsPaths.update(maxZip.collectAssetsPathsFromFile(scene))
+	with open(fileName, 'w') as f:
+		for assetPath in sorted(allAssetsPaths):
+			f.write(assetPath + '\n')
+	return len(allAssetsPaths)
+
+def collectThenWrite(scenes: list, fileName: str) -> int:
+	maxZip = MaxFileZip({}, None)
+	report = AssetReport(maxZip)
+	rows = []
+	for scene in scenes:
+		rows += report.sceneRows(scene)
+	with open(fileName, 'w', newline='') as f:
+		writer = csv.writer(f)
+		writer.writerow(REPORT_FIELDS)
+		writer.writerows([row[field] for field in REPORT_FIELDS] for row in rows)
+	return len(rows)
+
+def streamed(scenes: list, fileName: str) -> int:
+	return AssetReport(MaxFileZip({}, None)).write(dict(enumerate(scenes)), fileName)['rows']
+
+def main():
+	scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+	shared = int(sys.argv[2]) if len(sys.argv) > 2 else 450
+	own = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+	failed = False
+	with tempfile.TemporaryDirectory() as directory:
+		project = makeProject(os.path.join(directory, 'project'), scenes=scenes, assets=own, shared=shared, missing=1, assetBytes=16)
+		expected = sum(len(closure) for closure in project.closures.values())
+		print(f'{scenes} scenes, {expected} scene/asset rows')
+
+		results = {}
+		for name, fn in (('old loop', oldLoop), ('collect', collectThenWrite), ('streamed', streamed)):
+			fileName = os.path.join(directory, name.replace(' ', '_') + '.csv')
+			seconds, peak, rows = measure(lambda: fn(project.scenes, fileName))
+			results[name] = (seconds, peak)
+			print(f'  {name:9} {seconds:7.2f} s  {peak / 1048576:7.1f} MB peak  {rows} rows')
+
+		with open(os.path.join(directory, 'streamed.csv'), newline='') as f:
+			reportRows = list(csv.DictReader(f))
+		closures = {}
+		for row in reportRows:
+			closures.setdefault(row['scene'], set()).add(row['asset'])
+		if len(reportRows) != expected or any(closures.get(scene) != set(closure) for scene, closure in project.closures.items()):
+			print('FAIL: report rows differ from the fixture closures')
+			failed = True
+		missing = sum(1 for row in reportRows if row['exists'] == 'False')
+		if missing != len(project.missingFiles):
+			print(f'FAIL: {missing} rows marked missing, expected {len(project.missingFiles)}')
+			failed = True
+
+	if results['streamed'][1] >= results['collect'][1]:
+		print('FAIL: the streamed report holds as much memory as collecting all rows')
+		failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
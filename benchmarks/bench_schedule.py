@@ -0,0 +1,168 @@
+'''
+Makespan simulation for JobScheduler.
+Random batches of scenes with heavy tailed sizes spread over a fast
+local drive, a NAS share and a USB disk are "archived" in an event
+simulation. A job reads at most cpuRate bytes per second (compression),
+a volume's bandwidth is shared by its running jobs and drops with every
+extra reader on seeking media. The old fixed pool of two jobs in table
+order is compared with the scheduler driving the same simulation, then
+again with every scene on the local drive.
+Fails when the scheduler is slower on average than the old pool or a
+volume limit is exceeded.
+
+Usage: python benchmarks/bench_schedule.py [batches] [jobs] [seed]
+'''
+import sys
+import random
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lib.JobScheduler import JobScheduler
+
+MB = 1048576
+# Compression and zip writing of one job
+CPU_RATE = 120 * MB
+# volume -> (bytes per second, bandwidth lost per extra reader)
+VOLUMES = {
+	'C:': (450 * MB, 0.0),
+	'//nas/projects': (110 * MB, 0.15),
+	'E:': (40 * MB, 0.35),
+}
+
+
+def jobRates(running: list) -> dict:
+	# running: [(job id, volume)] -> job id -> bytes per second
+	readers = {}
+	for jobId, volume in running:
+		readers[volume] = readers.get(volume, 0) + 1
+	rates = {}
+	for jobId, volume in running:
+		bandwidth, seekLoss = VOLUMES[volume]
+		count = readers[volume]
+		share = bandwidth / (1 + seekLoss * (count - 1)) / count
+		rates[jobId] = min(CPU_RATE, share)
+	return rates
+
+def simulate(jobs: list, scheduler: JobScheduler) -> tuple:
+	"""Runs jobs [(bytes, volume)] through the scheduler
+
+	Returns:
+		tuple: (makespan seconds, highest concurrent jobs per volume)
+	"""
+	for jobId, (size, volume) in enumerate(jobs):
+		scheduler.add(jobId, size, volume)
+
+	now = 0.0
+	left = {}
+	running = {}
+	peak = {}
+	while True:
+		scheduledJob = scheduler.next()
+		while scheduledJob is not None:
+			running[scheduledJob.job] = scheduledJob
+			left[scheduledJob.job] = jobs[scheduledJob.job][0]
+			scheduledJob = scheduler.next()
+		if not running:
+			return now, peak
+
+		for volume, count in scheduler.busy.items():
+			peak[volume] = max(peak.get(volume, 0), count)
+
+		rates = jobRates([(jobId, job.volume) for jobId, job in running.items()])
+		step = min(left[jobId] / rates[jobId] for jobId in running)
+		now += step
+		for jobId in list(running):
+			left[jobId] -= rates[jobId] * step
+			if left[jobId] <= 1e-6:
+				scheduler.done(running.pop(jobId))
+
+def randomJobs(count: int, rng: random.Random) -> list:
+	# Mostly small scenes with a few very large ones
+	volumes = list(VOLUMES)
+	return [(int(min(rng.paretovariate(1.2), 200) * 20 * MB), rng.choice(volumes)) for _ in range(count)]
+
+def lowerBound(jobs: list) -> float:
+	# No schedule beats the slowest volume reading alone or the largest job at full speed
+	perVolume = {}
+	for size, volume in jobs:
+		perVolume[volume] = perVolume.get(volume, 0) + size
+	volumeBound = max(total / VOLUMES[volume][0] for volume, total in perVolume.items())
+	jobBound = max(size / min(CPU_RATE, VOLUMES[volume][0]) for size, volume in jobs)
+	return max(volumeBound, jobBound)
+
+class FixedPool(JobScheduler):
+	# The old QThreadPool of two threads, jobs start in table order
+	def next(self):
+		with self._lock:
+			if len(self.running) >= self.maxJobs or not self.pending:
+				return None
+			scheduledJob = self.pending.pop(0)
+			self.running.append(scheduledJob)
+			self.busy[scheduledJob.volume] = self.busy.get(scheduledJob.volume, 0) + 1
+			return scheduledJob
+
+POLICIES = {
+	'fixed pool, 2 jobs, table order': lambda: FixedPool(2, 2, largestFirst=False),
+	'scheduler, 2 jobs': lambda: JobScheduler(2, 2),
+	'scheduler, 4 jobs, 2 per volume': lambda: JobScheduler(4, 2),
+	'scheduler, 4 jobs, USB 1': lambda: JobScheduler(4, 2, {'E:': 1}),
+}
+
+def compare(title: str, batches: int, count: int, rng: random.Random) -> bool:
+	"""Prints the mean makespan of every policy over random batches
+
+	Returns:
+		bool: True if a check failed
+	"""
+	totals = {name: 0.0 for name in POLICIES}
+	worst = {name: 0.0 for name in POLICIES}
+	bound = 0.0
+	failed = False
+
+	for batch in range(batches):
+		jobs = randomJobs(count, rng)
+		lower = lowerBound(jobs)
+		bound += lower
+		for name, newScheduler in POLICIES.items():
+			scheduler = newScheduler()
+			makespan, peak = simulate(jobs, scheduler)
+			totals[name] += makespan
+			worst[name] = max(worst[name], makespan / lower)
+			for volume, concurrent in peak.items():
+				if concurrent > scheduler.volumeLimit(volume):
+					print(f'FAIL: {name} ran {concurrent} jobs on {volume}')
+					failed = True
+
+	print(f'{title}, {batches} batches of {count} jobs, mean makespan')
+	print(f'  {"lower bound":34} {bound / batches:8.1f} s')
+	baseline = totals['fixed pool, 2 jobs, table order']
+	for name, total in totals.items():
+		print(f'  {name:34} {total / batches:8.1f} s  {baseline / total:5.2f}x  worst {worst[name]:4.2f}x bound')
+
+	for name, total in totals.items():
+		if name.startswith('scheduler') and total > baseline * 1.001:
+			print(f'FAIL: {name} is slower than the fixed pool')
+			failed = True
+	return failed
+
+def main():
+	batches = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+	count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+	seed = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+	rng = random.Random(seed)
+
+	failed = compare('Local drive, NAS and USB disk', batches, count, rng)
+
+	# Everything on the local drive, only the order differs
+	local = VOLUMES['C:']
+	VOLUMES.clear()
+	VOLUMES['C:'] = local
+	failed = compare('Local drive only', batches, count, rng) or failed
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,105 @@
+'''
+Benchmark for shared assets mode.
+Writes scenes that share a texture library, archives them once per
+scene and once with SharedAssetsArchiver, and compares output size and
+time. Fails when a scene zip plus the shared files its manifest lists
+differs from the plain per-scene zip, or shared mode is not smaller.
+
+Usage: python benchmarks/bench_shared.py [scenes] [libraryFiles] [fileKB]
+'''
+import os
+import sys
+import json
+import time
+import zipfile
+import tempfile
+
+from pathlib import Path, PurePath
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.MaxZipFile import MaxFileZip
+from lib.JobScheduler import JobScheduler
+from lib.SharedAssets import MANIFEST_NAME, SharedAssetsArchiver
+from maxfixture import writeMaxFile
+
+REPORTS = {'Missing Files.txt', MANIFEST_NAME}
+
+
+def writeScenes(directory: str, scenes: int, libraryFiles: int, fileBytes: int) -> dict:
+	# Every scene uses the whole library and two textures of its own
+	def writeMap(name):
+		fileName = os.path.join(directory, 'maps', name)
+		with open(fileName, 'wb') as f:
+			f.write(os.urandom(fileBytes))
+		return fileName
+
+	os.makedirs(os.path.join(directory, 'maps'))
+	library = [writeMap(f'library_{i:03d}.png') for i in range(libraryFiles)]
+	rows = {}
+	for row in range(scenes):
+		own = [writeMap(f'scene_{row:03d}_{i}.png') for i in range(2)]
+		fileName = os.path.join(directory, f'scene_{row:03d}.max')
+		writeMaxFile(fileName, [('Bitmap', mapFile, mapFile) for mapFile in library + own])
+		rows[row] = fileName
+	return rows
+
+def outputBytes(directory: str) -> int:
+	return sum(path.stat().st_size for path in Path(directory).glob('*.zip'))
+
+def main():
+	scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+	libraryFiles = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+	fileBytes = (int(sys.argv[3]) if len(sys.argv) > 3 else 256) * 1024
+
+	failed = False
+	with tempfile.TemporaryDirectory() as directory:
+		rows = writeScenes(os.path.join(directory, 'scenes'), scenes, libraryFiles, fileBytes)
+		perScene = PurePath(directory, 'perScene')
+		shared = PurePath(directory, 'shared')
+		os.makedirs(perScene)
+		os.makedirs(shared)
+
+		start = time.perf_counter()
+		scheduler = JobScheduler()
+		for row, fileName in rows.items():
+			scheduler.add(MaxFileZip({row: fileName}, perScene), 0, '')
+		scheduler.runAll(lambda maxZip: maxZip.main())
+		perSceneSeconds = time.perf_counter() - start
+
+		start = time.perf_counter()
+		archiver = SharedAssetsArchiver(rows, shared, 'Shared Assets', lambda rows, zipFile: MaxFileZip(rows, shared, zipFile))
+		result = archiver.main()
+		sharedSeconds = time.perf_counter() - start
+
+		perSceneBytes = outputBytes(perScene)
+		sharedBytes = outputBytes(shared)
+		print(f'{scenes} scenes sharing {libraryFiles} files of {fileBytes // 1024} KB')
+		print(f'  per scene  {perSceneBytes/1048576:8.1f} MB  {perSceneSeconds:6.2f} s')
+		print(f'  shared     {sharedBytes/1048576:8.1f} MB  {sharedSeconds:6.2f} s')
+		print(f'  reported   {result.savedBytes/1048576:8.1f} MB  {result.savedSeconds:6.2f} s saved')
+
+		with zipfile.ZipFile(result.zipFile) as commonZip:
+			common = set(commonZip.namelist())
+		for row, fileName in rows.items():
+			zipName = os.path.basename(fileName) + '.zip'
+			with zipfile.ZipFile(perScene.joinpath(zipName)) as plainZip:
+				expected = set(plainZip.namelist()) - REPORTS
+			with zipfile.ZipFile(shared.joinpath(zipName)) as sceneZip:
+				names = set(sceneZip.namelist())
+				listed = json.loads(sceneZip.read(MANIFEST_NAME))['files'] if MANIFEST_NAME in names else []
+			listedNames = {entry['name'] for entry in listed}
+			if (names - REPORTS) | listedNames != expected or not listedNames <= common:
+				print(f'FAIL: {zipName} and its shared files differ from the per scene zip')
+				failed = True
+
+	if sharedBytes >= perSceneBytes:
+		print('FAIL: shared assets mode is not smaller')
+		failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
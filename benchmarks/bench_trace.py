@@ -0,0 +1,88 @@
+'''
+Overhead benchmark for archive tracing.
+Times a span of the disabled tracer and of an enabled one, then archives
+a generated project with and without a Tracer. Fails when the exported
+trace is not valid Chrome trace JSON or misses a phase, or when tracing
+makes the archive more than the tolerance slower.
+
+Usage: python benchmarks/bench_trace.py [scenes] [assetsPerScene] [tolerance]
+'''
+import os
+import sys
+import json
+import time
+import tempfile
+
+from pathlib import Path, PurePath
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.MaxZipFile import MaxFileZip
+from lib.Tracer import NULL_TRACER, Tracer
+from maxfixture import makeProject
+
+PHASES = {'ole open', 'stream read', 'stream parse', 'walk', 'exists', 'list dir', 'stat', 'deflate', 'wait', 'write', 'archive'}
+
+
+def spanNanoseconds(tracer, count: int) -> float:
+	start = time.perf_counter()
+	for _ in range(count):
+		with tracer.span('stat', 'stat', file='x') as span:
+			span.set(size=0)
+	return (time.perf_counter() - start) / count * 1e9
+
+def archive(rows: dict, outDir: PurePath, tracer) -> float:
+	start = time.perf_counter()
+	MaxFileZip(rows, outDir, outDir.joinpath('trace.zip'), True, tracer=tracer).main()
+	return time.perf_counter() - start
+
+def main():
+	scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+	assets = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+	tolerance = float(sys.argv[3]) if len(sys.argv) > 3 else 0.15
+
+	failed = False
+	print(f'  disabled span {spanNanoseconds(NULL_TRACER, 200000):8.0f} ns')
+	print(f'  enabled span  {spanNanoseconds(Tracer(), 200000):8.0f} ns')
+
+	with tempfile.TemporaryDirectory() as directory:
+		project = makeProject(os.path.join(directory, 'project'), scenes=scenes, assets=assets, xrefDepth=1, shared=10, missing=1, assetBytes=32 * 1024)
+		rows = dict(enumerate(project.scenes))
+		outDir = PurePath(directory)
+
+		# Alternating runs so both see the same page cache and load
+		plain = []
+		traced = []
+		for _ in range(5):
+			plain.append(archive(rows, outDir, None))
+			tracer = Tracer()
+			traced.append(archive(rows, outDir, tracer))
+		overhead = min(traced) / min(plain) - 1
+		print(f'{scenes} scenes of {assets} assets')
+		print(f'  untraced {min(plain):7.3f} s')
+		print(f'  traced   {min(traced):7.3f} s  {overhead * 100:+.1f}%  {len(tracer.events)} spans')
+
+		traceFile = os.path.join(directory, 'trace.json')
+		tracer.export(traceFile, traceFile + '.summary.txt')
+		with open(traceFile, 'r') as f:
+			events = json.load(f)['traceEvents']
+		spans = [event for event in events if event['ph'] == 'X']
+		missing = PHASES - {event['name'] for event in spans}
+		if missing:
+			print(f'FAIL: trace has no {", ".join(sorted(missing))} spans')
+			failed = True
+		if any(event['dur'] < 0 or event['ts'] < 0 for event in spans):
+			print('FAIL: trace has negative timestamps or durations')
+			failed = True
+		print(Path(traceFile + '.summary.txt').read_text())
+
+	if overhead > tolerance:
+		print(f'FAIL: tracing adds more than {tolerance * 100:.0f}%')
+		failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
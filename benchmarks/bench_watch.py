@@ -0,0 +1,112 @@
+'''
+Benchmark for the watch-folder pre-scan.
+Times the scan step of a batch job (parse every scene with its XRefs
+and stat the assets) against an empty asset cache and against one
+filled by PreScanner, then measures how long a scene copied into the
+watched folder takes to be pre-scanned with inotify and with polling.
+Fails when the pre-scanned job parses a scene again, sizes the job
+differently, or is not faster than the cold one.
+
+Usage: python benchmarks/bench_watch.py [scenes] [assetsPerScene]
+'''
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.AssetCache import AssetCache
+from lib.FolderWatch import InotifyWatcher, PreScanner
+from lib.MaxZipFile import MaxFileZip
+from maxfixture import makeProject
+
+
+def scanStep(scenes: list, cache: AssetCache) -> tuple:
+	# (seconds, bytes of the job, scenes parsed from disk)
+	maxZip = MaxFileZip(dict(enumerate(scenes)), None, cache=cache)
+	parsed = []
+	readAssetsFromOle = maxZip.readAssetsFromOle
+	maxZip.readAssetsFromOle = lambda file: (parsed.append(file), readAssetsFromOle(file))[1]
+	start = time.perf_counter()
+	nBytes = maxZip.estimateBytes()
+	return time.perf_counter() - start, nBytes, len(parsed)
+
+def waitFor(events: list, count: int, timeout: float) -> float:
+	start = time.perf_counter()
+	while len(events) < count and time.perf_counter() - start < timeout:
+		time.sleep(0.01)
+	return time.perf_counter() - start
+
+def backdate(directory: str):
+	# Listings of directories changed in the last seconds are not stored
+	past = time.time() - 60
+	for root, dirs, files in os.walk(directory):
+		os.utime(root, (past, past))
+
+def main():
+	scenes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	assets = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+	failed = False
+	with tempfile.TemporaryDirectory() as directory:
+		project = makeProject(os.path.join(directory, 'project'), scenes=scenes, assets=assets, xrefDepth=2, shared=100, assetBytes=16)
+		backdate(project.directory)
+		print(f'{scenes} scenes, {len(project.assetFiles)} assets')
+
+		coldSeconds, coldBytes, coldParsed = scanStep(project.scenes, AssetCache(os.path.join(directory, 'cold.sqlite')))
+		print(f'  cold scan       {coldSeconds:7.3f} s  {coldParsed} scenes parsed')
+
+		cache = AssetCache(os.path.join(directory, 'watched.sqlite'))
+		events = []
+		preScanner = PreScanner([project.directory], cache, interval=0.2, settleSeconds=0.2)
+		preScanner.start(progress_finished=events.append)
+		# Every max file of the project, XRef scenes included
+		expected = len(project.scenes) + len(project.xrefs)
+		seconds = waitFor(events, expected, 120)
+		preScanner.stop()
+		print(f'  pre-scan        {seconds:7.3f} s  {len(events)} scenes')
+
+		warmSeconds, warmBytes, warmParsed = scanStep(project.scenes, cache)
+		print(f'  pre-scanned     {warmSeconds:7.3f} s  {warmParsed} scenes parsed')
+		if warmParsed:
+			print(f'FAIL: {warmParsed} scenes were parsed again after the pre-scan')
+			failed = True
+		if warmBytes != coldBytes:
+			print(f'FAIL: the job is {warmBytes} bytes after the pre-scan, {coldBytes} cold')
+			failed = True
+		if warmSeconds >= coldSeconds:
+			print('FAIL: the pre-scanned scan step is not faster')
+			failed = True
+
+		# Latency of a new scene, settle time included
+		modes = [('polling', True)]
+		try:
+			InotifyWatcher([]).close()
+			modes.insert(0, ('inotify', False))
+		except OSError:
+			print('  inotify         not available')
+		for label, polling in modes:
+			watched = os.path.join(directory, 'watch_' + label)
+			os.makedirs(watched)
+			events = []
+			preScanner = PreScanner([watched], AssetCache(os.path.join(directory, label + '.sqlite')), interval=1.0, settleSeconds=0.5, polling=polling)
+			preScanner.start(progress_finished=events.append)
+			time.sleep(0.2)
+			shutil.copy(project.scenes[0], os.path.join(watched, 'new.max'))
+			seconds = waitFor(events, 1, 10)
+			preScanner.stop()
+			print(f'  new scene {label:7} {seconds:5.2f} s to pre-scan (settle 0.5 s, poll 1 s)')
+			if not events:
+				print(f'FAIL: {label} missed the new scene')
+				failed = True
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,258 @@
+'''
+Writes synthetic 3ds Max scene files for benchmarks.
+Only the OLE compound file structure and the FileAssetMetaData2/3
+stream ArchiveMax reads are produced, nothing 3ds Max could open.
+makeProject lays out a whole project, scenes with XRef chains and
+cycles, dummy asset files and the asset closure each scene should have.
+
+Usage: python benchmarks/maxfixture.py OUTDIR [--scenes N] [--assets N] [--path-length N]
+	[--xref-depth N] [--cycles N] [--shared N] [--missing N] [--asset-kb N] [--metadata 2|3]
+'''
+import os
+import sys
+import random
+import struct
+import uuid
+import argparse
+
+from dataclasses import dataclass, field
+
+SECTOR = 512
+MINISECTOR = 64
+CUTOFF = 4096
+FREESECT = 0xFFFFFFFF
+ENDOFCHAIN = 0xFFFFFFFE
+FATSECT = 0xFFFFFFFD
+DIFSECT = 0xFFFFFFFC
+NOSTREAM = 0xFFFFFFFF
+
+
+def assetStream(assets, hasResolvedPath):
+	# GUID, then each string after a 4 byte length, null terminated UTF-16
+	chunks = []
+	for assetType, assetPath, resolvedPath in assets:
+		chunks.append(uuid.uuid4().bytes_le)
+		for value, present in ((assetType, True), (assetPath, True), (resolvedPath, hasResolvedPath)):
+			if present:
+				chunks.append(struct.pack('<I', len(value) + 1))
+				chunks.append(value.encode('utf-16-le') + b'\x00\x00')
+	return b''.join(chunks)
+
+def writeCompoundFile(fileName, streams):
+	"""Writes a version 3 compound file, FAT sectors past the first 109 are listed in a DIFAT chain
+
+	Args:
+		fileName (str): File to write
+		streams (list): (name, bytes) of the root storage's streams
+	"""
+	sectors = []
+	fat = []
+
+	def allocate(data, unit, table, store):
+		# Sectors are views into data, large filler streams are not copied
+		view = memoryview(data)
+		count = (len(data) + unit - 1) // unit
+		start = len(table) if count else ENDOFCHAIN
+		for i in range(count):
+			table.append(len(table) + 1 if i < count - 1 else ENDOFCHAIN)
+			chunk = view[i * unit:(i + 1) * unit]
+			store.append(chunk if len(chunk) == unit else bytes(chunk).ljust(unit, b'\x00'))
+		return start
+
+	entries = []
+	miniSectors = []
+	miniFat = []
+	for name, data in streams:
+		if len(data) >= CUTOFF:
+			entries.append((name, 2, allocate(data, SECTOR, fat, sectors), len(data)))
+		else:
+			entries.append((name, 2, allocate(data, MINISECTOR, miniFat, miniSectors) if data else ENDOFCHAIN, len(data)))
+
+	miniStream = b''.join(miniSectors)
+	rootStart = allocate(miniStream, SECTOR, fat, sectors) if miniStream else ENDOFCHAIN
+	miniFatData = b''.join(struct.pack('<I', v) for v in miniFat)
+	miniFatStart = allocate(miniFatData, SECTOR, fat, sectors) if miniFatData else ENDOFCHAIN
+	miniFatCount = (len(miniFatData) + SECTOR - 1) // SECTOR
+
+	def dirEntry(name, entryType, child, right, start, size):
+		encoded = name.encode('utf-16-le')
+		return (encoded.ljust(64, b'\x00') + struct.pack('<HBBIII', len(encoded) + 2, entryType, 1, NOSTREAM, right, child)
+			+ b'\x00' * 16 + struct.pack('<I', 0) + b'\x00' * 16 + struct.pack('<IQ', start, size))
+
+	# Siblings chained through the right pointer in directory order
+	order = sorted(range(len(entries)), key=lambda i: (len(entries[i][0]), entries[i][0].upper()))
+	dirData = [dirEntry('Root Entry', 5, order[0] + 1 if order else NOSTREAM, NOSTREAM, rootStart, len(miniStream))]
+	rightOf = {order[i]: order[i + 1] + 1 for i in range(len(order) - 1)}
+	for i, (name, entryType, start, size) in enumerate(entries):
+		dirData.append(dirEntry(name, entryType, NOSTREAM, rightOf.get(i, NOSTREAM), start, size))
+	dirStart = allocate(b''.join(dirData), SECTOR, fat, sectors)
+
+	# FAT and DIFAT sectors describe themselves too
+	perSector = SECTOR // 4
+	fatCount = 0
+	difatCount = 0
+	while (len(fat) + fatCount + difatCount) > fatCount * perSector:
+		fatCount += 1
+		difatCount = max(0, fatCount - 109 + perSector - 2) // (perSector - 1)
+	fatStart = len(fat)
+	fat.extend([FATSECT] * fatCount)
+	difatStart = len(fat) if difatCount else ENDOFCHAIN
+	fat.extend([DIFSECT] * difatCount)
+	fatData = struct.pack(f'<{len(fat)}I', *fat).ljust(fatCount * SECTOR, b'\xff')
+	for i in range(fatCount):
+		sectors.append(fatData[i * SECTOR:(i + 1) * SECTOR])
+
+	fatSectors = [fatStart + i for i in range(fatCount)]
+	for i in range(difatCount):
+		listed = fatSectors[109 + i * (perSector - 1):109 + (i + 1) * (perSector - 1)]
+		nextDifat = difatStart + i + 1 if i < difatCount - 1 else ENDOFCHAIN
+		sectors.append(struct.pack(f'<{perSector}I', *(listed + [FREESECT] * (perSector - 1 - len(listed)) + [nextDifat])))
+
+	difat = fatSectors[:109] + [FREESECT] * (109 - min(fatCount, 109))
+	header = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 16 + struct.pack('<HHHHH', 0x3E, 3, 0xFFFE, 9, 6) + b'\x00' * 6
+		+ struct.pack('<IIIIIIIII', 0, fatCount, dirStart, 0, CUTOFF, miniFatStart, miniFatCount, difatStart, difatCount)
+		+ b''.join(struct.pack('<I', v) for v in difat))
+
+	with open(fileName, 'wb') as f:
+		f.write(header)
+		for sector in sectors:
+			f.write(sector)
+
+def writeMaxFile(fileName, assets, hasResolvedPath=True, sceneBytes=0):
+	"""Writes a minimal .max file that ArchiveMax can parse
+
+	Args:
+		fileName (str): File to write
+		assets (list): (asset type, path, resolved path) of each asset
+		hasResolvedPath (bool): FileAssetMetaData3 with resolved paths, otherwise FileAssetMetaData2
+		sceneBytes (int): Size of a filler Scene stream
+	"""
+	streamName = 'FileAssetMetaData3' if hasResolvedPath else 'FileAssetMetaData2'
+	streams = [(streamName, assetStream(assets, hasResolvedPath))]
+	if sceneBytes:
+		streams.append(('Scene', b'\x5a' * sceneBytes))
+	writeCompoundFile(fileName, streams)
+
+
+@dataclass
+class Project():
+	directory: str = ''
+	# Top level scenes, the ones a user would archive
+	scenes: list = field(default_factory=list)
+	# XRef scenes of the chains
+	xrefs: list = field(default_factory=list)
+	# Dummy asset files written to disk
+	assetFiles: list = field(default_factory=list)
+	# Referenced but never written
+	missingFiles: list = field(default_factory=list)
+	# scene -> {asset path: None} the archiver should find, XRef scenes included
+	closures: dict = field(default_factory=dict)
+	assetBytes: int = 0
+
+def paddedName(directory: str, stem: str, suffix: str, pathLength: int) -> str:
+	# Pads the file name so the whole path is about pathLength characters
+	name = stem + suffix
+	padding = pathLength - len(os.path.join(directory, name))
+	if padding > 1:
+		name = stem + '_' + 'x' * (padding - 1) + suffix
+	return os.path.join(directory, name)
+
+def writeAsset(fileName: str, size: int, rng: random.Random):
+	# Half random, half zeros so deflate has real work to do
+	half = size // 2
+	with open(fileName, 'wb') as f:
+		f.write(rng.randbytes(half) + bytes(size - half))
+
+def makeProject(directory: str, scenes: int = 10, assets: int = 50, pathLength: int = 80, xrefDepth: int = 0,
+	cycles: int = 0, shared: int = 10, missing: int = 0, assetBytes: int = 64 * 1024, metaData: int = 3, seed: int = 0) -> Project:
+	"""Writes a project of scenes, XRef chains and asset files
+
+	Args:
+		directory (str): Empty or new directory to write into
+		scenes (int): Top level scenes
+		assets (int): Own assets per scene and per XRef scene
+		pathLength (int): Approximate length of every asset path
+		xrefDepth (int): Length of the XRef chain below each scene
+		cycles (int): Scenes whose deepest XRef references the scene again
+		shared (int): Assets of a library every scene uses
+		missing (int): Referenced assets per scene that don't exist
+		assetBytes (int): Size of each asset file
+		metaData (int): 3 writes FileAssetMetaData3 with resolved paths, 2 FileAssetMetaData2
+		seed (int): Seed of the random asset contents
+
+	Returns:
+		Project: Files written and the expected closure of each scene
+	"""
+	rng = random.Random(seed)
+	project = Project(directory)
+	hasResolvedPath = metaData == 3
+	for sub in ('scenes', 'xrefs', 'maps'):
+		os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+	def newAssets(stem: str, count: int) -> list:
+		files = []
+		for i in range(count):
+			fileName = paddedName(os.path.join(directory, 'maps'), f'{stem}_{i:05d}', '.png', pathLength)
+			writeAsset(fileName, assetBytes, rng)
+			project.assetFiles.append(fileName)
+			project.assetBytes += assetBytes
+			files.append(fileName)
+		return files
+
+	library = newAssets('library', shared)
+	for row in range(scenes):
+		scene = paddedName(os.path.join(directory, 'scenes'), f'scene_{row:04d}', '.max', pathLength)
+		missingFiles = [paddedName(os.path.join(directory, 'maps', 'gone'), f'missing_{row:04d}_{i}', '.png', pathLength) for i in range(missing)]
+		project.missingFiles += missingFiles
+
+		# Deepest XRef first, each one references the next scene up the chain
+		chain = [paddedName(os.path.join(directory, 'xrefs'), f'scene_{row:04d}_xref_{depth}', '.max', pathLength) for depth in range(xrefDepth)]
+		ownAssets = {file: newAssets(os.path.basename(file)[:20], assets) for file in [scene] + chain}
+		closure = {}
+		for file in [scene] + chain:
+			for asset in ownAssets[file]:
+				closure[asset] = None
+		for asset in library + missingFiles:
+			closure[asset] = None
+		for file in chain:
+			closure[file] = None
+
+		for depth in reversed(range(xrefDepth)):
+			rows = [('Bitmap', asset, asset) for asset in ownAssets[chain[depth]]]
+			if depth + 1 < xrefDepth:
+				rows.append(('XRef', chain[depth + 1], chain[depth + 1]))
+			elif row < cycles:
+				rows.append(('XRef', scene, scene))
+			writeMaxFile(chain[depth], rows, hasResolvedPath)
+		project.xrefs += chain
+
+		rows = [('Bitmap', asset, asset) for asset in ownAssets[scene] + library + missingFiles]
+		if chain:
+			rows.append(('XRef', chain[0], chain[0]))
+		writeMaxFile(scene, rows, hasResolvedPath)
+		project.scenes.append(scene)
+		project.closures[scene] = closure
+
+	return project
+
+def main():
+	parser = argparse.ArgumentParser(description='Write a synthetic 3ds Max project for benchmarks.')
+	parser.add_argument('directory')
+	parser.add_argument('--scenes', type=int, default=10)
+	parser.add_argument('--assets', type=int, default=50, help='Own assets per scene and XRef scene')
+	parser.add_argument('--path-length', dest='pathLength', type=int, default=80)
+	parser.add_argument('--xref-depth', dest='xrefDepth', type=int, default=0)
+	parser.add_argument('--cycles', type=int, default=0, help='Scenes whose XRef chain leads back to them')
+	parser.add_argument('--shared', type=int, default=10, help='Library assets used by every scene')
+	parser.add_argument('--missing', type=int, default=0, help='Missing assets per scene')
+	parser.add_argument('--asset-kb', dest='assetKB', type=int, default=64)
+	parser.add_argument('--metadata', type=int, choices=(2, 3), default=3, help='FileAssetMetaData stream version')
+	args = parser.parse_args()
+
+	project = makeProject(args.directory, args.scenes, args.assets, args.pathLength, args.xrefDepth, args.cycles,
+		args.shared, args.missing, args.assetKB * 1024, args.metadata)
+	print(f'{len(project.scenes)} scenes, {len(project.xrefs)} XRef scenes, {len(project.assetFiles)} asset files '
+		f'({project.assetBytes/1048576:.1f} MB), {len(project.missingFiles)} missing')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,164 @@
+'''
+Benchmark suite on synthetic projects from maxfixture.
+Measures the parse rate of FileAssetMetaData streams, XRef resolution
+through chains and cycles, asset stat throughput and end to end
+MaxFileZip.main MB/s. Each case checks its results against what the
+fixture wrote, then its rate is compared with the stored baseline.
+Fails when a result is wrong or a rate drops more than the tolerance
+below its baseline. Baselines are per machine, refresh them with
+--update-baseline after a deliberate change or on new hardware.
+
+Usage: python benchmarks/suite.py [--only CASE] [--repeat N] [--tolerance 0.25] [--baseline FILE] [--update-baseline]
+'''
+import os
+import sys
+import json
+import time
+import zipfile
+import platform
+import argparse
+import tempfile
+
+from pathlib import Path, PurePath
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from lib.MaxZipFile import MaxFileZip
+from lib.AssetStat import AssetStatService
+from maxfixture import makeProject
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'baselines.json'
+
+
+def best(repeat: int, fn) -> tuple:
+	# Fastest of several runs, fn returns (seconds, checked result)
+	runs = [fn() for _ in range(repeat)]
+	return min(runs, key=lambda run: run[0])
+
+def parseCase(directory: str, repeat: int) -> tuple:
+	project = makeProject(directory, scenes=200, assets=300, shared=0, assetBytes=16)
+	records = sum(len(closure) for closure in project.closures.values())
+
+	def run():
+		reader = MaxFileZip({}, None)
+		start = time.perf_counter()
+		parsed = sum(len(reader.readAssetsFromOle(scene)) for scene in project.scenes)
+		return time.perf_counter() - start, parsed
+
+	seconds, parsed = best(repeat, run)
+	error = None if parsed == records else f'parsed {parsed} records, expected {records}'
+	return records / seconds, 'records/s', error
+
+def xrefCase(directory: str, repeat: int) -> tuple:
+	project = makeProject(directory, scenes=100, assets=20, xrefDepth=5, cycles=20, shared=20, missing=2, assetBytes=16, metaData=2)
+
+	def run():
+		maxZip = MaxFileZip({}, None)
+		start = time.perf_counter()
+		closures = {scene: set(maxZip.collectAssetsPathsFromFile(scene)) for scene in project.scenes}
+		return time.perf_counter() - start, (closures, len(maxZip.graph.cycles))
+
+	seconds, (closures, cycles) = best(repeat, run)
+	error = None
+	if any(closures[scene] != set(project.closures[scene]) for scene in project.scenes):
+		error = 'XRef closures differ from the fixture'
+	elif cycles != 20:
+		error = f'found {cycles} cycles, expected 20'
+	return len(project.scenes) / seconds, 'scenes/s', error
+
+def statCase(directory: str, repeat: int) -> tuple:
+	project = makeProject(directory, scenes=40, assets=150, shared=0, missing=5, assetBytes=1024, pathLength=120)
+	files = project.assetFiles + project.missingFiles
+
+	def run():
+		# A new service lists every directory again
+		statService = AssetStatService(8)
+		start = time.perf_counter()
+		assetStats = statService.statMany(files)
+		return time.perf_counter() - start, assetStats
+
+	seconds, assetStats = best(repeat, run)
+	existing = sum(1 for assetStat in assetStats.values() if assetStat.exists)
+	error = None if existing == len(project.assetFiles) and len(assetStats) == len(files) else 'stat results differ from the fixture'
+	return len(files) / seconds, 'files/s', error
+
+def archiveCase(directory: str, repeat: int) -> tuple:
+	project = makeProject(os.path.join(directory, 'project'), scenes=8, assets=20, xrefDepth=1, shared=20, assetBytes=256 * 1024)
+	rows = dict(enumerate(project.scenes))
+	outDir = PurePath(directory)
+
+	def run():
+		zipFile = outDir.joinpath('suite.zip')
+		start = time.perf_counter()
+		result = MaxFileZip(rows, outDir, zipFile, True).main()
+		return time.perf_counter() - start, result
+
+	seconds, result = best(repeat, run)
+	with zipfile.ZipFile(result.zipFile) as archFile:
+		badFile = archFile.testzip()
+	expected = len(project.assetFiles) + len(project.xrefs) + len(project.scenes)
+	error = None
+	if badFile is not None:
+		error = f'{badFile} failed its CRC check'
+	elif result.writtenFiles != expected:
+		error = f'wrote {result.writtenFiles} files, expected {expected}'
+	return result.writtenBytes / 1048576 / seconds, 'MB/s', error
+
+CASES = {
+	'parse': parseCase,
+	'xref': xrefCase,
+	'stat': statCase,
+	'archive': archiveCase,
+}
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--only', action='append', choices=list(CASES), help='Run only this case, can be repeated')
+	parser.add_argument('--repeat', type=int, default=5, help='Runs per case, the fastest counts')
+	parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed drop below the baseline')
+	parser.add_argument('--baseline', default=str(BASELINE_FILE))
+	parser.add_argument('--update-baseline', dest='updateBaseline', action='store_true')
+	args = parser.parse_args()
+
+	baseline = {}
+	if Path(args.baseline).exists():
+		with open(args.baseline, 'r') as f:
+			baseline = json.load(f)
+	baselineResults = baseline.get('results', {})
+
+	failed = False
+	results = {}
+	for name in args.only or CASES:
+		with tempfile.TemporaryDirectory() as directory:
+			rate, unit, error = CASES[name](directory, args.repeat)
+			if name in baselineResults and rate < baselineResults[name]['rate'] * (1 - args.tolerance):
+				# Confirm a drop with a second round before calling it a regression
+				rate = max(rate, CASES[name](os.path.join(directory, 'again'), args.repeat)[0])
+		results[name] = dict(rate=round(rate, 1), unit=unit)
+
+		line = f'  {name:8} {rate:12.1f} {unit:10}'
+		if name in baselineResults:
+			ratio = rate / baselineResults[name]['rate']
+			line += f' {ratio:5.2f}x baseline'
+			if ratio < 1 - args.tolerance and not args.updateBaseline:
+				line += '  SLOWER'
+				failed = True
+		print(line)
+		if error is not None:
+			print(f'FAIL: {name}: {error}')
+			failed = True
+
+	if args.updateBaseline and not failed:
+		baselineResults.update(results)
+		baseline = dict(machine=f'{platform.system()} {platform.machine()}, {os.cpu_count()} cores, Python {platform.python_version()}',
+			results=baselineResults)
+		with open(args.baseline, 'w') as f:
+			json.dump(baseline, f, indent='\t')
+		print(f'Baseline written to {args.baseline}')
+
+	print('ok' if not failed else 'failed')
+	sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+	main()
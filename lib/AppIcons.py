@@ -3,6 +3,8 @@ from PyQt5.QtCore import QByteArray
 
 class AppIcons():
 	def __init__(self):
+		self._icons = {}
+		self._pixmaps = {}
 		self.clampB=		b'iVBORw0KGgoAAAANSUhEUgAAABAAAAAQCAYAAAAf8/9hAAAACXBIWXMAAAsTAAALEwEAmpwYAAAF+2lUWHRYTUw6Y29tLmFkb2JlLnhtcAAAAAAAPD94cGFja2V0IGJlZ2luPSLvu78iIGlkPSJXNU0wTXBDZWhpSHpyZVN6TlRjemtjOWQiPz4gPHg6eG1wbWV0YSB4bWxuczp4PSJhZG9iZTpuczptZXRhLyIgeDp4bXB0az0iQWRvYmUgWE1QIENvcmUgNS42LWMxNDggNzkuMTY0MDM2LCAyMDE5LzA4LzEzLTAxOjA2OjU3ICAgICAgICAiPiA8cmRmOlJERiB4bWxuczpyZGY9Imh0dHA6Ly93d3cudzMub3JnLzE5OTkvMDIvMjItcmRmLXN5bnRheC1ucyMiPiA8cmRmOkRlc2NyaXB0aW9uIHJkZjphYm91dD0iIiB4bWxuczp4bXBNTT0iaHR0cDovL25zLmFkb2JlLmNvbS94YXAvMS4wL21tLyIgeG1sbnM6c3RSZWY9Imh0dHA6Ly9ucy5hZG9iZS5jb20veGFwLzEuMC9zVHlwZS9SZXNvdXJjZVJlZiMiIHhtbG5zOnN0RXZ0PSJodHRwOi8vbnMuYWRvYmUuY29tL3hhcC8xLjAvc1R5cGUvUmVzb3VyY2VFdmVudCMiIHhtbG5zOnhtcD0iaHR0cDovL25zLmFkb2JlLmNvbS94YXAvMS4wLyIgeG1sbnM6ZGM9Imh0dHA6Ly9wdXJsLm9yZy9kYy9lbGVtZW50cy8xLjEvIiB4bWxuczpwaG90b3Nob3A9Imh0dHA6Ly9ucy5hZG9iZS5jb20vcGhvdG9zaG9wLzEuMC8iIHhtcE1NOk9yaWdpbmFsRG9jdW1lbnRJRD0ieG1wLmRpZDo5NUE5NkEyOEYzREFFMTExQTdBQUE1REU2RUIxOEI4OSIgeG1wTU06RG9jdW1lbnRJRD0ieG1wLmRpZDpDMTgzRjkyQ0ZBMUIxMUVBQUExM0FBODZGRUUxMTE3OSIgeG1wTU06SW5zdGFuY2VJRD0ieG1wLmlpZDpjYjYwY2Q2Ny0xZTM0LWU5NDEtOGIxMi03OWFlOTdjMjA2MmIiIHhtcDpDcmVhdG9yVG9vbD0iQWRvYmUgUGhvdG9zaG9wIENTNSBXaW5kb3dzIiB4bXA6Q3JlYXRlRGF0ZT0iMjAyMC0wOS0xOFQyMTo1OTozMC0wNDowMCIgeG1wOk1vZGlmeURhdGU9IjIwMjAtMDktMThUMjI6MDU6MDUtMDQ6MDAiIHhtcDpNZXRhZGF0YURhdGU9IjIwMjAtMDktMThUMjI6MDU6MDUtMDQ6MDAiIGRjOmZvcm1hdD0iaW1hZ2UvcG5nIiBwaG90b3Nob3A6Q29sb3JNb2RlPSIzIiBwaG90b3Nob3A6SUNDUHJvZmlsZT0ic1JHQiBJRUM2MTk2Ni0yLjEiPiA8eG1wTU06RGVyaXZlZEZyb20gc3RSZWY6aW5zdGFuY2VJRD0ieG1wLmlpZDo0MTRhYjZjZi03ZDA0LTlhNDYtOGVmNy0zNTVhZTA2ZTY1NzQiIHN0UmVmOmRvY3VtZW50SUQ9ImFkb2JlOmRvY2lkOnBob3Rvc2hvcDo1ZTBhNjdmYy1lNGJhLWU5NGEtYTEyZS00YWUyODUwNzk1MWQiLz4gPHhtcE1NOkhpc3Rvcnk+IDxyZGY6U2VxPiA8cmRmOmxpIHN0RXZ0OmFjdGlvbj0ic2F2ZWQiIHN0RXZ0Omluc3RhbmNlSUQ9InhtcC5paWQ6Y2I2MGNkNjctMWUzNC1lOTQxLThiMTItNzlhZTk3YzIwNjJiIiBzdEV2dDp3aGVuPSIyMDIwLTA5LTE4VDIyOjA1OjA1LTA0OjAwIiBzdEV2dDpzb2Z0d2FyZUFnZW50PSJBZG9iZSBQaG90b3Nob3AgMjEuMCAoV2luZG93cykiIHN0RXZ0OmNoYW5nZWQ9Ii8iLz4gPC9yZGY6U2VxPiA8L3htcE1NOkhpc3Rvcnk+IDwvcmRmOkRlc2NyaXB0aW9uPiA8L3JkZjpSREY+IDwveDp4bXBtZXRhPiA8P3hwYWNrZXQgZW5kPSJyIj8+R89a9QAAANRJREFUOBFj+P//PwMMA4FUann3fxgG8XHJw+RgEvwgARiOzKz+j8zHgfmRDZBiPvH/Pxxv+v0fhY8Fo7tAinnjz/+kYEwD1n/7jwsT4wV+ovwLZCcWtv4HYRQXEIvRLCLPBXH5jf9BGCMMvu9i+I8LExWNN5cw/MeFv+zAxBguuL6I4T8pGG9K9I/LxZkSQXIweYxYgBnkH5vzH9mfyHkBJAeTx2aAVER6xX+/mOz/IBo5M8EMB8mBMMwCfPGM4gIQPyyt/L9vdBYYg9hgNWQmIrgFABrorxGuYnQ5AAAAAElFTkSuQmCC'
 		self.briefcaseB = b',iVBORw0KGgoAAAANSUhEUgAAABIAAAASCAYAAABWzo5XAAAAGXRFWHRTb2Z0d2FyZQBBZG9iZSBJbWFnZVJlYWR5ccllPAAAA3ppVFh0WE1MOmNvbS5hZG9iZS54bXAAAAAAADw/eHBhY2tldCBiZWdpbj0i77u/IiBpZD0iVzVNME1wQ2VoaUh6cmVTek5UY3prYzlkIj8+IDx4OnhtcG1ldGEgeG1sbnM6eD0iYWRvYmU6bnM6bWV0YS8iIHg6eG1wdGs9IkFkb2JlIFhNUCBDb3JlIDUuNi1jMTQ4IDc5LjE2NDAzNiwgMjAxOS8wOC8xMy0wMTowNjo1NyAgICAgICAgIj4gPHJkZjpSREYgeG1sbnM6cmRmPSJodHRwOi8vd3d3LnczLm9yZy8xOTk5LzAyLzIyLXJkZi1zeW50YXgtbnMjIj4gPHJkZjpEZXNjcmlwdGlvbiByZGY6YWJvdXQ9IiIgeG1sbnM6eG1wTU09Imh0dHA6Ly9ucy5hZG9iZS5jb20veGFwLzEuMC9tbS8iIHhtbG5zOnN0UmVmPSJodHRwOi8vbnMuYWRvYmUuY29tL3hhcC8xLjAvc1R5cGUvUmVzb3VyY2VSZWYjIiB4bWxuczp4bXA9Imh0dHA6Ly9ucy5hZG9iZS5jb20veGFwLzEuMC8iIHhtcE1NOk9yaWdpbmFsRG9jdW1lbnRJRD0ieG1wLmRpZDo5NUE5NkEyOEYzREFFMTExQTdBQUE1REU2RUIxOEI4OSIgeG1wTU06RG9jdW1lbnRJRD0ieG1wLmRpZDo0MDEzNkEzOEZBMTkxMUVBOTEyOTlGQUREMkQ0MkE2NyIgeG1wTU06SW5zdGFuY2VJRD0ieG1wLmlpZDo0MDEzNkEzN0ZBMTkxMUVBOTEyOTlGQUREMkQ0MkE2NyIgeG1wOkNyZWF0b3JUb29sPSJBZG9iZSBQaG90b3Nob3AgQ1M1IFdpbmRvd3MiPiA8eG1wTU06RGVyaXZlZEZyb20gc3RSZWY6aW5zdGFuY2VJRD0ieG1wLmlpZDo0MTRhYjZjZi03ZDA0LTlhNDYtOGVmNy0zNTVhZTA2ZTY1NzQiIHN0UmVmOmRvY3VtZW50SUQ9ImFkb2JlOmRvY2lkOnBob3Rvc2hvcDo1ZTBhNjdmYy1lNGJhLWU5NGEtYTEyZS00YWUyODUwNzk1MWQiLz4gPC9yZGY6RGVzY3JpcHRpb24+IDwvcmRmOlJERj4gPC94OnhtcG1ldGE+IDw/eHBhY2tldCBlbmQ9InIiPz6kL/Z5AAABg0lEQVR42qxUPUsDQRCduTtSGGLrBwRNkyI2iijorxB/gJVtIKWI2NsY0MLKxsafYCuKIkiUYGIkAb1oonZaaEwu++HuJhx3uT0DJgNvmRlm3t6+uV3knMMwDEPylkC0C699Kzw8k94GI4Qoar6+nyBjL8h5TUH4Mqchd21UYEJg0ocmI5C7L7hxrngncu1AHcCYQAxwZTWJhDpiV+YFFB4pfDjUjT8JheIT7a0zWk5TklmYSsVYyTaB0qDqVRt4FXx5nq/440hE6owdjdoOAKNBHB4swmwyriB9XY3s7U4HgDK9evvZNyTEVjtb1jSsrYcO3oJ6/QeOj5Zgd6em4+L5sukGCzPxQMHG9pRYG2Bsbs33CugKLKdyedtSEL62jhB5tnF1NH5xo/29jexegi3PJVxfV2eZ3KMR1UrEM+lzzKQ7vlzOroNEiB6xWQjR6VX/i8h8RANcXMbRQ8QGIOr0GrxS/gIuziaH9B8wJbD6LHlpR/54CfqZJGrgsB62XwEGALigDTEj4t97AAAAAElFTkSuQmCC'
 		self.boxB = b',iVBORw0KGgoAAAANSUhEUgAAABIAAAASCAYAAABWzo5XAAAAGXRFWHRTb2Z0d2FyZQBBZG9iZSBJbWFnZVJlYWR5ccllPAAAA3ppVFh0WE1MOmNvbS5hZG9iZS54bXAAAAAAADw/eHBhY2tldCBiZWdpbj0i77u/IiBpZD0iVzVNME1wQ2VoaUh6cmVTek5UY3prYzlkIj8+IDx4OnhtcG1ldGEgeG1sbnM6eD0iYWRvYmU6bnM6bWV0YS8iIHg6eG1wdGs9IkFkb2JlIFhNUCBDb3JlIDUuNi1jMTQ4IDc5LjE2NDAzNiwgMjAxOS8wOC8xMy0wMTowNjo1NyAgICAgICAgIj4gPHJkZjpSREYgeG1sbnM6cmRmPSJodHRwOi8vd3d3LnczLm9yZy8xOTk5LzAyLzIyLXJkZi1zeW50YXgtbnMjIj4gPHJkZjpEZXNjcmlwdGlvbiByZGY6YWJvdXQ9IiIgeG1sbnM6eG1wTU09Imh0dHA6Ly9ucy5hZG9iZS5jb20veGFwLzEuMC9tbS8iIHhtbG5zOnN0UmVmPSJodHRwOi8vbnMuYWRvYmUuY29tL3hhcC8xLjAvc1R5cGUvUmVzb3VyY2VSZWYjIiB4bWxuczp4bXA9Imh0dHA6Ly9ucy5hZG9iZS5jb20veGFwLzEuMC8iIHhtcE1NOk9yaWdpbmFsRG9jdW1lbnRJRD0ieG1wLmRpZDo5NUE5NkEyOEYzREFFMTExQTdBQUE1REU2RUIxOEI4OSIgeG1wTU06RG9jdW1lbnRJRD0ieG1wLmRpZDo0MDEzNkEzNEZBMTkxMUVBOTEyOTlGQUREMkQ0MkE2NyIgeG1wTU06SW5zdGFuY2VJRD0ieG1wLmlpZDo0MDEzNkEzM0ZBMTkxMUVBOTEyOTlGQUREMkQ0MkE2NyIgeG1wOkNyZWF0b3JUb29sPSJBZG9iZSBQaG90b3Nob3AgQ1M1IFdpbmRvd3MiPiA8eG1wTU06RGVyaXZlZEZyb20gc3RSZWY6aW5zdGFuY2VJRD0ieG1wLmlpZDo0MTRhYjZjZi03ZDA0LTlhNDYtOGVmNy0zNTVhZTA2ZTY1NzQiIHN0UmVmOmRvY3VtZW50SUQ9ImFkb2JlOmRvY2lkOnBob3Rvc2hvcDo1ZTBhNjdmYy1lNGJhLWU5NGEtYTEyZS00YWUyODUwNzk1MWQiLz4gPC9yZGY6RGVzY3JpcHRpb24+IDwvcmRmOlJERj4gPC94OnhtcG1ldGE+IDw/eHBhY2tldCBlbmQ9InIiPz7UPnlqAAAA7ElEQVR42qyUTQrCMBCFJz8gKHoDewTv4crjuHXrWVy58ghSBRfuBVHxAApKMck4Uy1toYJJU3iQ0ryPl0czAhEhxiNIA1KXJAMZjvTQDBErcwKtdBDGWINjnbBZ4uaqgN6DQEorZug82ivLQMhOEIi9AMgd9Um9lh09OdGdQWJpjqA8e7LUx0QnzCiMEtODAufZk/z0w8sygc3qm+ajYaN5uj9XEhUrLEHO/tlI4z5RgtDVvyzw0uTAdNd4/J+JcL316quSyLa6axUQxgK5KCBHID6b8vTb75+dXxFoMUryEQKz003EGmxvAQYADWhYcfJezlsAAAAASUVORK5CYII='
@@ -17,9 +19,13 @@ class AppIcons():
 
 
 	def qIconFromBase64(self, base64):
-		pixmap = QPixmap()
-		pixmap.loadFromData(QByteArray.fromBase64(base64))
-		_icon = QIcon(pixmap)
+		# Icons are decoded on first use and shared afterwards
+		try:
+			return self._icons[base64]
+		except KeyError:
+			pass
+		_icon = QIcon(self.qPixmapFromBase64(base64))
+		self._icons[base64] = _icon
 		return _icon
 
 	def qImageFromBase64(self, base64):
@@ -28,6 +34,11 @@ class AppIcons():
 		return _image
 	
 	def qPixmapFromBase64(self, base64):
+		try:
+			return self._pixmaps[base64]
+		except KeyError:
+			pass
 		pixmap = QPixmap()
 		pixmap.loadFromData(QByteArray.fromBase64(base64))
+		self._pixmaps[base64] = pixmap
 		return pixmap
\ No newline at end of file
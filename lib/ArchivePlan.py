@@ -0,0 +1,227 @@
+import os
+import time
+import zlib
+import tempfile
+
+from dataclasses import dataclass, field
+from os import path
+from typing import Optional
+
+# Bytes read to time opening a file, apart from its throughput
+HEAD_BYTES = 4096
+# Local header plus central directory record of an entry, without the name
+ENTRY_OVERHEAD = 30 + 46
+
+
+@dataclass
+class ArchivePlan():
+	zipFile: str = ''
+	scenes: list = field(default_factory=list)
+	errors: list = field(default_factory=list)
+	# Files of every row, a file used by several rows counted for each
+	files: int = 0
+	rawBytes: int = 0
+	# Each file once, what a single zip reads
+	uniqueFiles: int = 0
+	uniqueBytes: int = 0
+	missingFiles: int = 0
+	relocatedFiles: int = 0
+	# Bytes of the unique files the compression policy would store or deflate
+	storedBytes: int = 0
+	deflatedBytes: int = 0
+	# Estimated size of the zip with each file once
+	compressedBytes: int = 0
+	sampledFiles: int = 0
+	sampledBytes: int = 0
+	# Measured on the samples, rates in bytes per second
+	openSeconds: float = 0.0
+	readRate: float = 0.0
+	deflateRate: float = 0.0
+	crcRate: float = 0.0
+	writeRate: float = 0.0
+	compressionWorkers: int = 1
+	# Estimated wall time of the archive
+	seconds: float = 0.0
+	# Time the plan took to resolve and stat everything
+	scanSeconds: float = 0.0
+	# row -> bytes of its scene and assets, the cost the scheduler orders jobs by
+	rowBytes: dict = field(default_factory=dict)
+
+	def describe(self) -> str:
+		minutes, seconds = divmod(int(round(self.seconds)), 60)
+		hours, minutes = divmod(minutes, 60)
+		text = (f'{len(self.scenes)} scenes, {self.uniqueFiles} files, {self.uniqueBytes/1048576:.1f} MB to read '
+			f'({self.rawBytes/1048576:.1f} MB counting shared files per scene), '
+			f'about {self.compressedBytes/1048576:.1f} MB zipped in {hours}:{minutes:02d}:{seconds:02d}')
+		if self.missingFiles:
+			text += f', {self.missingFiles} missing'
+		if self.errors:
+			text += f', {len(self.errors)} not valid max files'
+		return text
+
+
+class PlanSampler():
+	'''
+	Estimates compressed size and archive time from a sample of the files\n
+	The largest file of each extension is sampled first, the rest of the
+	samples are spread evenly over the files ordered by size. The start
+	of each is read to time opening and reading, and deflated at the
+	level ParallelZipWriter uses to measure deflate speed and the ratio of
+	its extension. Files of extensions without a sample get the ratio of
+	all samples. The samples are also written and synced to a temp file
+	in the output directory to time the writer
+	'''
+
+	def __init__(self, policy=None, workers: int = 0, sampleFiles: int = 32, sampleKB: int = 256, compressLevel: int = zlib.Z_DEFAULT_COMPRESSION, outputDir: Optional[str] = None):
+		# CompressionPolicy of the archive, None deflates everything
+		self.policy = policy
+		self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+		self.outputDir = outputDir
+		self.sampleFiles = sampleFiles
+		self.sampleBytes = sampleKB * 1024
+		self.compressLevel = compressLevel
+
+	def storedByName(self, sourceFile: str) -> bool:
+		return self.policy is not None and self.policy.storesByName(sourceFile)
+
+	def pick(self, files: dict) -> list:
+		# files: source file -> (size, archive name)
+		byExtension = {}
+		for sourceFile in files:
+			byExtension.setdefault(path.splitext(sourceFile)[1].lower(), []).append(sourceFile)
+		picked = {}
+		for group in sorted(byExtension.values(), key=lambda group: -sum(files[f][0] for f in group)):
+			if len(picked) >= self.sampleFiles:
+				break
+			picked[max(group, key=lambda f: files[f][0])] = None
+
+		remaining = self.sampleFiles - len(picked)
+		if remaining > 0:
+			bySize = sorted(files, key=lambda f: files[f][0])
+			for i in range(remaining):
+				picked.setdefault(bySize[int((i + 0.5) * len(bySize) / remaining)], None)
+		return list(picked)
+
+	def sample(self, sourceFile: str) -> Optional[tuple]:
+		"""Reads the start of a file, timing the open apart from the rest
+
+		Args:
+			sourceFile (str): File to sample
+
+		Returns:
+			tuple: (open seconds, read bytes, read seconds, sample) or None if it can't be read
+		"""
+		try:
+			start = time.perf_counter()
+			with open(sourceFile, 'rb') as f:
+				head = f.read(HEAD_BYTES)
+				opened = time.perf_counter()
+				rest = f.read(max(0, self.sampleBytes - len(head)))
+			done = time.perf_counter()
+		except OSError:
+			return None
+		return (opened - start, len(rest), done - opened, head + rest)
+
+	def writeRate(self, samples: list) -> float:
+		# Bytes per second written and synced to the output directory, 0 if it can't be written
+		if self.outputDir is None or not samples:
+			return 0.0
+		try:
+			start = time.perf_counter()
+			with tempfile.TemporaryFile(dir=self.outputDir) as f:
+				for data in samples:
+					f.write(data)
+				f.flush()
+				os.fsync(f.fileno())
+			seconds = time.perf_counter() - start
+		except OSError:
+			return 0.0
+		return sum(len(data) for data in samples) / seconds if seconds > 0 else 0.0
+
+	def estimate(self, plan: ArchivePlan, files: dict):
+		"""Fills in the compression and time estimates of a plan
+
+		Args:
+			plan (ArchivePlan): Plan with the sizes already set
+			files (dict): {source file: (size, archive name)} of the unique files
+		"""
+		plan.compressionWorkers = self.workers
+		# extension -> [sampled bytes stored, sampled bytes deflated, their compressed size]
+		ratios = {}
+		openSeconds = 0.0
+		readBytes = 0
+		readSeconds = 0.0
+		deflatedBytes = 0
+		deflateSeconds = 0.0
+		samples = []
+		for sourceFile in self.pick(files) if self.sampleFiles > 0 and files else []:
+			sampled = self.sample(sourceFile)
+			if sampled is None:
+				continue
+			fileOpenSeconds, fileReadBytes, fileReadSeconds, data = sampled
+			plan.sampledFiles += 1
+			plan.sampledBytes += len(data)
+			openSeconds += fileOpenSeconds
+			readBytes += fileReadBytes
+			readSeconds += fileReadSeconds
+			samples.append(data)
+			if not data or self.storedByName(sourceFile):
+				continue
+
+			start = time.perf_counter()
+			compressor = zlib.compressobj(self.compressLevel, zlib.DEFLATED, -15)
+			compressedSize = len(compressor.compress(data)) + len(compressor.flush())
+			deflateSeconds += time.perf_counter() - start
+			deflatedBytes += len(data)
+
+			ratio = ratios.setdefault(path.splitext(sourceFile)[1].lower(), [0, 0, 0])
+			if self.policy is not None and compressedSize / len(data) > self.policy.minRatio:
+				# The policy's own sample would store it
+				ratio[0] += len(data)
+			else:
+				ratio[1] += len(data)
+				ratio[2] += compressedSize
+
+		if plan.sampledFiles:
+			plan.openSeconds = openSeconds / plan.sampledFiles
+		if readSeconds > 0:
+			plan.readRate = readBytes / readSeconds
+		if deflateSeconds > 0:
+			plan.deflateRate = deflatedBytes / deflateSeconds
+		start = time.perf_counter()
+		for data in samples:
+			zlib.crc32(data)
+		crcSeconds = time.perf_counter() - start
+		if crcSeconds > 0:
+			plan.crcRate = plan.sampledBytes / crcSeconds
+		plan.writeRate = self.writeRate(samples)
+		overall = [sum(ratio[i] for ratio in ratios.values()) for i in range(3)]
+
+		compressedBytes = 0.0
+		storedBytes = 0.0
+		for sourceFile, (size, arcname) in files.items():
+			compressedBytes += ENTRY_OVERHEAD + 2 * len(arcname.encode('utf-8'))
+			if self.storedByName(sourceFile):
+				storedBytes += size
+				compressedBytes += size
+				continue
+			stored, deflated, compressed = ratios.get(path.splitext(sourceFile)[1].lower(), overall)
+			if stored + deflated == 0:
+				# Nothing sampled, counted as deflated without gain
+				compressedBytes += size
+				continue
+			storedShare = stored / (stored + deflated)
+			storedBytes += size * storedShare
+			compressedBytes += size * storedShare + (size * (1 - storedShare) * compressed / deflated if deflated else 0)
+
+		plan.storedBytes = int(storedBytes)
+		plan.deflatedBytes = plan.uniqueBytes - plan.storedBytes
+		plan.compressedBytes = int(compressedBytes)
+
+		# The workers read, checksum and deflate their entries, one writer thread copies them into the zip.
+		# CPU work shares the cores, the reads and the writer set a floor of their own
+		readTime = plan.uniqueFiles * plan.openSeconds + (plan.uniqueBytes / plan.readRate if plan.readRate else 0.0)
+		cpuTime = (plan.deflatedBytes / plan.deflateRate if plan.deflateRate else 0.0) + (plan.uniqueBytes / plan.crcRate if plan.crcRate else 0.0)
+		writeTime = plan.compressedBytes / plan.writeRate if plan.writeRate else 0.0
+		cores = min(self.workers, os.cpu_count() or 1)
+		plan.seconds = max(readTime, writeTime, (cpuTime + writeTime) / cores)
@@ -0,0 +1,172 @@
+import json
+import sqlite3
+import threading
+import time
+
+from os import path, stat_result
+from typing import Optional
+
+from lib.MaxZipFile import OleAsset
+
+
+class AssetCache():
+	'''
+	Persistent cache of parsed .max asset tables\n
+	Entries are keyed by (path, size, mtime) so a re-saved
+	scene invalidates itself, total size is bounded with LRU eviction.
+	Asset directory listings are kept as well, keyed by the mtime of
+	their directory
+	'''
+
+	def __init__(self, dbFile: str, maxBytes: int = 64 * 1024 * 1024):
+		self.dbFile = dbFile
+		self.maxBytes = maxBytes
+		self._local = threading.local()
+		self._lock = threading.Lock()
+
+		with self._lock:
+			db = self.connection()
+			db.execute('''CREATE TABLE IF NOT EXISTS scenes (
+				path TEXT PRIMARY KEY,
+				size INTEGER NOT NULL,
+				mtime INTEGER NOT NULL,
+				assets TEXT,
+				bytes INTEGER NOT NULL,
+				lastUsed REAL NOT NULL)''')
+			db.execute('CREATE INDEX IF NOT EXISTS scenesLastUsed ON scenes (lastUsed)')
+			db.execute('''CREATE TABLE IF NOT EXISTS dirs (
+				path TEXT PRIMARY KEY,
+				mtime INTEGER NOT NULL,
+				entries TEXT NOT NULL,
+				bytes INTEGER NOT NULL,
+				lastUsed REAL NOT NULL)''')
+			db.commit()
+
+	@staticmethod
+	def key(file: str) -> str:
+		# The same file dropped on the window, found by the watcher or named by an XRef
+		return path.normcase(path.normpath(file))
+
+	def connection(self) -> sqlite3.Connection:
+		# sqlite connections can't be shared between worker threads
+		db = getattr(self._local, 'db', None)
+		if db is None:
+			db = sqlite3.connect(self.dbFile, timeout=30)
+			db.execute('PRAGMA journal_mode=WAL')
+			self._local.db = db
+		return db
+
+	def get(self, file: str, fileStat: stat_result) -> tuple:
+		"""Looks up the parsed asset table of a scene
+
+		Args:
+			file (str): Scene file path
+			fileStat (stat_result): Current stat of the scene file
+
+		Returns:
+			tuple: (hit, assets) where assets is a list of OleAsset
+			or None for files that are not valid max files
+		"""
+		file = self.key(file)
+		db = self.connection()
+		row = db.execute('SELECT size, mtime, assets FROM scenes WHERE path = ?', (file,)).fetchone()
+		if row is None:
+			return (False, None)
+
+		if row[0] != fileStat.st_size or row[1] != fileStat.st_mtime_ns:
+			# Scene was re-saved since it was cached
+			with self._lock:
+				db.execute('DELETE FROM scenes WHERE path = ?', (file,))
+				db.commit()
+			return (False, None)
+
+		with self._lock:
+			db.execute('UPDATE scenes SET lastUsed = ? WHERE path = ?', (time.time(), file))
+			db.commit()
+
+		records = json.loads(row[2])
+		if records is None:
+			return (True, None)
+		return (True, [OleAsset(*r) for r in records])
+
+	def put(self, file: str, fileStat: stat_result, assets: Optional[list]):
+		"""Stores the parsed asset table of a scene
+
+		Args:
+			file (str): Scene file path
+			fileStat (stat_result): Stat of the scene taken before it was parsed
+			assets (list): List of OleAsset, None if not a valid max file
+		"""
+		records = None
+		if assets is not None:
+			records = [(a.guid, a.assetType, a.assetPath, a.resolvedPath) for a in assets]
+
+		file = self.key(file)
+		recordsJson = json.dumps(records)
+		nBytes = len(file) + len(recordsJson)
+
+		db = self.connection()
+		with self._lock:
+			db.execute('INSERT OR REPLACE INTO scenes VALUES (?, ?, ?, ?, ?, ?)',
+				(file, fileStat.st_size, fileStat.st_mtime_ns, recordsJson, nBytes, time.time()))
+			self.evict(db)
+			db.commit()
+
+	def getListing(self, directory: str, mtime: int) -> Optional[list]:
+		"""Looks up the listing of an asset directory
+
+		Args:
+			directory (str): Directory path
+			mtime (int): Current st_mtime_ns of the directory
+
+		Returns:
+			list: Normcased names in the directory, None if not cached or changed since
+		"""
+		directory = self.key(directory)
+		db = self.connection()
+		row = db.execute('SELECT mtime, entries FROM dirs WHERE path = ?', (directory,)).fetchone()
+		if row is None or row[0] != mtime:
+			return None
+
+		with self._lock:
+			db.execute('UPDATE dirs SET lastUsed = ? WHERE path = ?', (time.time(), directory))
+			db.commit()
+		return json.loads(row[1])
+
+	def putListing(self, directory: str, mtime: int, names: list):
+		"""Stores the listing of an asset directory
+
+		Args:
+			directory (str): Directory path
+			mtime (int): st_mtime_ns of the directory taken before it was listed
+			names (list): Normcased names in the directory
+		"""
+		directory = self.key(directory)
+		entriesJson = json.dumps(names)
+		db = self.connection()
+		with self._lock:
+			db.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)',
+				(directory, mtime, entriesJson, len(directory) + len(entriesJson), time.time()))
+			self.evict(db)
+			db.commit()
+
+	def evict(self, db: sqlite3.Connection):
+		# Drop least recently used scenes and listings until the cache fits its budget
+		total = db.execute('SELECT (SELECT COALESCE(SUM(bytes), 0) FROM scenes) + (SELECT COALESCE(SUM(bytes), 0) FROM dirs)').fetchone()[0]
+		if total <= self.maxBytes:
+			return
+
+		rows = db.execute('''SELECT 'scenes', path, bytes, lastUsed FROM scenes
+			UNION ALL SELECT 'dirs', path, bytes, lastUsed FROM dirs ORDER BY lastUsed''').fetchall()
+		for table, key, nBytes, lastUsed in rows:
+			if total <= self.maxBytes:
+				break
+			db.execute(f'DELETE FROM {table} WHERE path = ?', (key,))
+			total -= nBytes
+
+	def clear(self):
+		db = self.connection()
+		with self._lock:
+			db.execute('DELETE FROM scenes')
+			db.execute('DELETE FROM dirs')
+			db.commit()
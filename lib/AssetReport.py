@@ -0,0 +1,152 @@
+import csv
+import json
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from typing import Optional
+
+from lib.Callbacks import Callbacks
+from lib.MaxZipFile import MaxFileZip
+from lib.XRefGraph import XRefGraph
+
+# Columns of the report, one row per asset of each scene
+REPORT_FIELDS = ('scene', 'asset', 'type', 'exists', 'size')
+
+
+class CsvReportWriter():
+	'''
+	Report rows as CSV with a header line
+	'''
+
+	def __init__(self, f):
+		self.f = f
+		self.writer = csv.writer(f)
+		self.writer.writerow(REPORT_FIELDS)
+
+	def write(self, rows: list):
+		self.writer.writerows([row[field] for field in REPORT_FIELDS] for row in rows)
+		self.f.flush()
+
+class JsonLinesReportWriter():
+	'''
+	Report rows as JSON lines, one object per asset
+	'''
+
+	def __init__(self, f):
+		self.f = f
+
+	def write(self, rows: list):
+		self.f.writelines(json.dumps(row) + '\n' for row in rows)
+		self.f.flush()
+
+def reportWriter(f, fileName: str):
+	# .json and .jsonl get JSON lines, anything else CSV
+	if path.splitext(fileName)[1].lower() in ('.json', '.jsonl'):
+		return JsonLinesReportWriter(f)
+	return CsvReportWriter(f)
+
+
+class AssetReport():
+	'''
+	Lists the assets of many scenes without archiving them\n
+	A few scenes and the XRefs they reference are parsed ahead on a thread
+	pool, or in the worker processes when MaxFileZip has a ProcessParser,
+	while the scenes are walked in table order. Each scene's rows are
+	stat'ed and written as soon as its walk ends and its asset table is
+	dropped, so memory does not grow with the number of scenes
+	'''
+
+	def __init__(self, maxZip: MaxFileZip, workers: int = 4):
+		self.maxZip = maxZip
+		self.workers = max(1, workers)
+		# Scenes parsed ahead of the walk
+		self.lookahead = self.workers * 2
+		# scene -> Future of its asset table
+		self.parsing: dict = {}
+		self._lock = threading.Lock()
+
+	def parseAhead(self, pool: ThreadPoolExecutor, files):
+		with self._lock:
+			files = [file for file in files if file not in self.parsing and file not in self.maxZip.graph.nodes]
+			for file in files:
+				self.parsing[file] = pool.submit(self.parseOne, pool, file)
+
+	def parseOne(self, pool: ThreadPoolExecutor, file: str) -> Optional[list]:
+		assets = self.maxZip.parseFile(file)
+		# The XRefs start parsing before the walk gets to them
+		xrefs = [XRefGraph.assetPath(oleAsset) for oleAsset in assets or () if oleAsset.assetType == 'XRef']
+		self.parseAhead(pool, [xref for xref in xrefs if path.exists(xref)])
+		return assets
+
+	def parsed(self, file: str) -> Optional[list]:
+		# parseFn of the graph while the report runs
+		with self._lock:
+			future = self.parsing.pop(file, None)
+		if future is None:
+			return self.maxZip.parseFile(file)
+		return future.result()
+
+	def sceneRows(self, scene: str) -> Optional[list]:
+		graph = self.maxZip.graph
+		walk = graph.walkAssets(scene)
+		if walk is None:
+			graph.forget(scene)
+			return None
+		oleAssets = list(walk)
+		graph.forget(scene)
+		assetStats = self.maxZip.statService.statMany(XRefGraph.assetPath(oleAsset) for oleAsset in oleAssets)
+		rows = []
+		for oleAsset in oleAssets:
+			assetStat = assetStats[XRefGraph.assetPath(oleAsset)]
+			rows.append(dict(scene=scene, asset=assetStat.path, type=oleAsset.assetType, exists=assetStat.exists, size=assetStat.size))
+		return rows
+
+	def write(self, rowData: dict, fileName: str, **kwargs) -> dict:
+		"""Writes the report of every scene to a CSV or JSON lines file
+
+		Args:
+			rowData (dict): {row: max file path}
+			fileName (str): Report file, .json and .jsonl write JSON lines, anything else CSV
+
+		Returns:
+			dict: file, scenes, rows, errors, missing and bytes of the existing assets
+		"""
+		callbacks = Callbacks(**kwargs)
+		summary = dict(file=fileName, scenes=0, rows=0, errors=[], missing=0, bytes=0)
+		graph = self.maxZip.graph
+		parseFn = graph.parseFn
+		with open(fileName, 'w', newline='', encoding='utf-8') as f, ThreadPoolExecutor(max_workers=self.workers) as pool:
+			writer = reportWriter(f, fileName)
+			if self.maxZip.parser is None:
+				graph.parseFn = self.parsed
+			scenes = list(rowData.values())
+			try:
+				for index, (row, scene) in enumerate(rowData.items()):
+					if self.maxZip.parser is not None:
+						self.maxZip.prefetch(scenes[index:index + self.lookahead])
+					else:
+						self.parseAhead(pool, scenes[index:index + self.lookahead])
+					callbacks.setstarted((row, 'proc'))
+					rows = self.sceneRows(scene)
+					if rows is None:
+						callbacks.seterror((row, 'error'))
+						summary['errors'].append(scene)
+						continue
+
+					writer.write(rows)
+					summary['scenes'] += 1
+					summary['rows'] += len(rows)
+					summary['missing'] += sum(1 for r in rows if not r['exists'])
+					summary['bytes'] += sum(r['size'] for r in rows)
+					callbacks.callback((row, 100))
+					callbacks.setfinished((row, 'good'))
+					callbacks.setlog(f'Listed {summary["scenes"] + len(summary["errors"])} of {len(rowData)} scenes, {summary["rows"]} assets')
+			finally:
+				graph.parseFn = parseFn
+				self.maxZip.releasePrefetched()
+				with self._lock:
+					for future in self.parsing.values():
+						future.cancel()
+					self.parsing.clear()
+		return summary
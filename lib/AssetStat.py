@@ -0,0 +1,133 @@
+import os
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from os import path
+from typing import Iterable, Optional
+
+
+@dataclass
+class AssetStat():
+	path: str = ''
+	exists: bool = False
+	size: int = 0
+	mtime: float = 0.0
+
+class AssetStatService():
+	'''
+	Existence, size and mtime of asset files\n
+	Paths are grouped by parent directory and each directory is
+	listed once with os.scandir instead of stat'ing every file.
+	With a store, the names in a directory whose mtime hasn't changed
+	come from it instead of a new listing. Only the assets asked for
+	are stat'ed, so their sizes are always current
+	'''
+
+	def __init__(self, maxWorkers: int = 8, store=None, saveListings: bool = False):
+		self.maxWorkers = maxWorkers
+		# AssetCache with listings of earlier runs, None lists every directory
+		self.store = store
+		# Only the pre-scan writes listings to the store, archive runs just read them
+		self.saveListings = saveListings
+		# normcased directory -> {normcased name: DirEntry}, None if it can't be listed
+		self._dirs: dict = {}
+		self._lock = threading.Lock()
+
+	def listDir(self, directory: str) -> Optional[dict]:
+		key = path.normcase(directory)
+		with self._lock:
+			if key in self._dirs:
+				return self._dirs[key]
+		
+		entries = None
+		try:
+			if self.store is not None:
+				entries = self.storedListing(directory)
+			else:
+				with os.scandir(directory or '.') as it:
+					entries = {path.normcase(entry.name): entry for entry in it}
+		except (FileNotFoundError, NotADirectoryError):
+			entries = {}
+		except OSError:
+			# Listing not allowed, fall back to stat'ing single files
+			entries = None
+		
+		with self._lock:
+			self._dirs[key] = entries
+		return entries
+
+	def storedListing(self, directory: str) -> dict:
+		# {normcased name: None} from the store while the directory is unchanged, a new listing otherwise
+		mtime = os.stat(directory or '.').st_mtime_ns
+		names = self.store.getListing(directory, mtime)
+		if names is not None:
+			return dict.fromkeys(names)
+
+		with os.scandir(directory or '.') as it:
+			entries = {path.normcase(entry.name): entry for entry in it}
+		# A file added in the same mtime tick as the listing would be missed for good
+		if self.saveListings and time.time_ns() - mtime > 2000000000:
+			self.store.putListing(directory, mtime, list(entries))
+		return entries
+
+	def statEntry(self, assetPath: str, entries: Optional[dict]) -> AssetStat:
+		assetStat = AssetStat(assetPath)
+		try:
+			if entries is None:
+				st = os.stat(assetPath)
+			else:
+				name = path.normcase(path.basename(assetPath))
+				if name not in entries:
+					return assetStat
+				# Stored listings have names only, the file itself is stat'ed
+				entry = entries[name]
+				st = os.stat(assetPath) if entry is None else entry.stat()
+		except OSError:
+			return assetStat
+
+		assetStat.exists = True
+		assetStat.size = st.st_size
+		assetStat.mtime = st.st_mtime
+		return assetStat
+
+	def stat(self, assetPath: str) -> AssetStat:
+		"""Stat of a single asset, its directory is listed on first use
+
+		Args:
+			assetPath (str): Asset file path
+
+		Returns:
+			AssetStat: existence, size and mtime
+		"""
+		return self.statEntry(assetPath, self.listDir(path.dirname(assetPath)))
+
+	def statMany(self, assetPaths: Iterable[str]) -> dict:
+		"""Stats a whole asset set, directories are listed in parallel
+
+		Args:
+			assetPaths (Iterable[str]): Asset file paths
+
+		Returns:
+			dict: {asset path: AssetStat}
+		"""
+		byDir = {}
+		for assetPath in assetPaths:
+			byDir.setdefault(path.dirname(assetPath), {})[assetPath] = None
+		
+		def statDir(directory):
+			entries = self.listDir(directory)
+			return [self.statEntry(assetPath, entries) for assetPath in byDir[directory]]
+
+		assetStats = {}
+		with ThreadPoolExecutor(max_workers=self.maxWorkers) as pool:
+			for dirStats in pool.map(statDir, byDir):
+				for assetStat in dirStats:
+					assetStats[assetStat.path] = assetStat
+		
+		return assetStats
+
+	def clear(self):
+		with self._lock:
+			self._dirs.clear()
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+
+from os import path
+from typing import Optional
+
+from lib.ParallelZip import CompressedEntry
+
+
+class BlobCache():
+	'''
+	Disk cache of compressed zip entry data shared between archives\n
+	Entries are keyed by source path and compression level and checked
+	against the source size and mtime, the total size of the blobs is
+	bounded with LRU eviction
+	'''
+
+	def __init__(self, blobDir: str, maxBytes: int = 10 * 1024 * 1024 * 1024):
+		self.blobDir = blobDir
+		self.maxBytes = maxBytes
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		# blob name -> number of entries currently reading it
+		self._inUse: dict = {}
+
+		os.makedirs(blobDir, exist_ok=True)
+		with self._lock:
+			db = self.connection()
+			db.execute('''CREATE TABLE IF NOT EXISTS blobs (
+				path TEXT NOT NULL,
+				level INTEGER NOT NULL,
+				size INTEGER NOT NULL,
+				mtime INTEGER NOT NULL,
+				compressType INTEGER NOT NULL,
+				crc INTEGER NOT NULL,
+				compressSize INTEGER NOT NULL,
+				blobName TEXT,
+				lastUsed REAL NOT NULL,
+				PRIMARY KEY (path, level))''')
+			db.execute('CREATE INDEX IF NOT EXISTS blobsLastUsed ON blobs (lastUsed)')
+			self.removeOrphans(db)
+			db.commit()
+
+	def connection(self) -> sqlite3.Connection:
+		db = getattr(self._local, 'db', None)
+		if db is None:
+			db = sqlite3.connect(path.join(self.blobDir, 'index.sqlite'), timeout=30)
+			db.execute('PRAGMA journal_mode=WAL')
+			self._local.db = db
+		return db
+
+	def blobPath(self, blobName: str) -> str:
+		return path.join(self.blobDir, blobName)
+
+	def acquire(self, blobName: str):
+		with self._lock:
+			self._inUse[blobName] = self._inUse.get(blobName, 0) + 1
+
+	def release(self, blobName: str):
+		with self._lock:
+			self._inUse[blobName] -= 1
+			if self._inUse[blobName] == 0:
+				del self._inUse[blobName]
+
+	def lookup(self, sourceFile: str, arcname: str, compressLevel: int, compressType: Optional[int] = None) -> Optional[CompressedEntry]:
+		"""Cached compressed entry for a source file
+
+		Args:
+			sourceFile (str): File about to be archived
+			arcname (str): Name of the entry in the archive
+			compressLevel (int): zlib compression level
+			compressType (int): Required compression type, None accepts the cached choice
+
+		Returns:
+			CompressedEntry: Entry reading from the cached blob, None on a miss
+		"""
+		fileStat = os.stat(sourceFile)
+		db = self.connection()
+		row = db.execute('SELECT size, mtime, compressType, crc, compressSize, blobName FROM blobs WHERE path = ? AND level = ?',
+			(sourceFile, compressLevel)).fetchone()
+		if row is None:
+			return None
+
+		size, mtime, cachedType, crc, compressSize, blobName = row
+		if size != fileStat.st_size or mtime != fileStat.st_mtime_ns or (compressType is not None and compressType != cachedType):
+			return None
+
+		zinfo = zipfile.ZipInfo.from_file(sourceFile, arcname)
+		zinfo.compress_type = cachedType
+		zinfo.file_size = size
+		zinfo.compress_size = compressSize
+		zinfo.CRC = crc
+		entry = CompressedEntry(zinfo, sourceFile)
+
+		if blobName is not None:
+			self.acquire(blobName)
+			try:
+				if path.getsize(self.blobPath(blobName)) != compressSize:
+					raise OSError('Blob size mismatch')
+				entry.rawData = open(self.blobPath(blobName), 'rb')
+			except OSError:
+				self.release(blobName)
+				return None
+			entry.release = lambda: self.release(blobName)
+
+		with self._lock:
+			db.execute('UPDATE blobs SET lastUsed = ? WHERE path = ? AND level = ?', (time.time(), sourceFile, compressLevel))
+			db.commit()
+		return entry
+
+	def newBlob(self) -> tuple:
+		"""Opens a new blob file to compress into
+
+		Returns:
+			tuple: (blob name, file object opened for writing and reading)
+		"""
+		blobName = uuid.uuid4().hex
+		self.acquire(blobName)
+		return (blobName, open(self.blobPath(blobName), 'w+b'))
+
+	def store(self, entry: CompressedEntry, fileStat: os.stat_result, compressLevel: int, blobName: Optional[str] = None):
+		"""Registers a freshly compressed entry
+
+		Args:
+			entry (CompressedEntry): Entry with CRC and sizes filled in
+			fileStat (os.stat_result): Stat of the source taken before it was read
+			compressLevel (int): zlib compression level
+			blobName (str): Blob from newBlob holding the data, None for stored entries
+		"""
+		zinfo = entry.zinfo
+		if blobName is not None:
+			entry.release = lambda: self.release(blobName)
+
+		db = self.connection()
+		with self._lock:
+			previous = db.execute('SELECT blobName FROM blobs WHERE path = ? AND level = ?', (entry.sourceFile, compressLevel)).fetchone()
+			if previous is not None and previous[0] is not None and previous[0] != blobName:
+				self.removeBlob(previous[0])
+			db.execute('INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+				(entry.sourceFile, compressLevel, fileStat.st_size, fileStat.st_mtime_ns, zinfo.compress_type,
+				zinfo.CRC, zinfo.compress_size, blobName, time.time()))
+			self.evict(db)
+			db.commit()
+
+	def discard(self, blobName: str):
+		# Blob that never made it into the index
+		self.release(blobName)
+		try:
+			os.remove(self.blobPath(blobName))
+		except OSError:
+			pass
+
+	def removeBlob(self, blobName: str) -> bool:
+		# Called with the lock held, blobs being read are left alone
+		if blobName in self._inUse:
+			return False
+		try:
+			os.remove(self.blobPath(blobName))
+		except FileNotFoundError:
+			pass
+		except OSError:
+			return False
+		return True
+
+	def removeOrphans(self, db: sqlite3.Connection):
+		# Blob files the index no longer points to, left behind by replaced entries.
+		# Recent ones may still be written by another archiver process sharing the cache
+		known = {name for (name,) in db.execute('SELECT blobName FROM blobs WHERE blobName IS NOT NULL')}
+		cutoff = time.time() - 3600
+		for entry in os.scandir(self.blobDir):
+			if not entry.name.startswith('index.sqlite') and entry.name not in known and entry.stat().st_mtime < cutoff:
+				self.removeBlob(entry.name)
+
+	def evict(self, db: sqlite3.Connection):
+		# Called with the lock held, drops least recently used blobs over the budget
+		total = db.execute('SELECT COALESCE(SUM(compressSize), 0) FROM blobs WHERE blobName IS NOT NULL').fetchone()[0]
+		if total <= self.maxBytes:
+			return
+
+		for sourceFile, level, blobName, compressSize in db.execute(
+			'SELECT path, level, blobName, compressSize FROM blobs WHERE blobName IS NOT NULL ORDER BY lastUsed').fetchall():
+			if total <= self.maxBytes:
+				break
+			if self.removeBlob(blobName):
+				db.execute('DELETE FROM blobs WHERE path = ? AND level = ?', (sourceFile, level))
+				total -= compressSize
@@ -0,0 +1,138 @@
+class Callbacks():
+	'''
+	Progress hooks passed to MaxFileZip.main\n
+	Each hook can be a Qt signal or any callable taking one argument
+	'''
+	def __init__(self, **kwargs) -> None:
+		self.progress_callback = None
+		self.progress_setformat = None
+		self.progress_setlabel = None
+		self.progress_setmin = None
+		self.progress_setmax = None
+		self.progress_setlog = None
+		self.progress_setstarted = None
+		self.progress_finished = None
+		self.progress_error = None
+		self.progress_stats = None
+		self.var = None
+		self.setupVars(**kwargs)
+	
+	def setupVars(self, **kwargs):
+		try:
+			self.progress_callback = kwargs['progress_callback']
+		except:
+			pass
+		
+		try:
+			self.progress_setstarted = kwargs['progress_started']
+		except:
+			pass
+
+		try:
+			self.progress_finished = kwargs['progress_finished']
+		except:
+			pass
+
+		try:
+			self.progress_error = kwargs['progress_error']
+		except:
+			pass
+
+		try:
+			self.progress_setformat = kwargs['progress_setformat']
+		except:
+			pass
+		
+		try:
+			self.progress_setlabel = kwargs['progress_setlabel']
+		except:
+			pass
+		
+		try:
+			self.progress_setmin = kwargs['progress_setmin']
+		except:
+			pass
+		
+		try:
+			self.progress_setmax = kwargs['progress_setmax']
+		except:
+			pass
+		
+		try:
+			self.progress_setlog = kwargs['progress_setlog']
+		except:
+			pass
+		
+		try:
+			self.progress_stats = kwargs['progress_stats']
+		except:
+			pass
+	
+	def send(self, target, var):
+		emit = getattr(target, 'emit', target)
+		emit(var)
+
+	def setmax(self, var):
+		try:
+			self.send(self.progress_setmax, var)
+		except:
+			pass
+	
+	def setmin(self, var):
+		try:
+			self.send(self.progress_setmin, var)
+		except:
+			pass
+
+	def setlabel(self, var):
+		try:
+			self.send(self.progress_setlabel, var)
+		except:
+			pass
+	
+	def setlog(self, var):
+		try:
+			self.send(self.progress_setlog, var)
+		except:
+			pass
+
+	def setformat(self, var):
+		try:
+			self.send(self.progress_setformat, var)
+		except:
+			pass
+	
+	def setstarted(self, var):
+		try:
+			self.send(self.progress_setstarted, var)
+		except:
+			pass
+	
+	def setfinished(self, var):
+		try:
+			self.send(self.progress_finished, var)
+		except:
+			pass
+	
+	def seterror(self, var):
+		try:
+			self.send(self.progress_error, var)
+		except:
+			pass
+
+	def callback(self, var):
+		if self.progress_callback is None:
+			return
+		try:
+			self.send(self.progress_callback, var)
+		except Exception as e: 
+			print(e)
+
+	def stats(self, var):
+		# TransferStats with bytes, MB/s and ETA of a row, row None for the whole job
+		if self.progress_stats is None:
+			return
+		try:
+			self.send(self.progress_stats, var)
+		except Exception as e: 
+			print(e)
\ No newline at end of file
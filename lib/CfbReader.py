@@ -0,0 +1,241 @@
+import mmap
+import struct
+
+from typing import Optional
+
+MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+# Same lower bound as olefile.isOleFile
+MINIMAL_SIZE = 1536
+HEADER_DIFAT = 109
+DIR_ENTRY_SIZE = 128
+MAXREGSECT = 0xFFFFFFFA
+ENDOFCHAIN = 0xFFFFFFFE
+NOSTREAM = 0xFFFFFFFF
+STREAM_TYPE = 2
+ROOT_TYPE = 5
+
+
+class CfbError(ValueError):
+	'''
+	Compound file the minimal reader can not follow, olefile reads it instead
+	'''
+
+
+class CfbReader():
+	'''
+	Memory mapped reader for single streams of a compound file (OLE)\n
+	Only the FAT sectors, directory entries and MiniFAT sectors on the
+	way to the requested stream are read, olefile loads all of them
+	up front. Streams are looked up in the root storage
+	'''
+
+	def __init__(self, file: str):
+		self.file = file
+		self.data = None
+		self._f = open(file, 'rb')
+		try:
+			self.size = self._f.seek(0, 2)
+			if self.size >= MINIMAL_SIZE:
+				self.data = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+			if self.isOle():
+				self.readHeader()
+		except BaseException:
+			# A bad header leaves neither the file nor the map open
+			self.close()
+			raise
+
+	def readHeader(self):
+		(self.sectorShift, self.miniSectorShift) = struct.unpack_from('<HH', self.data, 30)
+		(self.fatCount, self.dirStart, _, self.miniCutoff, self.miniFatStart, _, self.difatStart, self.difatCount) = struct.unpack_from('<IIIIIIII', self.data, 44)
+		if self.sectorShift not in (9, 12) or self.miniSectorShift != 6:
+			raise CfbError(f'Unsupported sector size in {self.file}')
+		self.sectorSize = 1 << self.sectorShift
+		self.perSector = self.sectorSize // 4
+		# Upper bound of chain lengths, guards against loops in damaged files
+		self.sectorCount = (self.size + self.sectorSize - 1) // self.sectorSize
+		# FAT sector index -> its entries, loaded on first use
+		self.fatSectors: dict = {}
+		self.difat = list(struct.unpack_from(f'<{HEADER_DIFAT}I', self.data, 76))
+		self.nextDifat = self.difatStart
+		# Sectors of the directory, MiniFAT and mini stream chains found so far
+		self.chains: dict = {}
+		self.root = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		self.close()
+		return False
+
+	def close(self):
+		if self.data is not None:
+			self.data.close()
+			self.data = None
+		self._f.close()
+
+	def isOle(self) -> bool:
+		return self.data is not None and self.data[:8] == MAGIC
+
+	def sector(self, sid: int) -> int:
+		# File offset of a sector, the header takes the first one
+		offset = (sid + 1) << self.sectorShift
+		if sid > MAXREGSECT or offset >= self.size:
+			raise CfbError(f'Sector {sid} outside of {self.file}')
+		return offset
+
+	def fatSectorId(self, index: int) -> int:
+		# The first 109 FAT sectors are listed in the header, the rest in the DIFAT chain
+		while index >= len(self.difat):
+			if self.nextDifat > MAXREGSECT or len(self.difat) >= self.fatCount:
+				raise CfbError(f'FAT sector {index} not in the DIFAT of {self.file}')
+			offset = self.sector(self.nextDifat)
+			values = struct.unpack_from(f'<{self.perSector}I', self.data, offset)
+			self.difat.extend(values[:-1])
+			self.nextDifat = values[-1]
+		return self.difat[index]
+
+	def nextSector(self, sid: int) -> int:
+		index, position = divmod(sid, self.perSector)
+		entries = self.fatSectors.get(index)
+		if entries is None:
+			entries = struct.unpack_from(f'<{self.perSector}I', self.data, self.sector(self.fatSectorId(index)))
+			self.fatSectors[index] = entries
+		return entries[position]
+
+	def chain(self, start: int, count: int) -> list:
+		"""First count sectors of a FAT chain
+
+		Args:
+			start (int): First sector
+			count (int): Sectors needed, the chain may be longer
+
+		Returns:
+			list: Sector ids
+		"""
+		if start > MAXREGSECT:
+			raise CfbError(f'Broken sector chain in {self.file}')
+		sids = [start]
+		while len(sids) < count:
+			sid = self.nextSector(sids[-1])
+			if sid > MAXREGSECT or len(sids) > self.sectorCount:
+				raise CfbError(f'Broken sector chain in {self.file}')
+			sids.append(sid)
+		return sids
+
+	def chainSector(self, name: str, start: int, index: int) -> int:
+		# index-th sector of a chain read more than once, extended as needed
+		sids = self.chains.setdefault(name, [])
+		if index >= len(sids):
+			if not sids:
+				sids.append(start)
+			sid = sids[-1]
+			while index >= len(sids):
+				if len(sids) > self.sectorCount:
+					raise CfbError(f'Broken sector chain in {self.file}')
+				sid = self.nextSector(sid)
+				if sid > MAXREGSECT:
+					raise CfbError(f'Sector chain of {name} ends early in {self.file}')
+				sids.append(sid)
+		return sids[index]
+
+	def entry(self, sid: int) -> tuple:
+		# (name, type, left, right, child, start, size) of a directory entry
+		perSector = self.sectorSize // DIR_ENTRY_SIZE
+		offset = self.sector(self.chainSector('dir', self.dirStart, sid // perSector)) + (sid % perSector) * DIR_ENTRY_SIZE
+		nameLength, entryType = struct.unpack_from('<HB', self.data, offset + 64)
+		left, right, child = struct.unpack_from('<III', self.data, offset + 68)
+		start, size = struct.unpack_from('<II', self.data, offset + 116)
+		if self.sectorShift == 12:
+			size |= struct.unpack_from('<I', self.data, offset + 124)[0] << 32
+		name = bytes(self.data[offset:offset + max(0, min(nameLength, 64) - 2)]).decode('utf-16-le', 'ignore')
+		return (name, entryType, left, right, child, start, size)
+
+	def find(self, name: str) -> Optional[tuple]:
+		"""Directory entry of a stream in the root storage
+
+		Args:
+			name (str): Stream name
+
+		Returns:
+			tuple: Entry, None if the root has no such stream
+		"""
+		if self.root is None:
+			self.root = self.entry(0)
+			if self.root[1] != ROOT_TYPE:
+				raise CfbError(f'No root entry in {self.file}')
+
+		# Siblings form a red-black tree ordered by name length, then upper case name
+		key = (len(name), name.upper())
+		sid = self.root[4]
+		for _ in range(self.sectorCount * (self.sectorSize // DIR_ENTRY_SIZE) + 1):
+			if sid == NOSTREAM:
+				return None
+			entry = self.entry(sid)
+			entryKey = (len(entry[0]), entry[0].upper())
+			if key == entryKey:
+				return entry if entry[1] == STREAM_TYPE else None
+			sid = entry[2] if key < entryKey else entry[3]
+		raise CfbError(f'Loop in the directory of {self.file}')
+
+	def exists(self, name: str) -> bool:
+		try:
+			return self.find(name) is not None
+		except struct.error:
+			raise CfbError(f'Truncated compound file {self.file}')
+
+	def read(self, name: str) -> Optional[bytes]:
+		"""Reads a stream of the root storage
+
+		Args:
+			name (str): Stream name
+
+		Returns:
+			bytes: Stream data, None if there is no such stream
+		"""
+		try:
+			entry = self.find(name)
+			if entry is None:
+				return None
+			start, size = entry[5], entry[6]
+			if size == 0:
+				return b''
+			if size < self.miniCutoff:
+				return self.readMini(start, size)
+			return self.readSectors(start, size)
+		except struct.error:
+			raise CfbError(f'Truncated compound file {self.file}')
+
+	def readSectors(self, start: int, size: int) -> bytes:
+		# Runs of consecutive sectors are copied with one slice
+		chunks = []
+		runStart = runEnd = None
+		for sid in self.chain(start, (size + self.sectorSize - 1) // self.sectorSize):
+			offset = self.sector(sid)
+			if offset != runEnd:
+				if runStart is not None:
+					chunks.append(self.data[runStart:runEnd])
+				runStart = offset
+			runEnd = offset + self.sectorSize
+		chunks.append(self.data[runStart:runEnd])
+		data = b''.join(chunks)
+		if len(data) < size:
+			raise CfbError(f'Stream runs past the end of {self.file}')
+		return data[:size]
+
+	def readMini(self, start: int, size: int) -> bytes:
+		# Small streams live in 64 byte sectors inside the root entry's stream
+		miniSize = 1 << self.miniSectorShift
+		perMiniFat = self.perSector
+		miniPerSector = self.sectorSize // miniSize
+		chunks = []
+		sid = start
+		for _ in range((size + miniSize - 1) // miniSize):
+			if sid > MAXREGSECT:
+				raise CfbError(f'Mini stream chain ends early in {self.file}')
+			sector = self.chainSector('mini', self.root[5], sid // miniPerSector)
+			offset = self.sector(sector) + (sid % miniPerSector) * miniSize
+			chunks.append(self.data[offset:offset + miniSize])
+			miniFatSector = self.sector(self.chainSector('minifat', self.miniFatStart, sid // perMiniFat))
+			sid = struct.unpack_from('<I', self.data, miniFatSector + (sid % perMiniFat) * 4)[0]
+		return b''.join(chunks)[:size]
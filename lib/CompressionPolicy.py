@@ -0,0 +1,112 @@
+import threading
+import time
+import zipfile
+import zlib
+
+from os import path
+
+# Formats that are already compressed, deflating them costs CPU for nothing
+DEFAULT_STORE_EXTENSIONS = '.jpg .jpeg .png .gif .webp .jp2 .vrmesh .mp4 .mov .avi .mkv .wmv .mp3 .zip .7z .rar .gz'
+
+
+class CompressionPolicy():
+	'''
+	Chooses between ZIP_STORED and ZIP_DEFLATED per entry\n
+	Known compressed formats are stored, anything else
+	is decided by deflating a sample from the start of the file
+	'''
+
+	def __init__(self, storeExtensions: str = DEFAULT_STORE_EXTENSIONS, sampleKB: int = 256, minRatio: float = 0.9, compressLevel: int = zlib.Z_DEFAULT_COMPRESSION):
+		self.storeExtensions = {e.lower() if e.startswith('.') else '.' + e.lower() for e in storeExtensions.split()}
+		self.sampleBytes = sampleKB * 1024
+		self.minRatio = minRatio
+		self.compressLevel = compressLevel
+
+		self._lock = threading.Lock()
+		self.storedFiles = 0
+		self.storedBytes = 0
+		self.deflatedFiles = 0
+		self.deflatedBytes = 0
+		self.deflateSeconds = 0.0
+		self.sampleSeconds = 0.0
+		self.sampledBytes = 0
+
+	@classmethod
+	def fromSettings(cls, settings) -> 'CompressionPolicy':
+		"""Builds a policy from an ini section or any mapping of strings
+
+		Args:
+			settings (Mapping): storeExtensions, sampleKB, minRatio
+
+		Returns:
+			CompressionPolicy: configured policy
+		"""
+		return cls(settings.get('storeExtensions', DEFAULT_STORE_EXTENSIONS),
+			int(settings.get('sampleKB', 256)),
+			float(settings.get('minRatio', 0.9)))
+
+	def sampleRatio(self, sourceFile: str) -> float:
+		with open(sourceFile, 'rb') as f:
+			sample = f.read(self.sampleBytes)
+		if not sample:
+			return 1.0
+
+		start = time.perf_counter()
+		compressor = zlib.compressobj(self.compressLevel, zlib.DEFLATED, -15)
+		compressedSize = len(compressor.compress(sample)) + len(compressor.flush())
+		seconds = time.perf_counter() - start
+
+		with self._lock:
+			self.sampleSeconds += seconds
+			self.sampledBytes += len(sample)
+		return compressedSize / len(sample)
+
+	def storesByName(self, sourceFile: str) -> bool:
+		# Stored for its extension, without reading it
+		return path.splitext(sourceFile)[1].lower() in self.storeExtensions
+
+	def choose(self, sourceFile: str) -> int:
+		"""Compression type for a file
+
+		Args:
+			sourceFile (str): File about to be archived
+
+		Returns:
+			int: zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED
+		"""
+		if self.storesByName(sourceFile):
+			return zipfile.ZIP_STORED
+		if self.sampleBytes > 0 and self.sampleRatio(sourceFile) > self.minRatio:
+			return zipfile.ZIP_STORED
+		return zipfile.ZIP_DEFLATED
+
+	def record(self, compressType: int, fileSize: int, seconds: float):
+		# Called by the compression workers once an entry is done
+		with self._lock:
+			if compressType == zipfile.ZIP_STORED:
+				self.storedFiles += 1
+				self.storedBytes += fileSize
+			else:
+				self.deflatedFiles += 1
+				self.deflatedBytes += fileSize
+				self.deflateSeconds += seconds
+
+	def deflateRate(self) -> float:
+		# Bytes per second, measured on this run's deflated files or samples
+		if self.deflatedBytes > 0 and self.deflateSeconds > 0:
+			return self.deflatedBytes / self.deflateSeconds
+		if self.sampledBytes > 0 and self.sampleSeconds > 0:
+			return self.sampledBytes / self.sampleSeconds
+		return 0.0
+
+	def secondsSaved(self) -> float:
+		# Estimated deflate time avoided by storing, minus the time spent sampling
+		rate = self.deflateRate()
+		if rate == 0.0:
+			return 0.0
+		return self.storedBytes / rate - self.sampleSeconds
+
+	def summary(self) -> str:
+		return (f'Stored {self.storedFiles} files ({self.storedBytes/1048576:.1f} MB), '
+			f'deflated {self.deflatedFiles} files ({self.deflatedBytes/1048576:.1f} MB), '
+			f'about {self.secondsSaved():.1f}s of compression saved')
@@ -11,7 +11,6 @@ from PyQt5.QtGui import *
 
 from lib.Threading import Worker, Callbacks
 from lib.MaxZipFile import MaxFileZip
-from lib.ProgressWindow import ProgressWindow
 
 class ContextMenu(QMenu):
 	def __init__(self, parent):
@@ -32,7 +31,7 @@ class ContextMenu(QMenu):
 	def showMenu(self, event):
 		self.index = self.fileTable.indexAt(event.pos())
 		if self.index.isValid():
-			maxFile = self.index.data()
+			maxFile = self.fileTable.fileName(self.index.row())
 			self.updateAction.setText(f'List Assets for: {maxFile}')
 			self.updateAction.setEnabled(True)
 			# Connection can be made to more than one function
@@ -50,6 +49,9 @@ class ContextMenu(QMenu):
 		self.exec(event.globalPos())
 
 	def getFileAssetsTriggered(self, maxfile):
+		# Only needed once the menu is used, keeps it out of the startup imports
+		from lib.ProgressWindow import ProgressWindow
+		
 		self.progressWindow = ProgressWindow(self.fileTable, label='Loading...', showLog=False, min=0, max=0)
 		self.progressWindow.show()
 
@@ -63,8 +65,11 @@ class ContextMenu(QMenu):
 	def getFileAssets(self, maxFile, **kwargs):
 		allAssetsPaths = set()
 
-		maxZip = MaxFileZip(None, None, None, True)
-		fileAssetsPaths = maxZip.collectAssetsPathsFromFile(maxFile, [])
+		if self.mainWindow:
+			maxZip = self.mainWindow.newMaxFileZip(None, None, None)
+		else:
+			maxZip = MaxFileZip(None, None, None, True)
+		fileAssetsPaths = maxZip.collectAssetsPathsFromFile(maxFile)
 		allAssetsPaths.update(fileAssetsPaths)
 		
 		allAssetsPaths = list(allAssetsPaths)
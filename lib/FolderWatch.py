@@ -0,0 +1,361 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+from os import path
+from typing import Optional
+
+from lib.AssetStat import AssetStatService
+from lib.Callbacks import Callbacks
+from lib.MaxZipFile import MaxFileZip
+from lib.Relocator import parseRoots
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# wd, mask, cookie, name length
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def isMaxFile(name: str) -> bool:
+	return name.lower().endswith('.max')
+
+def walkMaxFiles(folder: str, onDir=None) -> dict:
+	"""Max files under a folder, links to directories are not followed
+
+	Args:
+		folder (str): Folder to walk
+		onDir (callable): Called with each directory before it is listed
+
+	Returns:
+		dict: {max file path: (size, mtime_ns)}
+	"""
+	files = {}
+	directories = [folder]
+	while directories:
+		directory = directories.pop()
+		# Errors of onDir are the caller's, unreadable directories are skipped
+		if onDir is not None:
+			onDir(directory)
+		try:
+			with os.scandir(directory) as it:
+				for entry in it:
+					try:
+						if entry.is_dir(follow_symlinks=False):
+							directories.append(entry.path)
+						elif isMaxFile(entry.name) and entry.is_file():
+							st = entry.stat()
+							files[entry.path] = (st.st_size, st.st_mtime_ns)
+					except OSError:
+						pass
+		except OSError:
+			pass
+	return files
+
+
+class PollingWatcher():
+	'''
+	Finds new and re-saved max files by walking the folders every interval\n
+	Works on any OS and on network shares, where inotify sees only local writes
+	'''
+
+	def __init__(self, folders: list, interval: float = 30.0):
+		self.folders = folders
+		self.interval = interval
+		self.known: dict = {}
+		self.lastWalk = None
+
+	def changes(self, timeout: float) -> set:
+		"""Max files written since the last call, all of them on the first call
+
+		Args:
+			timeout (float): Seconds to wait for the next walk
+
+		Returns:
+			set: Max file paths
+		"""
+		if self.lastWalk is not None:
+			remaining = self.lastWalk + self.interval - time.monotonic()
+			if remaining > 0:
+				time.sleep(min(timeout, remaining))
+				return set()
+
+		self.lastWalk = time.monotonic()
+		files = {}
+		for folder in self.folders:
+			files.update(walkMaxFiles(folder))
+		changed = {file for file, key in files.items() if self.known.get(file) != key}
+		self.known = files
+		return changed
+
+	def close(self):
+		self.known = {}
+
+
+class InotifyWatcher():
+	'''
+	Finds new and re-saved max files through Linux inotify\n
+	Every directory under the folders gets a watch, files are reported
+	when they are closed after writing or moved in. Raises OSError when
+	inotify is not available or the watch limit is reached
+	'''
+
+	def __init__(self, folders: list):
+		if not sys.platform.startswith('linux'):
+			raise OSError(errno.ENOSYS, 'inotify is only available on Linux')
+		libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+		if not hasattr(libc, 'inotify_init1'):
+			raise OSError(errno.ENOSYS, 'libc has no inotify')
+		self.libc = libc
+		self.libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+		self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if self.fd < 0:
+			error = ctypes.get_errno()
+			raise OSError(error, os.strerror(error))
+		self.folders = folders
+		# watch descriptor -> directory
+		self.watches: dict = {}
+		# Files found while adding watches, reported by the next changes
+		self.found: set = set()
+		try:
+			for folder in folders:
+				self.watchTree(folder)
+		except OSError:
+			self.close()
+			raise
+
+	def addWatch(self, directory: str):
+		wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR)
+		if wd < 0:
+			error = ctypes.get_errno()
+			if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+				# Gone or not readable, skipped like walkMaxFiles does
+				return
+			# ENOSPC is fs.inotify.max_user_watches
+			raise OSError(error, f'{os.strerror(error)}: {directory}')
+		self.watches[wd] = directory
+
+	def watchTree(self, folder: str):
+		# The watch goes on before the listing so nothing written in between is lost
+		self.found.update(walkMaxFiles(folder, self.addWatch))
+
+	def changes(self, timeout: float) -> set:
+		"""Max files written since the last call, all of them on the first call
+
+		Args:
+			timeout (float): Seconds to wait for events
+
+		Returns:
+			set: Max file paths
+		"""
+		changed, self.found = self.found, set()
+		if changed:
+			timeout = 0
+		if not select.select([self.fd], [], [], timeout)[0]:
+			return changed
+
+		try:
+			data = os.read(self.fd, 64 * 1024)
+		except BlockingIOError:
+			return changed
+
+		offset = 0
+		while offset + EVENT_HEADER.size <= len(data):
+			wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+			name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\x00'))
+			offset += EVENT_HEADER.size + length
+
+			if mask & IN_Q_OVERFLOW:
+				# Events were dropped, every file is reported again
+				for folder in self.folders:
+					changed.update(walkMaxFiles(folder))
+				continue
+			if mask & IN_IGNORED:
+				self.watches.pop(wd, None)
+				continue
+			directory = self.watches.get(wd)
+			if directory is None or name == '':
+				continue
+
+			fileName = path.join(directory, name)
+			if mask & IN_ISDIR:
+				if mask & (IN_CREATE | IN_MOVED_TO):
+					self.watchTree(fileName)
+					changed.update(self.found)
+					self.found = set()
+			elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and isMaxFile(name):
+				changed.add(fileName)
+		return changed
+
+	def close(self):
+		if self.fd >= 0:
+			os.close(self.fd)
+			self.fd = -1
+		self.watches = {}
+
+
+def newWatcher(folders: list, interval: float = 30.0, polling: bool = False):
+	"""InotifyWatcher when it can be used, PollingWatcher otherwise
+
+	Args:
+		folders (list): Folders to watch, with their subfolders
+		interval (float): Seconds between walks of the polling watcher
+		polling (bool): Always poll, for network shares
+
+	Returns:
+		InotifyWatcher or PollingWatcher
+	"""
+	if not polling:
+		try:
+			return InotifyWatcher(folders)
+		except OSError:
+			pass
+	return PollingWatcher(folders, interval)
+
+
+class PreScanner():
+	'''
+	Parses scenes as they are saved into watched folders\n
+	New and re-saved max files are parsed with their XRefs into the
+	AssetCache and their asset directories are listed into it, so a
+	later archive or asset report finds both without reading the scenes.
+	A file is scanned once its size and mtime have not changed for
+	settleSeconds, scenes that are still being written are left alone
+	'''
+
+	def __init__(self, folders: list, cache, interval: float = 30.0, settleSeconds: float = 2.0, polling: bool = False, statWorkers: int = 8):
+		self.folders = folders
+		self.cache = cache
+		self.interval = interval
+		self.settleSeconds = settleSeconds
+		self.polling = polling
+		self.statWorkers = statWorkers
+		self.scannedFiles = 0
+		self.errors = 0
+		self._stop = threading.Event()
+		self._thread = None
+
+	@classmethod
+	def fromSettings(cls, settings, cache) -> Optional['PreScanner']:
+		"""Builds a pre-scanner from an ini section or any mapping of strings
+
+		Args:
+			settings (Mapping): folders, interval, settleSeconds, polling, statWorkers
+			cache (AssetCache): Cache the scenes are parsed into
+
+		Returns:
+			PreScanner: None when no folders are set or there is no cache
+		"""
+		folders = parseRoots(settings.get('folders', ''))
+		if not folders or cache is None:
+			return None
+		return cls(folders, cache, float(settings.get('interval', 30.0)), float(settings.get('settleSeconds', 2.0)),
+			str(settings.get('polling', 'false')).lower() in ('1', 'true', 'yes', 'on'), int(settings.get('statWorkers', 8)))
+
+	def scan(self, file: str, statService: Optional[AssetStatService] = None) -> Optional[dict]:
+		"""Parses a scene and its XRefs into the cache and lists its asset directories
+
+		Args:
+			file (str): Max file path
+			statService (AssetStatService): Shared by the scenes of one pass, they often use the same directories
+
+		Returns:
+			dict: file, assets, missing and seconds, None if not a valid max file
+		"""
+		start = time.perf_counter()
+		# A new MaxFileZip per scene, its XRef graph would keep re-saved XRefs
+		maxZip = MaxFileZip({}, None, cache=self.cache, statWorkers=self.statWorkers)
+		assetPaths = maxZip.collectAssetsPathsFromFile(file)
+		if assetPaths is None:
+			return None
+		assetStats = (statService or AssetStatService(self.statWorkers, self.cache, True)).statMany(assetPaths + [file])
+		missing = sum(1 for assetStat in assetStats.values() if not assetStat.exists)
+		return dict(file=file, assets=len(assetPaths), missing=missing, seconds=time.perf_counter() - start)
+
+	def settled(self, file: str, seen: dict, now: float) -> bool:
+		# seen: file -> ((size, mtime_ns), first time that key was seen)
+		try:
+			st = os.stat(file)
+		except OSError:
+			seen.pop(file, None)
+			return False
+		key = (st.st_size, st.st_mtime_ns)
+		if seen.get(file) is None or seen[file][0] != key:
+			seen[file] = (key, now)
+		# Old enough by its mtime, or unchanged for as long on this clock
+		return time.time() - st.st_mtime >= self.settleSeconds or now - seen[file][1] >= self.settleSeconds
+
+	def run(self, **kwargs):
+		"""Watches the folders until stop is called
+
+		Args:
+			progress_finished: Gets the dict of scan for each scene
+			progress_error: Gets (file, message) for scenes that could not be scanned
+			progress_setlog: Gets which watcher is used
+		"""
+		callbacks = Callbacks(**kwargs)
+		watcher = newWatcher(self.folders, self.interval, self.polling)
+		callbacks.setlog(f'Watching {len(self.folders)} folders with {"inotify" if isinstance(watcher, InotifyWatcher) else "polling"}')
+		# Files waiting to settle
+		pending = {}
+		try:
+			while not self._stop.is_set():
+				try:
+					changed = watcher.changes(0.5)
+				except OSError as e:
+					# Watch limit reached by new directories
+					watcher.close()
+					watcher = PollingWatcher(self.folders, self.interval)
+					callbacks.setlog(f'inotify failed ({e}), polling every {self.interval:g} s')
+					continue
+				for file in changed:
+					# Written again, its settle time starts over
+					pending[file] = None
+				now = time.monotonic()
+				statService = AssetStatService(self.statWorkers, self.cache, True)
+				for file in list(pending):
+					if self._stop.is_set():
+						break
+					if not self.settled(file, pending, now):
+						continue
+					del pending[file]
+					try:
+						scanned = self.scan(file, statService)
+					except Exception as e:
+						self.errors += 1
+						callbacks.seterror((file, str(e)))
+						continue
+					if scanned is None:
+						self.errors += 1
+						callbacks.seterror((file, 'Not a valid max file'))
+						continue
+					self.scannedFiles += 1
+					callbacks.setfinished(scanned)
+		finally:
+			watcher.close()
+
+	def start(self, **kwargs):
+		# Runs on its own thread, a long lived Worker would hold a slot of the Qt threadpool
+		self._stop.clear()
+		self._thread = threading.Thread(target=self.run, kwargs=kwargs, name='PreScanner', daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		if self._thread is not None and self._thread is not threading.current_thread():
+			self._thread.join()
+			self._thread = None
@@ -0,0 +1,161 @@
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from os import path
+from typing import Callable, Optional
+
+
+def volumeOf(fileName: str) -> str:
+	"""Storage volume a file lives on\n
+	Drive letter or UNC share on Windows, the nearest mount point elsewhere
+
+	Args:
+		fileName (str): File path
+
+	Returns:
+		str: Volume key, normcased
+	"""
+	drive = path.splitdrive(fileName)[0]
+	if drive:
+		return path.normcase(drive)
+
+	current = path.abspath(fileName)
+	while not path.ismount(current):
+		parent = path.dirname(current)
+		if parent == current:
+			break
+		current = parent
+	return path.normcase(current)
+
+def parseVolumeLimits(text: str) -> dict:
+	# "D:=2, //nas/projects=4" -> {'d:': 2, '//nas/projects': 4}
+	limits = {}
+	for item in text.split(','):
+		if '=' in item:
+			volume, limit = item.rsplit('=', 1)
+			limits[path.normcase(volume.strip())] = max(1, int(limit))
+	return limits
+
+@dataclass
+class ScheduledJob():
+	# Whatever runs the job, a MaxFileZip or ShardedArchiver
+	job: object = None
+	# Estimated bytes to read
+	cost: int = 0
+	volume: str = ''
+	# Position the job was added in, table order
+	order: int = 0
+
+
+class JobScheduler():
+	'''
+	Orders archive jobs by estimated cost, largest first\n
+	At most maxJobs run at once and each storage volume has its own limit.
+	A free slot goes to the largest job on the volume with the fewest
+	readers, so jobs on other drives go ahead of a busy one
+	'''
+
+	def __init__(self, maxJobs: int = 2, jobsPerVolume: int = 2, volumeLimits: Optional[dict] = None, largestFirst: bool = True):
+		self.maxJobs = max(1, maxJobs)
+		self.jobsPerVolume = max(1, jobsPerVolume)
+		self.volumeLimits = volumeLimits or {}
+		self.largestFirst = largestFirst
+		self._lock = threading.Lock()
+		self.pending = []
+		self.running = []
+		self.added = 0
+		# volume -> running jobs
+		self.busy: dict = {}
+
+	@classmethod
+	def fromSettings(cls, settings) -> 'JobScheduler':
+		"""Builds a scheduler from an ini section or any mapping of strings
+
+		Args:
+			settings (Mapping): maxJobs, jobsPerVolume, volumeLimits, largestFirst
+
+		Returns:
+			JobScheduler: configured scheduler
+		"""
+		return cls(int(settings.get('maxJobs', 2)),
+			int(settings.get('jobsPerVolume', 2)),
+			parseVolumeLimits(settings.get('volumeLimits', '')),
+			str(settings.get('largestFirst', 'true')).strip().lower() in ('1', 'true', 'yes', 'on'))
+
+	def volumeLimit(self, volume: str) -> int:
+		return self.volumeLimits.get(volume, self.jobsPerVolume)
+
+	def add(self, job, cost: int, volume: str) -> ScheduledJob:
+		with self._lock:
+			scheduledJob = ScheduledJob(job, cost, volume, self.added)
+			self.added += 1
+			self.pending.append(scheduledJob)
+			if self.largestFirst:
+				# Stable, equal costs keep table order
+				self.pending.sort(key=lambda j: -j.cost)
+			return scheduledJob
+
+	def next(self) -> Optional[ScheduledJob]:
+		"""Takes the next job that may start now and marks it running
+
+		Returns:
+			ScheduledJob: None if all slots are busy or nothing fits
+		"""
+		with self._lock:
+			if len(self.running) >= self.maxJobs:
+				return None
+			# Largest job on the least busy volume, volumes read in parallel
+			best = None
+			for i, scheduledJob in enumerate(self.pending):
+				readers = self.busy.get(scheduledJob.volume, 0)
+				if readers < self.volumeLimit(scheduledJob.volume) and (best is None or readers < best[1]):
+					best = (i, readers)
+					if readers == 0:
+						break
+			if best is None:
+				return None
+
+			scheduledJob = self.pending.pop(best[0])
+			self.running.append(scheduledJob)
+			self.busy[scheduledJob.volume] = self.busy.get(scheduledJob.volume, 0) + 1
+			return scheduledJob
+
+	def done(self, scheduledJob: ScheduledJob):
+		with self._lock:
+			self.running.remove(scheduledJob)
+			self.busy[scheduledJob.volume] -= 1
+
+	def idle(self) -> bool:
+		with self._lock:
+			return not self.pending and not self.running
+
+	def runAll(self, fn: Callable) -> list:
+		"""Runs fn(job) for every pending job on a thread pool in schedule order\n
+		A job that raises does not stop the others, its exception takes the
+		place of its result and the caller decides what to do with it
+
+		Args:
+			fn (Callable): Called with ScheduledJob.job
+
+		Returns:
+			list: fn results in the order the jobs were added, the exception for jobs that raised
+		"""
+		results = {}
+		with ThreadPoolExecutor(max_workers=self.maxJobs) as pool:
+			running = {}
+			while True:
+				scheduledJob = self.next()
+				while scheduledJob is not None:
+					running[pool.submit(fn, scheduledJob.job)] = scheduledJob
+					scheduledJob = self.next()
+				if not running:
+					break
+
+				finished, notDone = wait(running, return_when=FIRST_COMPLETED)
+				for future in finished:
+					scheduledJob = running.pop(future)
+					self.done(scheduledJob)
+					error = future.exception()
+					results[scheduledJob.order] = error if error is not None else future.result()
+		return [results[order] for order in sorted(results)]
@@ -1,14 +1,26 @@
+import io
 import sys
+import time
+import queue
+import threading
 import zipfile
-import codecs
-from dataclasses import dataclass
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 import olefile
 
-from os import path, remove
+from os import path, remove, replace, stat
 from pathlib import PurePath, Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 
-from lib.Threading import Callbacks
+from lib.Callbacks import Callbacks
+from lib.XRefGraph import XRefGraph
+from lib.AssetStat import AssetStatService
+from lib.ParallelZip import ParallelZipWriter
+from lib.ProgressChannel import ProgressChannel
+from lib.TransferStats import TransferMeter
+from lib.Tracer import NULL_TRACER
+from lib.CfbReader import CfbError, CfbReader
 
 
 
@@ -19,13 +31,58 @@ class OleAsset():
 	assetPath: str = ''
 	resolvedPath: str = ''
 
+@dataclass
+class ArchiveResult():
+	zipFile: str = ''
+	scenes: list = field(default_factory=list)
+	errors: list = field(default_factory=list)
+	writtenFiles: int = 0
+	writtenBytes: int = 0
+	compressedBytes: int = 0
+	missingFiles: int = 0
+	reusedFiles: int = 0
+	cycles: list = field(default_factory=list)
+	# Zip files written, more than one when the archive is split into parts
+	parts: list = field(default_factory=list)
+	# Shared assets mode, bytes not written again and the time that took
+	savedBytes: int = 0
+	savedSeconds: float = 0.0
+	# Missing assets found elsewhere by the Relocator and archived
+	relocatedFiles: int = 0
+
 class MaxFileZip():
 
-	def __init__(self, inFileDict: dict, outputZipDir: PurePath, outZipFile: Optional[PurePath]=None, overwrite: bool=False):
+	def __init__(self, inFileDict: dict, outputZipDir: PurePath, outZipFile: Optional[PurePath]=None, overwrite: bool=False, cache=None, statWorkers: int=8, compressionWorkers: int=0, policy=None, blobCache=None, update: bool=False, progressRate: float=30.0, parser=None, tracer=None, relocator=None):
 		self.inFileDict = inFileDict
 		self.outputZipDir = outputZipDir
 		self.outZipFile = outZipFile
 		self.overwrite = overwrite
+		self.cache = cache
+		# Tracer recording the time of each phase, the shared no-op one when profiling is off
+		self.tracer = tracer if tracer is not None else NULL_TRACER
+		self.graph = XRefGraph(self.parseFile, self.tracer)
+		# Looks for missing assets under moved roots, see [Relocation]
+		self.relocator = relocator
+		# Reads the listings a PreScanner left in the cache, never writes its own
+		self.statService = AssetStatService(statWorkers, cache)
+		self.compressionWorkers = compressionWorkers
+		self.policy = policy
+		self.blobCache = blobCache
+		self.update = update
+		self.progressRate = progressRate
+		# ProcessParser shared between jobs, None parses on the calling thread
+		self.parser = parser
+		# Scenes this job asked the parser for ahead of its walk
+		self.prefetched = set()
+		# Set by ShardedArchiver: ClaimSet shared with the other shards,
+		# PartNamer for the zip files and the size limit of a part
+		self.claimedFiles = None
+		self.partNamer = None
+		self.maxPartBytes = 0
+		# Text entries added to the archive, name -> text
+		self.extraEntries: dict = {}
+		# Off for the common archive of shared assets mode, the scene zips report missing files and XRef cycles
+		self.reportMissing = True
 		self.callbacks = Callbacks()
 				
 	def bitToGUID(self, bits):
@@ -34,172 +91,592 @@ class MaxFileZip():
 		first 3 components are little endian and the last
 		two are big endian, 4-2-2-2-6
 		'''
-		def lEndian(bData):
-			return codecs.encode((bData)[::-1], 'hex').decode()
-
-		def bEndian(bData):
-			return bData.hex()
-
 		if (len(bits)>16):
 			bits = bits.lstrip(b'\x00').rstrip(b'\x00')
 		
 		if (len(bits)<16):
 			return None
 		else:
-			return(lEndian(bits[:4])+lEndian(bits[4:6])+lEndian(bits[6:8])+bEndian(bits[8:10])+bEndian(bits[10:16]))
+			return uuid.UUID(bytes_le=bytes(bits[:16])).hex
 
-	def readStreamByByte(self,stream, nBytes: int):
-		"""Reads ole stream by n number of bytes\n
-		Stops reading once it hits \x00\x00
+	def readUTF16String(self, data, offset: int):
+		"""Reads a null terminated UTF16 string from a buffer\n
+		The terminator has to sit on a 2 byte boundary relative to offset
 
 		Args:
-			stream (OleStream): OLE stream to read
-			nBytes (int): Number of bytes at a time
+			data (bytes): Whole stream buffer
+			offset (int): Offset the string starts at
 
-		Yields:
-			str: UTF16 decoded string
+		Returns:
+			tuple: (decoded string, offset after the terminator)
 		"""		
-		while True:
-			c = stream.read(nBytes)
-			if c == b'\x00\x00':
-				break
-			yield (str(c,'utf-16-le','ignore'))
+		end = data.find(b'\x00\x00', offset)
+		while end != -1 and (end - offset) % 2:
+			end = data.find(b'\x00\x00', end + 1)
+		
+		if end == -1:
+			# Truncated stream, take whatever is left
+			end = len(data) - (len(data) - offset) % 2
+			return (str(data[offset:end], 'utf-16-le', 'ignore'), len(data))
+		
+		return (str(data[offset:end], 'utf-16-le', 'ignore'), end + 2)
 
 	def readStream(self, oleStream, hasResolvedPath:bool):
-		"""Reads OLE stream
+		"""Reads OLE stream\n
+		The whole stream is read into memory once and parsed by offset
 
 		Args:
 			oleStream (OleStream): OLE Stream to read
 			hasResolvedPath (bool): If ole file has resolved path
 
 		Yields:
-			list: ole metadata
+			OleAsset: ole metadata
 		"""		
-		bytesRead = 0
-		while True:
+		data = oleStream.read()
+		dataLen = len(data)
+		offset = 0
+		
+		# First 16 bytes should be the asset ID, followed by
+		# 4 bytes padding garbage before each string
+		while offset + 16 <= dataLen:
 			oleAsset = OleAsset()
-
-			# First 16 bytes should be the asset ID
-			buf = oleStream.read(16)
-			if buf == b'':
-				break
+			oleAsset.guid = self.bitToGUID(data[offset:offset + 16])
 			
-			oleAsset.guid = self.bitToGUID(buf)
-			# 4 bytes padding garbage, skip that
-			oleStream.read(4) 
-
-			# Read by 2 bytes (16bit encoding) until null
 			# Asset type
-			buf = ''
-			for b in self.readStreamByByte(oleStream, 2):
-				buf = buf + b	
-			oleAsset.assetType = buf
-
-			#4 bytes padding garbage, skip that
-			oleStream.read(4)
-
-			# Read by 2 bytes (16bit encoding) until null
+			oleAsset.assetType, offset = self.readUTF16String(data, offset + 20)
+			
 			# Asset filename
-			buf=''
-			for b in self.readStreamByByte(oleStream, 2):
-				buf = buf + b	
-			oleAsset.assetPath = buf
+			oleAsset.assetPath, offset = self.readUTF16String(data, offset + 4)
 
-			# Read by 2 bytes (16bit encoding) until null
 			# Asset resolved filename
 			if (hasResolvedPath):
-				# 4 bytes padding garbage, skip that
-				oleStream.read(4)
-				buf = ''
-				for b in self.readStreamByByte(oleStream, 2):
-					buf = buf + b	
-				oleAsset.resolvedPath = buf
+				oleAsset.resolvedPath, offset = self.readUTF16String(data, offset + 4)
 
 			yield oleAsset
 
-	def collectAssetsPathsFromFile(self, file: str, allAssetsPaths: list = []) -> Optional[list]:
-		
-		if olefile.isOleFile(file):
-			with olefile.OleFileIO(file) as ole:
-				oleDirs = ole.listdir()
-				streamName = ''
-				streamData = b''
-				hasResolvedPath = False
-				if ole.exists('FileAssetMetaData2'):
-					streamName = 'FileAssetMetaData2'
-				elif ole.exists('FileAssetMetaData3'):
-					streamName = 'FileAssetMetaData3'
-					hasResolvedPath = True
-				else:
-					return None
-
-				oleStream = ole.openstream(streamName)	
-				
-				for oleAsset in self.readStream(oleStream, hasResolvedPath):
+	def readMetaData(self, file: str) -> Optional[tuple]:
+		"""Reads the FileAssetMetaData stream through the memory mapped CfbReader\n
+		Only the FAT and directory sectors leading to the stream are touched
+
+		Args:
+			file (str): Max file path
+
+		Returns:
+			tuple: (stream data, has resolved path), None if not a valid max file
+		"""
+		with self.tracer.span('ole open', 'parse', file=file):
+			reader = CfbReader(file)
+		
+		with reader:
+			if not reader.isOle():
+				return None
+			
+			with self.tracer.span('stream read', 'parse', file=file) as span:
+				data = reader.read('FileAssetMetaData2')
+				hasResolvedPath = data is None
+				if hasResolvedPath:
+					data = reader.read('FileAssetMetaData3')
+				span.set(bytes=len(data) if data is not None else 0)
+		
+		if data is None:
+			return None
+		return (data, hasResolvedPath)
+
+	def readMetaDataOlefile(self, file: str) -> Optional[tuple]:
+		# olefile reads the whole FAT and directory first
+		with self.tracer.span('ole open', 'parse', file=file, reader='olefile'):
+			if not olefile.isOleFile(file):
+				return None
+			ole = olefile.OleFileIO(file)
+		
+		with ole:
+			hasResolvedPath = False
+			if ole.exists('FileAssetMetaData2'):
+				streamName = 'FileAssetMetaData2'
+			elif ole.exists('FileAssetMetaData3'):
+				streamName = 'FileAssetMetaData3'
+				hasResolvedPath = True
+			else:
+				return None
+
+			with self.tracer.span('stream read', 'parse', file=file, reader='olefile') as span:
+				data = ole.openstream(streamName).read()
+				span.set(bytes=len(data))
+		return (data, hasResolvedPath)
+
+	def readAssetsFromOle(self, file: str) -> Optional[list]:
+		"""Reads the asset table straight from the OLE file
+
+		Args:
+			file (str): Max file path
+
+		Returns:
+			list: List of OleAsset, None if not a valid max file
+		"""		
+		tracer = self.tracer
+		try:
+			metaData = self.readMetaData(file)
+		except CfbError:
+			# Layouts the minimal reader doesn't follow are left to olefile
+			metaData = self.readMetaDataOlefile(file)
+		if metaData is None:
+			return None
+		
+		data, hasResolvedPath = metaData
+		with tracer.span('stream parse', 'parse', file=file, bytes=len(data)) as span:
+			assets = list(self.readStream(io.BytesIO(data), hasResolvedPath))
+			span.set(assets=len(assets))
+		return assets
+
+	def parseFile(self, file: str) -> Optional[list]:
+		"""Asset table of a single max file, XRefs are not followed\n
+		Served from the asset cache when the file hasn't changed,
+		parsed in a worker process when a ProcessParser is set
+
+		Args:
+			file (str): Max file path
+
+		Returns:
+			list: List of OleAsset, None if not a valid max file
+		"""		
+		if self.parser is not None:
+			with self.tracer.span('process parse', 'parse', file=file):
+				return self.parser.parse(file)
+		
+		if self.cache is None:
+			return self.readAssetsFromOle(file)
+		
+		with self.tracer.span('cache lookup', 'parse', file=file):
+			fileStat = stat(file)
+			hit, assets = self.cache.get(file, fileStat)
+		if not hit:
+			assets = self.readAssetsFromOle(file)
+			self.cache.put(file, fileStat, assets)
+		
+		return assets
+
+	def prefetch(self, files):
+		# Scenes start parsing in the worker processes before the walk reaches them
+		if self.parser is not None:
+			files = [file for file in files if file not in self.graph.nodes]
+			self.prefetched.update(files)
+			self.parser.prefetch(files)
+
+	def releasePrefetched(self):
+		# Scenes and XRefs prefetched for this job that its walk didn't take are dropped from the shared parser
+		if self.parser is None:
+			return
+		files, self.prefetched = self.prefetched, set()
+		for scene, assets in list(self.graph.nodes.items()):
+			files.add(scene)
+			files.update(a.resolvedPath or a.assetPath for a in assets or () if a.assetType == 'XRef')
+		self.parser.release(files)
+
+	def collectAssetsFromFile(self, file: str) -> Optional[list]:
+		"""All assets of a max file including the contents of its XRefs\n
+		Scenes are parsed once per MaxFileZip through the XRef graph
+
+		Args:
+			file (str): Max file path
 
-					# Use resolved path instead, if available
-					assetPath = oleAsset.resolvedPath if oleAsset.resolvedPath != '' else oleAsset.assetPath
-					if assetPath not in allAssetsPaths:
-						if oleAsset.assetType == 'XRef':
-							#add the xref path to the assets list anyway, we want it to be picked up in missing files collection
-							#if it doesn't exist
-							allAssetsPaths.append(assetPath)
-							if Path(assetPath).exists():
-								allAssetsPaths = allAssetsPaths + self.collectAssetsPathsFromFile(assetPath, allAssetsPaths)
+		Returns:
+			list: List of OleAsset, None if not a valid max file
+		"""		
+		return self.graph.assets(file)
+
+	def collectAssetsPathsFromFile(self, file: str) -> Optional[list]:
+		
+		with self.tracer.span('resolve', 'xref', file=file) as span:
+			assets = self.collectAssetsFromFile(file)
+			span.set(assets=len(assets) if assets is not None else 0)
+		if assets is None:
+			return None
+		
+		return [XRefGraph.assetPath(oleAsset) for oleAsset in assets]
+
+	def estimateBytes(self) -> int:
+		"""Bytes the job will read, its scenes plus their unique existing assets\n
+		Scenes parsed here stay in the XRef graph and are not parsed again by main
+
+		Returns:
+			int: Total size in bytes
+		"""
+		return self.plan(sampleFiles=0).uniqueBytes
+
+	def plan(self, sampleFiles: int = 32, sampleKB: int = 256) -> 'ArchivePlan':
+		"""Sizes the archive without writing it\n
+		Every row is resolved and stat'ed like main does and missing assets
+		go through the relocator. A sample of the files is read and deflated
+		to estimate the zip size and the time, see PlanSampler. Scenes parsed
+		here stay in the XRef graph and are not parsed again by main
+
+		Args:
+			sampleFiles (int): Files to sample, 0 only sizes the job
+			sampleKB (int): Bytes read from the start of each sampled file
+
+		Returns:
+			ArchivePlan: Sizes and estimates
+		"""
+		from lib.ArchivePlan import ArchivePlan, PlanSampler
+		start = time.perf_counter()
+		plan = ArchivePlan(str(self.outZipFile) if self.outZipFile is not None else '')
+		# row -> {file: None}, the scene itself included
+		rows = {}
+		self.prefetch(self.inFileDict.values())
+		try:
+			for row, inMaxFile in self.inFileDict.items():
+				walk = self.graph.walkAssets(inMaxFile)
+				if walk is None:
+					plan.errors.append(inMaxFile)
+					continue
+				rowFiles = {XRefGraph.assetPath(oleAsset): None for oleAsset in walk}
+				rowFiles.setdefault(inMaxFile, None)
+				rows[row] = rowFiles
+				plan.scenes.append(inMaxFile)
+		finally:
+			self.releasePrefetched()
+		
+		assetPaths = {}
+		for rowFiles in rows.values():
+			assetPaths.update(rowFiles)
+		assetStats = self.statService.statMany(assetPaths)
+		
+		# asset path -> (file read, size), relocated assets are read from where they were found
+		sources = {}
+		for assetPath, assetStat in assetStats.items():
+			if assetStat.exists:
+				sources[assetPath] = (assetPath, assetStat.size)
+				continue
+			relocation = self.relocator.relocate(assetPath) if self.relocator is not None else None
+			if relocation is None:
+				plan.missingFiles += 1
+			else:
+				plan.relocatedFiles += 1
+				sources[assetPath] = (relocation.path, relocation.size)
+		
+		for row, rowFiles in rows.items():
+			found = [sources[assetPath][1] for assetPath in rowFiles if assetPath in sources]
+			plan.files += len(found)
+			plan.rowBytes[row] = sum(found)
+		plan.rawBytes = sum(plan.rowBytes.values())
+		plan.uniqueFiles = len(sources)
+		plan.uniqueBytes = sum(size for sourceFile, size in sources.values())
+		plan.scanSeconds = time.perf_counter() - start
+		
+		outputDir = self.outZipFile.parent if self.outZipFile is not None else self.outputZipDir
+		sampler = PlanSampler(self.policy, self.compressionWorkers, sampleFiles, sampleKB, outputDir=None if outputDir is None else str(outputDir))
+		sampler.estimate(plan, {sourceFile: (size, assetPath.replace(':','',1).replace(r'\\','',1))
+			for assetPath, (sourceFile, size) in sources.items()})
+		return plan
+
+	def owns(self, file: str) -> bool:
+		# Shards share a ClaimSet, the first job to claim a file writes it
+		return self.claimedFiles is None or self.claimedFiles.claim(file, self)
+
+	def enumerateAssets(self, assetQueue: queue.Queue, meter: Optional[TransferMeter], stop: threading.Event):
+		"""Producer of streamAssets, walks every row and queues what it finds\n
+		Each new asset directory is listed on a pool as soon as it is seen
+		and the assets in it are stat'ed there
+
+		Args:
+			assetQueue (queue.Queue): Receives (event, row, item) tuples
+			meter (TransferMeter): Gets the size of each file a row will write
+			stop (threading.Event): Set by the consumer to end the walk early
+		"""
+		listings = {}
+		# Files already counted, the first row that finds a file writes it
+		counted = set()
+
+		tracer = self.tracer
+
+		def listDir(directory: str):
+			with tracer.span('list dir', 'stat', file=directory):
+				return self.statService.listDir(directory)
+
+		def statAsset(assetPath: str, listing):
+			entries = listing.result()
+			with tracer.span('stat', 'stat', file=assetPath) as span:
+				assetStat = self.statService.statEntry(assetPath, entries)
+				span.set(size=assetStat.size)
+			return assetStat
+
+		def countSize(row, statFuture):
+			assetStat = statFuture.result()
+			if assetStat.exists:
+				meter.addTotal(row, assetStat.size)
+
+		def statLater(row, assetPath: str):
+			directory = path.dirname(assetPath)
+			if directory not in listings:
+				listings[directory] = pool.submit(listDir, directory)
+			# Submitted after the listing, so it never waits on a listing that hasn't started
+			statFuture = pool.submit(statAsset, assetPath, listings[directory])
+			if meter is not None and assetPath not in counted:
+				counted.add(assetPath)
+				if self.owns(assetPath):
+					statFuture.add_done_callback(lambda statFuture, row=row: countSize(row, statFuture))
+			return statFuture
+
+		try:
+			self.prefetch(self.inFileDict.values())
+			with ThreadPoolExecutor(max_workers=self.statService.maxWorkers) as pool:
+				for row, inMaxFile in self.inFileDict.items():
+					assetQueue.put(('started', row, None))
+					with tracer.span('walk', 'xref', file=inMaxFile) as span:
+						walk = self.graph.walkAssets(inMaxFile)
+						if walk is None:
+							assetQueue.put(('error', row, None))
+							continue
+						
+						assetCount = 0
+						for oleAsset in walk:
+							if stop.is_set():
+								return
+							assetQueue.put(('asset', row, (oleAsset, statLater(row, XRefGraph.assetPath(oleAsset)))))
+							assetCount += 1
+						span.set(assets=assetCount)
+					
+					if meter is not None and inMaxFile not in counted:
+						counted.add(inMaxFile)
+						if self.owns(inMaxFile):
+							meter.addTotal(row, path.getsize(inMaxFile))
+					assetQueue.put(('scene', row, None))
+		except BaseException as e:
+			assetQueue.put(('failed', None, e))
+		finally:
+			assetQueue.put(('done', None, None))
+
+	def streamAssets(self, meter: Optional[TransferMeter] = None) -> Iterator[tuple]:
+		"""Assets of every row as they are discovered\n
+		Scenes and XRefs are parsed on a producer thread while the caller
+		consumes, events come in row order:\n
+		('started', row, None) before a scene is parsed\n
+		('error', row, None) if it is not a valid max file\n
+		('asset', row, (OleAsset, AssetStat)) for each asset of the closure\n
+		('scene', row, None) once all assets of the scene were yielded
 
-						else:
-							allAssetsPaths.append(assetPath)
+		Args:
+			meter (TransferMeter): Row totals are added to it as sizes become known
 
-			return allAssetsPaths
+		Yields:
+			tuple: (event, row, item)
+		"""
+		assetQueue = queue.Queue()
+		stop = threading.Event()
+		producer = threading.Thread(target=self.enumerateAssets, args=(assetQueue, meter, stop), daemon=True)
+		producer.start()
+		
+		try:
+			while True:
+				event, row, item = assetQueue.get()
+				if event == 'done':
+					break
+				if event == 'failed':
+					raise item
+				if event == 'asset':
+					oleAsset, statFuture = item
+					item = (oleAsset, statFuture.result())
+				yield (event, row, item)
+		finally:
+			stop.set()
+			producer.join()
 
 	def main(self, **kwargs):
 
 		if kwargs:
 			self.callbacks = Callbacks(**kwargs)
 		
+		try:
+			with self.tracer.span('archive', 'job', scenes=len(self.inFileDict)) as span:
+				result = self.archive()
+				span.set(file=result.zipFile, bytes=result.writtenBytes)
+		finally:
+			self.releasePrefetched()
+		return result
+
+	def archive(self) -> ArchiveResult:
+		"""Writes the archive, main with the callbacks already set
+
+		Returns:
+			ArchiveResult: What was written
+		"""
 		zfName = self.outZipFile
 
 		if self.outZipFile == None:
 			# If not a single zip, create zip file name from max file name
-			zipName = PurePath(list(self.inFileDict.values())[0]).name
+			row, inMaxFile = next(iter(self.inFileDict.items()))
+			if len(self.inFileDict) == 1 and self.graph.walkAssets(inMaxFile) is None:
+				# Not a valid max file, no empty zip is left for it
+				self.callbacks.seterror((row,'error'))
+				return ArchiveResult(errors=[inMaxFile])
+			zipName = PurePath(inMaxFile).name
 			zfName = self.outputZipDir.joinpath(zipName + '.zip')
+		if self.partNamer is not None:
+			zfName = self.partNamer.next()
 				
 		mfName = str(zfName) + 'Missing Files.txt'
 		missingFilesCount = 0
 		processedFiles = set()
+		reusedFiles = []
+		relocations = []
+		meter = TransferMeter()
+		result = ArchiveResult(str(zfName))
 		
-		with zipfile.ZipFile(zfName, 'w', zipfile.ZIP_DEFLATED) as archFile, open(mfName, 'w') as missingFilesFile:
-			for row, inMaxFile in self.inFileDict.items():
-				self.callbacks.setstarted((row,'proc'))
-
-				allAssetsPaths = self.collectAssetsPathsFromFile(inMaxFile, [])
-
-				if allAssetsPaths == None:
-					#error message - not a valid max file
-					self.callbacks.seterror((row,'error'))
-					continue
-
-				# Adding files from directory 'files'
-				for count, assetPath in enumerate(allAssetsPaths):
-					if assetPath not in processedFiles:
-						if path.exists(assetPath):
-							archFile.write(assetPath, assetPath.replace(':','',1).replace(r'\\','',1))
+		# In update mode the old archive is kept aside and unchanged entries are copied from it
+		previousZip = None
+		if self.update and self.partNamer is None and path.exists(zfName) and zipfile.is_zipfile(zfName):
+			previousZip = str(zfName) + '.previous'
+			replace(zfName, previousZip)
+
+		def deliverProgress(progress):
+			# Runs on the progress channel's thread, row None is the whole job
+			row = progress[0]
+			if row is None:
+				self.callbacks.stats(meter.overall())
+				return
+			rowStats = meter.stats(row)
+			self.callbacks.callback((row, rowStats.percent))
+			self.callbacks.stats(rowStats)
+
+		def onWritten(entry, row):
+			meter.addDone(row, entry.zinfo.file_size)
+			progressChannel.update(row, True)
+			progressChannel.update(None, True)
+			result.writtenFiles += 1
+			result.writtenBytes += entry.zinfo.file_size
+			result.compressedBytes += entry.zinfo.compress_size
+			if entry.reused:
+				reusedFiles.append(entry.zinfo.filename)
+
+		# Parts after the first one, started whenever the current part is full
+		parts = []
+		def nextPart(full):
+			full.close()
+			parts.append(zipfile.ZipFile(self.partNamer.next(), 'w', zipfile.ZIP_DEFLATED))
+			return parts[-1]
+
+		def finishRow(row):
+			meter.finish(row)
+			progressChannel.update(row, True)
+
+		try:
+			# Progress is measured in bytes, coalesced and delivered at most progressRate times a second
+			with ProgressChannel(deliverProgress, self.progressRate) as progressChannel, \
+				zipfile.ZipFile(zfName, 'w', zipfile.ZIP_DEFLATED) as archFile, open(mfName, 'w') as missingFilesFile, \
+				ParallelZipWriter(archFile, self.compressionWorkers, policy=self.policy, blobCache=self.blobCache, previousZip=previousZip,
+					maxArchiveBytes=self.maxPartBytes, nextArchive=nextPart if self.partNamer is not None and self.maxPartBytes > 0 else None,
+					tracer=self.tracer) as zipWriter:
+				# Assets are written as the scan discovers them, compression of the first
+				# assets overlaps parsing of deeper XRefs and listing of their directories
+				for event, row, item in self.streamAssets(meter):
+					if event == 'started':
+						self.callbacks.setstarted((row,'proc'))
+						meter.start(row)
+					elif event == 'error':
+						#error message - not a valid max file
+						self.callbacks.seterror((row,'error'))
+						result.errors.append(self.inFileDict[row])
+					elif event == 'asset':
+						oleAsset, assetStat = item
+						assetPath = assetStat.path
+						if assetPath not in processedFiles and not self.owns(assetPath):
+							# Written or reported by another shard
 							processedFiles.add(assetPath)
-						else:
-							missingFilesFile.write(assetPath+'\n')
-							processedFiles.add(assetPath)
-							missingFilesCount +=1
-					
-					i = round(((count+1)/len(allAssetsPaths)*100),2)
-					self.callbacks.callback((row,i))
-					
-				archFile.write(inMaxFile, inMaxFile.replace(':','',1))
+						elif assetPath not in processedFiles:
+							if assetStat.exists:
+								zipWriter.write(assetPath, assetPath.replace(':','',1).replace(r'\\','',1), lambda entry, row=row: onWritten(entry, row))
+								processedFiles.add(assetPath)
+							else:
+								relocation = self.relocator.relocate(assetPath) if self.relocator is not None else None
+								if relocation is not None:
+									# Archived under the path the scene expects
+									meter.addTotal(row, relocation.size)
+									zipWriter.write(relocation.path, assetPath.replace(':','',1).replace(r'\\','',1), lambda entry, row=row: onWritten(entry, row))
+									relocations.append(relocation)
+								else:
+									missingFilesFile.write(assetPath+'\n')
+									missingFilesCount +=1
+								processedFiles.add(assetPath)
+					elif event == 'scene':
+						inMaxFile = self.inFileDict[row]
+						result.scenes.append(inMaxFile)
+						
+						# The scene may already be in the archive as another row's XRef
+						if inMaxFile not in processedFiles and self.owns(inMaxFile):
+							zipWriter.write(inMaxFile, inMaxFile.replace(':','',1), lambda entry, row=row: onWritten(entry, row))
+							processedFiles.add(inMaxFile)
+						
+						zipWriter.notify(lambda row=row: finishRow(row))
 				
-			missingFilesFile.close()
-			if missingFilesCount > 0:
-				archFile.write(mfName, 'Missing Files.txt')
+				zipWriter.flush()
+				if self.blobCache is not None:
+					self.callbacks.setlog(f'Copied {zipWriter.cacheHits} entries ({zipWriter.cacheHitBytes/1048576:.1f} MB) from the blob cache')
+					
+				# Circular XRefs were skipped while resolving, note them as missing
+				for cycle in self.graph.cycles if self.reportMissing else ():
+					missingFilesFile.write('Circular XRef: ' + ' -> '.join(cycle) + '\n')
+					self.callbacks.setlog('Circular XRef: ' + ' -> '.join(cycle))
+					missingFilesCount +=1
+
+				missingFilesFile.close()
+				if missingFilesCount > 0 and self.reportMissing:
+					zipWriter.archFile.write(mfName, 'Missing Files.txt')
+				if relocations:
+					zipWriter.archFile.writestr('Relocated Files.txt', self.relocator.report(relocations))
+					self.callbacks.setlog(f'Relocated {len(relocations)} missing files, see Relocated Files.txt')
+				for name, text in self.extraEntries.items():
+					zipWriter.archFile.writestr(name, text)
+
+				if previousZip is not None:
+					self.callbacks.setlog(f'Reused {len(reusedFiles)} of {len(processedFiles)} files from the previous archive')
+					archFile.writestr('Update Report.txt', self.updateReport(zipWriter.previousInfo, archFile, reusedFiles))
+		except:
+			# Put the previous archive back if the update didn't finish
+			if previousZip is not None:
+				replace(previousZip, zfName)
+			raise
+		finally:
+			for part in parts:
+				part.close()
+
+		if previousZip is not None:
+			remove(previousZip)
+
+		if self.policy is not None:
+			self.callbacks.setlog(self.policy.summary())
+		self.callbacks.stats(meter.overall(finished=True))
 		
 		remove(mfName)
 		
 		for row, inMaxFile in self.inFileDict.items():
-			self.callbacks.setfinished((row,'good'))
\ No newline at end of file
+			self.callbacks.setfinished((row,'good'))
+		
+		if self.reportMissing:
+			result.missingFiles = missingFilesCount - len(self.graph.cycles)
+			result.cycles = [list(cycle) for cycle in self.graph.cycles]
+		result.reusedFiles = len(reusedFiles)
+		result.relocatedFiles = len(relocations)
+		result.parts = [str(zfName)] + [part.filename for part in parts]
+		return result
+
+	def updateReport(self, previousInfo: dict, archFile: zipfile.ZipFile, reusedFiles: list) -> str:
+		"""Text report of an archive update
+
+		Args:
+			previousInfo (dict): {name: ZipInfo} of the previous archive
+			archFile (zipfile.ZipFile): New archive
+			reusedFiles (list): Entries copied from the previous archive
+
+		Returns:
+			str: Reused, recompressed and dropped entries
+		"""
+		reports = ('Missing Files.txt', 'Relocated Files.txt', 'Update Report.txt')
+		reused = set(reusedFiles)
+		written = [zinfo.filename for zinfo in archFile.filelist if zinfo.filename not in reports]
+		recompressed = [name for name in written if name not in reused]
+		dropped = [name for name in previousInfo if name not in archFile.NameToInfo and name not in reports]
+		
+		lines = [f'Reused ({len(reusedFiles)}):'] + reusedFiles
+		lines += ['', f'New or changed ({len(recompressed)}):'] + recompressed
+		lines += ['', f'Dropped ({len(dropped)}):'] + dropped
+		return '\n'.join(lines) + '\n'
@@ -0,0 +1,385 @@
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+
+from os import path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from lib.Tracer import NULL_TRACER
+
+CHUNK_SIZE = 1024 * 1024
+# Compressed data above this size is spooled to a temp file instead of memory
+SPOOL_SIZE = 32 * 1024 * 1024
+
+
+@dataclass
+class CompressedEntry():
+	zinfo: zipfile.ZipInfo
+	sourceFile: str = ''
+	# Compressed data, None means the source file is copied as is
+	rawData: Optional[object] = None
+	# Called once the entry has been written, used by the blob cache
+	release: Optional[Callable] = None
+	# Copied unchanged from the previous version of the archive
+	reused: bool = False
+
+	def open(self):
+		if self.rawData is None:
+			return open(self.sourceFile, 'rb')
+		self.rawData.seek(0)
+		return self.rawData
+
+	def close(self):
+		if self.rawData is not None:
+			self.rawData.close()
+		if self.release is not None:
+			self.release()
+			self.release = None
+
+def compressFile(sourceFile: str, arcname: str, compressType: int = zipfile.ZIP_DEFLATED, compressLevel: int = zlib.Z_DEFAULT_COMPRESSION, rawData=None) -> CompressedEntry:
+	"""Compresses a file into a raw zip entry, safe to run on any thread
+
+	Args:
+		sourceFile (str): File to compress
+		arcname (str): Name of the entry in the archive
+		compressType (int): zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED
+		compressLevel (int): zlib compression level
+		rawData (file): File object to deflate into, a spooled temp file by default
+
+	Returns:
+		CompressedEntry: ZipInfo with CRC and sizes filled in plus the entry data
+	"""
+	zinfo = zipfile.ZipInfo.from_file(sourceFile, arcname)
+	zinfo.compress_type = compressType
+	entry = CompressedEntry(zinfo, sourceFile)
+
+	crc = 0
+	fileSize = 0
+	compressor = None
+	if compressType == zipfile.ZIP_DEFLATED:
+		compressor = zlib.compressobj(compressLevel, zlib.DEFLATED, -15)
+		entry.rawData = rawData if rawData is not None else tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+
+	with open(sourceFile, 'rb') as f:
+		while True:
+			chunk = f.read(CHUNK_SIZE)
+			if not chunk:
+				break
+			crc = zlib.crc32(chunk, crc)
+			fileSize += len(chunk)
+			if compressor:
+				entry.rawData.write(compressor.compress(chunk))
+
+	if compressor:
+		entry.rawData.write(compressor.flush())
+		zinfo.compress_size = entry.rawData.tell()
+	else:
+		zinfo.compress_size = fileSize
+
+	zinfo.file_size = fileSize
+	zinfo.CRC = crc
+	return entry
+
+class RawSlice():
+	'''
+	Read only view of a byte range in a file,
+	used to copy compressed data out of an existing archive
+	'''
+
+	def __init__(self, fileName: str, offset: int, length: int):
+		self.fp = open(fileName, 'rb')
+		self.offset = offset
+		self.length = length
+		self.seek(0)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		self.close()
+
+	def seek(self, pos: int):
+		self.fp.seek(self.offset + pos)
+		self.remaining = self.length - pos
+
+	def read(self, n: int = -1) -> bytes:
+		if n < 0 or n > self.remaining:
+			n = self.remaining
+		data = self.fp.read(n)
+		self.remaining -= len(data)
+		return data
+
+	def close(self):
+		self.fp.close()
+
+def rawEntryFromZip(zipName: str, zinfo: zipfile.ZipInfo, arcname: Optional[str] = None) -> CompressedEntry:
+	"""Entry that copies compressed data out of an existing archive as is
+
+	Args:
+		zipName (str): Archive to copy from
+		zinfo (zipfile.ZipInfo): Entry in that archive, from its central directory
+		arcname (str): Name in the new archive, defaults to the current name
+
+	Returns:
+		CompressedEntry: Entry reading the raw compressed bytes
+	"""
+	if zinfo.flag_bits & 0x1:
+		raise ValueError(f'Encrypted entry {zinfo.filename} can not be copied')
+
+	# The local header can carry a different extra field than the central directory
+	with open(zipName, 'rb') as f:
+		f.seek(zinfo.header_offset)
+		header = f.read(zipfile.sizeFileHeader)
+	if len(header) != zipfile.sizeFileHeader or header[0:4] != zipfile.stringFileHeader:
+		raise zipfile.BadZipFile(f'Bad local header for {zinfo.filename}')
+	nameLength, extraLength = struct.unpack('<HH', header[26:30])
+	dataOffset = zinfo.header_offset + zipfile.sizeFileHeader + nameLength + extraLength
+
+	newInfo = zipfile.ZipInfo(entryName(arcname) if arcname else zinfo.filename, zinfo.date_time)
+	newInfo.compress_type = zinfo.compress_type
+	newInfo.CRC = zinfo.CRC
+	newInfo.compress_size = zinfo.compress_size
+	newInfo.file_size = zinfo.file_size
+	newInfo.external_attr = zinfo.external_attr
+	newInfo.create_system = zinfo.create_system
+	newInfo.comment = zinfo.comment
+
+	entry = CompressedEntry(newInfo)
+	entry.rawData = RawSlice(zipName, dataOffset, zinfo.compress_size)
+	return entry
+
+def entryName(arcname: str) -> str:
+	# Name as ZipInfo.from_file stores it, without drive or leading slash
+	name = path.normpath(path.splitdrive(arcname)[1]).lstrip(os.sep + (os.altsep or ''))
+	if name in ('', '.'):
+		raise ValueError(f'Archive name {arcname!r} names no file')
+	return zipfile.ZipInfo(name).filename
+
+def dosDateTime(mtime: float) -> tuple:
+	# Timestamp as it reads back from a zip header, two second resolution
+	t = time.localtime(mtime)
+	return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec - t.tm_sec % 2)
+
+def fileCRC(sourceFile: str) -> int:
+	crc = 0
+	with open(sourceFile, 'rb') as f:
+		while True:
+			chunk = f.read(CHUNK_SIZE)
+			if not chunk:
+				break
+			crc = zlib.crc32(chunk, crc)
+	return crc
+
+def writeRawEntry(archFile: zipfile.ZipFile, zinfo: zipfile.ZipInfo, rawData):
+	"""Writes already compressed data into an open ZipFile\n
+	zinfo must carry the CRC, sizes and compression type of the data,
+	Zip64 extras are added by ZipInfo.FileHeader and ZipFile.close
+
+	Args:
+		archFile (zipfile.ZipFile): Archive opened for writing
+		zinfo (zipfile.ZipInfo): Entry header
+		rawData (file): Readable file object with the compressed data
+	"""
+	with archFile._lock:
+		if archFile._seekable:
+			archFile.fp.seek(archFile.start_dir)
+		zinfo.header_offset = archFile.fp.tell()
+		archFile._writecheck(zinfo)
+		archFile._didModify = True
+
+		archFile.fp.write(zinfo.FileHeader())
+		shutil.copyfileobj(rawData, archFile.fp, CHUNK_SIZE)
+
+		archFile.filelist.append(zinfo)
+		archFile.NameToInfo[zinfo.filename] = zinfo
+		archFile.start_dir = archFile.fp.tell()
+
+class ParallelZipWriter():
+	'''
+	Compresses entries on a thread pool and writes them into
+	a single ZipFile in the order they were submitted, or into
+	size limited parts when nextArchive is given
+	'''
+
+	def __init__(self, archFile: zipfile.ZipFile, workers: int = 0, compressLevel: int = zlib.Z_DEFAULT_COMPRESSION, policy=None, blobCache=None, previousZip: Optional[str] = None, verifyCrc: bool = True, maxArchiveBytes: int = 0, nextArchive: Optional[Callable] = None, tracer=None):
+		self.archFile = archFile
+		self.tracer = tracer if tracer is not None else NULL_TRACER
+		# Archives are split into parts of at most maxArchiveBytes, nextArchive
+		# gets the full archive and returns the one to continue in
+		self.maxArchiveBytes = maxArchiveBytes
+		self.nextArchive = nextArchive
+		self.centralBytes = 0
+		self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+		self.compressLevel = compressLevel
+		self.compressType = archFile.compression
+		# CompressionPolicy choosing stored or deflated per entry, None uses the archive's compression
+		self.policy = policy
+		# BlobCache with compressed data from earlier archives
+		self.blobCache = blobCache
+		self.cacheHits = 0
+		self.cacheHitBytes = 0
+		self._lock = threading.Lock()
+		# Earlier version of the archive, unchanged entries are copied from it
+		self.previousZip = previousZip
+		self.previousInfo = {}
+		self.verifyCrc = verifyCrc
+		if previousZip is not None:
+			with zipfile.ZipFile(previousZip) as previousArchive:
+				self.previousInfo = {zinfo.filename: zinfo for zinfo in previousArchive.infolist()}
+		self.pool = ThreadPoolExecutor(max_workers=self.workers)
+		# Bounds how much compressed data waits for the writer
+		self.maxPending = self.workers * 2
+		self.pending = deque()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		if excType is None:
+			self.close()
+		else:
+			self.abort()
+
+	def compressEntry(self, sourceFile: str, arcname: str) -> CompressedEntry:
+		if self.blobCache is not None:
+			# Without a policy the cached entry has to match the archive's compression
+			with self.tracer.span('blob cache', 'zip', file=sourceFile):
+				entry = self.blobCache.lookup(sourceFile, arcname, self.compressLevel, None if self.policy else self.compressType)
+			if entry is not None:
+				with self._lock:
+					self.cacheHits += 1
+					self.cacheHitBytes += entry.zinfo.file_size
+				return entry
+
+		compressType = self.compressType
+		if self.policy is not None:
+			compressType = self.policy.choose(sourceFile)
+		
+		start = time.perf_counter()
+		with self.tracer.span('deflate' if compressType == zipfile.ZIP_DEFLATED else 'store', 'zip', file=sourceFile) as span:
+			if self.blobCache is None:
+				entry = compressFile(sourceFile, arcname, compressType, self.compressLevel)
+			else:
+				entry = self.compressToCache(sourceFile, arcname, compressType)
+			span.set(bytes=entry.zinfo.file_size, compressed=entry.zinfo.compress_size)
+		
+		if self.policy is not None:
+			self.policy.record(compressType, entry.zinfo.file_size, time.perf_counter() - start)
+		return entry
+
+	def reuseEntry(self, sourceFile: str, arcname: str, previous: zipfile.ZipInfo) -> CompressedEntry:
+		# Copy the previous entry when the source still matches it, compress otherwise
+		with self.tracer.span('reuse check', 'zip', file=sourceFile):
+			fileStat = os.stat(sourceFile)
+			unchanged = previous.file_size == fileStat.st_size and previous.date_time == dosDateTime(fileStat.st_mtime)
+			if unchanged and self.verifyCrc:
+				unchanged = previous.CRC == fileCRC(sourceFile)
+
+		if not unchanged:
+			return self.compressEntry(sourceFile, arcname)
+
+		entry = rawEntryFromZip(self.previousZip, previous, arcname)
+		entry.sourceFile = sourceFile
+		entry.reused = True
+		return entry
+
+	def compressToCache(self, sourceFile: str, arcname: str, compressType: int) -> CompressedEntry:
+		fileStat = os.stat(sourceFile)
+		blobName = None
+		rawData = None
+		if compressType == zipfile.ZIP_DEFLATED:
+			blobName, rawData = self.blobCache.newBlob()
+		
+		try:
+			entry = compressFile(sourceFile, arcname, compressType, self.compressLevel, rawData)
+		except:
+			if blobName is not None:
+				rawData.close()
+				self.blobCache.discard(blobName)
+			raise
+
+		self.blobCache.store(entry, fileStat, self.compressLevel, blobName)
+		return entry
+
+	def write(self, sourceFile: str, arcname: str, onWritten: Optional[Callable] = None):
+		"""Queues a file for compression, mirrors ZipFile.write
+
+		Args:
+			sourceFile (str): File to add
+			arcname (str): Name of the entry in the archive
+			onWritten (Callable): Called with the CompressedEntry once it is in the archive
+		"""
+		previous = self.previousInfo.get(entryName(arcname)) if self.previousInfo else None
+		if previous is None:
+			future = self.pool.submit(self.compressEntry, sourceFile, arcname)
+		else:
+			future = self.pool.submit(self.reuseEntry, sourceFile, arcname, previous)
+		self.pending.append((future, onWritten))
+		while len(self.pending) > self.maxPending:
+			self.writeNext()
+
+	def notify(self, fn: Callable):
+		# Runs fn once everything queued before it has been written
+		self.pending.append((None, fn))
+		if len(self.pending) == 1:
+			self.writeNext()
+
+	def archiveSize(self, zinfo: zipfile.ZipInfo) -> int:
+		# Size of the archive once zinfo is added and it is closed, Zip64 extras included
+		nameBytes = len(zinfo.filename.encode('utf-8'))
+		localBytes = 30 + nameBytes + 20 + zinfo.compress_size
+		return self.archFile.start_dir + localBytes + self.centralBytes + 46 + nameBytes + 28 + 98
+
+	def writeNext(self):
+		future, onWritten = self.pending.popleft()
+		entry = None
+		if future is not None:
+			# Time the writer spends waiting on compression
+			with self.tracer.span('wait', 'zip'):
+				entry = future.result()
+			try:
+				# An entry larger than the limit still gets a part of its own
+				if self.nextArchive is not None and self.archFile.filelist and self.archiveSize(entry.zinfo) > self.maxArchiveBytes:
+					self.archFile = self.nextArchive(self.archFile)
+					self.centralBytes = 0
+				with self.tracer.span('write', 'zip', file=entry.zinfo.filename, bytes=entry.zinfo.compress_size):
+					with entry.open() as rawData:
+						writeRawEntry(self.archFile, entry.zinfo, rawData)
+				self.centralBytes += 46 + len(entry.zinfo.filename.encode('utf-8')) + 28
+			finally:
+				entry.close()
+
+		if onWritten is None:
+			return
+		if entry is None:
+			onWritten()
+		else:
+			onWritten(entry)
+
+	def flush(self):
+		while self.pending:
+			self.writeNext()
+
+	def close(self):
+		try:
+			self.flush()
+		finally:
+			self.pool.shutdown()
+
+	def abort(self):
+		for future, onWritten in self.pending:
+			if future is not None:
+				future.cancel()
+		self.pool.shutdown()
+		for future, onWritten in self.pending:
+			if future is not None and not future.cancelled() and future.exception() is None:
+				future.result().close()
+		self.pending.clear()
@@ -0,0 +1,153 @@
+import multiprocessing
+import threading
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from os import path, stat
+from typing import Iterable, Optional
+
+from lib.MaxZipFile import MaxFileZip, OleAsset
+
+# Reader of each worker process, made on the first scene it parses
+_reader = None
+
+
+def readRecords(file: str) -> Optional[tuple]:
+	"""Asset table of a scene as plain tuples, runs in a worker process\n
+	Tuples pickle much smaller and faster than OleAsset instances
+
+	Args:
+		file (str): Max file path
+
+	Returns:
+		tuple: (guid, asset type, asset path, resolved path) per asset, None if not a valid max file
+	"""
+	global _reader
+	if _reader is None:
+		_reader = MaxFileZip({}, None)
+
+	assets = _reader.readAssetsFromOle(file)
+	if assets is None:
+		return None
+	return toRecords(assets)
+
+def toRecords(assets: list) -> tuple:
+	return tuple((a.guid, a.assetType, a.assetPath, a.resolvedPath) for a in assets)
+
+def toAssets(records: Optional[tuple]) -> Optional[list]:
+	if records is None:
+		return None
+	return [OleAsset(*record) for record in records]
+
+
+class ProcessParser():
+	'''
+	Parses scenes in a pool of worker processes instead of GIL bound threads\n
+	Scenes are submitted ahead with prefetch, parse waits for one of them and
+	queues the XRefs it references. One parser is shared by all MaxFileZip jobs,
+	results are handed out once since every job keeps its own XRef graph
+	'''
+
+	def __init__(self, maxWorkers: int = 0, cache=None):
+		# 0 uses all cores
+		self.maxWorkers = maxWorkers if maxWorkers > 0 else (multiprocessing.cpu_count() or 1)
+		self.cache = cache
+		self._lock = threading.Lock()
+		self._pool = None
+		# file -> (Future of records, stat taken before parsing, parsed by a worker)
+		self.pending: dict = {}
+		self.parsedFiles = 0
+		self.cachedFiles = 0
+
+	def pool(self) -> ProcessPoolExecutor:
+		# Called with the lock held, workers start on first use
+		if self._pool is None:
+			self._pool = ProcessPoolExecutor(max_workers=self.maxWorkers)
+		return self._pool
+
+	def submit(self, file: str) -> tuple:
+		# Returns the pending entry of the file
+		with self._lock:
+			if file in self.pending:
+				return self.pending[file]
+
+		fileStat = stat(file)
+		future = None
+		if self.cache is not None:
+			hit, assets = self.cache.get(file, fileStat)
+			if hit:
+				future = Future()
+				future.set_result(None if assets is None else toRecords(assets))
+
+		with self._lock:
+			if file not in self.pending:
+				parsed = future is None
+				if parsed:
+					future = self.pool().submit(readRecords, file)
+					self.parsedFiles += 1
+				else:
+					self.cachedFiles += 1
+				self.pending[file] = (future, fileStat, parsed)
+			return self.pending[file]
+
+	def prefetch(self, files: Iterable[str]):
+		"""Starts parsing scenes before they are needed
+
+		Args:
+			files (Iterable[str]): Max file paths, missing files are skipped
+		"""
+		for file in files:
+			if path.isfile(file):
+				self.submit(file)
+
+	def parse(self, file: str) -> Optional[list]:
+		"""Asset table of a single max file, XRefs are not followed\n
+		Same contract as MaxFileZip.parseFile
+
+		Args:
+			file (str): Max file path
+
+		Returns:
+			list: List of OleAsset, None if not a valid max file
+		"""
+		future, fileStat, parsed = self.submit(file)
+
+		current = stat(file)
+		if (current.st_size, current.st_mtime_ns) != (fileStat.st_size, fileStat.st_mtime_ns):
+			# Re-saved since it was prefetched
+			with self._lock:
+				self.pending.pop(file, None)
+			return self.parse(file)
+
+		try:
+			records = future.result()
+		finally:
+			# A failed parse is not handed out again, the next call parses the file anew
+			with self._lock:
+				if self.pending.get(file, (None,))[0] is future:
+					del self.pending[file]
+		if parsed and self.cache is not None:
+			self.cache.put(file, fileStat, toAssets(records))
+
+		# The walk reaches XRef scenes next, have them parsed meanwhile
+		if records is not None:
+			self.prefetch(record[3] or record[2] for record in records if record[1] == 'XRef')
+		return toAssets(records)
+
+	def release(self, files: Iterable[str]):
+		"""Drops prefetched scenes a job ended without parsing
+
+		Args:
+			files (Iterable[str]): Max file paths the job prefetched or may have
+		"""
+		with self._lock:
+			for file in files:
+				entry = self.pending.pop(file, None)
+				if entry is not None:
+					entry[0].cancel()
+
+	def close(self):
+		with self._lock:
+			pool, self._pool = self._pool, None
+			self.pending.clear()
+		if pool is not None:
+			pool.shutdown(wait=True, cancel_futures=True)
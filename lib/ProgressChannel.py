@@ -0,0 +1,91 @@
+import threading
+import time
+
+from typing import Callable, Optional
+
+
+class ProgressChannel():
+	'''
+	Coalesces progress updates per row and delivers them at a bounded rate\n
+	update() only stores the latest value of a row, a delivery thread
+	hands the newest values to the target at most maxRate times a second.
+	No Qt calls are made on the caller's thread
+	'''
+
+	def __init__(self, deliver: Callable[[tuple], None], maxRate: float = 30.0):
+		self.deliver = deliver
+		self.interval = 1.0 / maxRate if maxRate > 0 else 0.0
+		# row -> latest value not yet delivered
+		self._pending: dict = {}
+		self._lock = threading.Lock()
+		self._wake = threading.Event()
+		self._closed = False
+		self._thread: Optional[threading.Thread] = None
+		self.updates = 0
+		self.delivered = 0
+		self.batches = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		self.close()
+
+	def update(self, row, value):
+		"""Sets the progress of a row, cheap enough to call per asset
+
+		Args:
+			row: Row key, delivered as the first item of the tuple
+			value: Progress value, only the latest per row is kept
+		"""
+		with self._lock:
+			wasIdle = not self._pending
+			self._pending[row] = value
+			self.updates += 1
+			if self._thread is None:
+				self._thread = threading.Thread(target=self.run, daemon=True)
+				self._thread.start()
+		if wasIdle:
+			self._wake.set()
+
+	def run(self):
+		while True:
+			self._wake.wait()
+			self._wake.clear()
+			with self._lock:
+				batch, self._pending = self._pending, {}
+				closed = self._closed
+
+			self.deliverBatch(batch)
+			if closed:
+				return
+			time.sleep(self.interval)
+
+	def deliverBatch(self, batch: dict):
+		if not batch:
+			return
+		for row, value in batch.items():
+			try:
+				self.deliver((row, value))
+			except Exception as e:
+				print(e)
+		self.delivered += len(batch)
+		self.batches += 1
+
+	def flush(self):
+		# Delivers whatever is pending on the caller's thread
+		with self._lock:
+			batch, self._pending = self._pending, {}
+		self.deliverBatch(batch)
+
+	def close(self):
+		"""Delivers the last values and stops the delivery thread\n
+		Nothing sent after close overtakes the final progress values
+		"""
+		with self._lock:
+			self._closed = True
+			thread = self._thread
+		if thread is not None:
+			self._wake.set()
+			thread.join()
+		self.flush()
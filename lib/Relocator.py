@@ -0,0 +1,270 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from os import path
+from typing import Optional
+
+
+def pathParts(assetPath: str) -> list:
+	# Lower case components, asset paths may use either separator whatever the OS
+	return [part for part in re.split(r'[\\/]+', assetPath.lower()) if part]
+
+def parseRoots(text: str) -> list:
+	# "P:\Projects; //nas/library" -> ['P:\Projects', '//nas/library']
+	return [root.strip() for root in re.split(r'[;\n]', text) if root.strip()]
+
+def parseMaps(text: str) -> list:
+	# "D:\Projects=//nas/projects; E:=F:" -> [('D:\Projects', '//nas/projects'), ('E:', 'F:')]
+	maps = []
+	for item in re.split(r'[;\n]', text):
+		if '=' in item:
+			old, new = item.split('=', 1)
+			maps.append((old.strip(), new.strip()))
+	return maps
+
+
+@dataclass
+class Relocation():
+	# Path the scene references
+	original: str = ''
+	# Existing file used instead
+	path: str = ''
+	# Trailing path components both paths share, the file name included
+	matched: int = 0
+	# Files with the same name found under the search roots
+	candidates: int = 0
+	# 'map' for a prefix mapping, 'index' for a search root match
+	rule: str = ''
+	size: int = 0
+
+
+class AssetIndex():
+	'''
+	File name -> paths of every file under a set of search roots\n
+	Directories are listed in parallel with os.scandir. With a cache
+	file the listings are kept in sqlite with the mtime of their
+	directory, a refresh lists again only directories that changed
+	'''
+
+	def __init__(self, roots: list, maxWorkers: int = 8, cacheFile: str = ''):
+		self.roots = roots
+		self.maxWorkers = maxWorkers
+		self.cacheFile = cacheFile
+		# lower case file name -> [(path, root index)]
+		self.files: dict = {}
+		self.listedDirs = 0
+		self.cachedDirs = 0
+
+	def scanDir(self, directory: str, cached: Optional[tuple]) -> tuple:
+		"""Files and subdirectories of one directory
+
+		Args:
+			directory (str): Directory to list
+			cached (tuple): (mtime_ns, files, subdirs) from the cache
+
+		Returns:
+			tuple: (mtime_ns, files, subdirs, listed), None if it can't be read
+		"""
+		try:
+			mtime = os.stat(directory).st_mtime_ns
+			if cached is not None and cached[0] == mtime:
+				return (mtime, cached[1], cached[2], False)
+
+			files = []
+			subdirs = []
+			with os.scandir(directory) as it:
+				for entry in it:
+					# Links to directories are not followed, they could loop
+					if entry.is_dir(follow_symlinks=False):
+						subdirs.append(entry.name)
+					elif entry.is_file():
+						files.append(entry.name)
+			return (mtime, files, subdirs, True)
+		except OSError:
+			return None
+
+	def loadCache(self) -> dict:
+		if self.cacheFile == '':
+			return {}
+		with sqlite3.connect(self.cacheFile, timeout=30) as db:
+			db.execute('''CREATE TABLE IF NOT EXISTS dirs (
+				path TEXT PRIMARY KEY,
+				mtime INTEGER NOT NULL,
+				files TEXT NOT NULL,
+				subdirs TEXT NOT NULL)''')
+			rows = db.execute('SELECT path, mtime, files, subdirs FROM dirs').fetchall()
+		return {row[0]: (row[1], json.loads(row[2]), json.loads(row[3])) for row in rows}
+
+	def saveCache(self, changed: dict, removed: list):
+		if self.cacheFile == '':
+			return
+		with sqlite3.connect(self.cacheFile, timeout=30) as db:
+			db.executemany('DELETE FROM dirs WHERE path = ?', [(directory,) for directory in removed])
+			db.executemany('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)',
+				[(directory, listing[0], json.dumps(listing[1]), json.dumps(listing[2])) for directory, listing in changed.items()])
+
+	def build(self):
+		# Breadth first over all roots, each finished listing queues its subdirectories
+		cache = self.loadCache()
+		files = {}
+		changed = {}
+		visited = set()
+		self.listedDirs = 0
+		self.cachedDirs = 0
+		with ThreadPoolExecutor(max_workers=self.maxWorkers) as pool:
+			pending = {}
+			for rootIndex, root in enumerate(self.roots):
+				pending[pool.submit(self.scanDir, root, cache.get(root))] = (root, rootIndex)
+			while pending:
+				done, _ = wait(pending, return_when=FIRST_COMPLETED)
+				for future in done:
+					directory, rootIndex = pending.pop(future)
+					listing = future.result()
+					if listing is None or directory in visited:
+						continue
+					visited.add(directory)
+					mtime, names, subdirs, listed = listing
+					if listed:
+						self.listedDirs += 1
+						changed[directory] = (mtime, names, subdirs)
+					else:
+						self.cachedDirs += 1
+					for name in names:
+						files.setdefault(name.lower(), []).append((path.join(directory, name), rootIndex))
+					for name in subdirs:
+						subdir = path.join(directory, name)
+						pending[pool.submit(self.scanDir, subdir, cache.get(subdir))] = (subdir, rootIndex)
+
+		# Directories under the roots that are gone, or roots no longer searched
+		self.saveCache(changed, [directory for directory in cache if directory not in visited])
+		self.files = files
+
+	def lookup(self, name: str) -> list:
+		return self.files.get(name.lower(), [])
+
+	def fileCount(self) -> int:
+		return sum(len(paths) for paths in self.files.values())
+
+
+class Relocator():
+	'''
+	Finds missing assets under a moved project root or another drive\n
+	Prefix mappings are tried first, then the file name is looked up in
+	an AssetIndex of the search roots. Candidates are ranked by the
+	number of trailing path components they share with the missing path,
+	then by the order of their search root, then by the shortest path.
+	The index is built on the first missing file, runs without missing
+	files never list the roots
+	'''
+
+	def __init__(self, roots: list = None, maps: list = None, minMatch: int = 1, maxWorkers: int = 8, cacheFile: str = ''):
+		self.maps = [(pathParts(old), new) for old, new in maps or []]
+		# Trailing components a candidate has to share, 2 also requires the parent folder
+		self.minMatch = max(1, minMatch)
+		self.index = AssetIndex(roots or [], maxWorkers, cacheFile)
+		self._lock = threading.Lock()
+		self.built = False
+
+	@classmethod
+	def fromSettings(cls, settings, cacheFile: str = '') -> Optional['Relocator']:
+		"""Builds a relocator from an ini section or any mapping of strings
+
+		Args:
+			settings (Mapping): roots, maps, minMatch, workers
+			cacheFile (str): sqlite file for the index, '' keeps it in memory
+
+		Returns:
+			Relocator: None when neither roots nor maps are set
+		"""
+		roots = parseRoots(settings.get('roots', ''))
+		maps = parseMaps(settings.get('maps', ''))
+		if not roots and not maps:
+			return None
+		return cls(roots, maps, int(settings.get('minMatch', 1)), int(settings.get('workers', 8)), cacheFile)
+
+	def ensureIndex(self):
+		with self._lock:
+			if not self.built:
+				self.index.build()
+				self.built = True
+
+	def mapped(self, assetPath: str) -> Optional[str]:
+		parts = pathParts(assetPath)
+		for oldParts, new in self.maps:
+			if parts[:len(oldParts)] == oldParts and len(parts) > len(oldParts):
+				# Keep the original case of the remaining components
+				rest = [part for part in re.split(r'[\\/]+', assetPath) if part][len(oldParts):]
+				# Joined by hand, path.join('F:', 'maps') would be drive relative on Windows
+				candidate = new.rstrip('\\/') + os.sep + os.sep.join(rest)
+				if path.isfile(candidate):
+					return candidate
+		return None
+
+	def rank(self, assetPath: str, candidates: list) -> tuple:
+		"""Best candidate for a missing asset
+
+		Args:
+			assetPath (str): Path the scene references
+			candidates (list): (path, root index) of files with the same name
+
+		Returns:
+			tuple: (trailing components matched, path)
+		"""
+		parts = pathParts(assetPath)[::-1]
+
+		def key(candidate):
+			candidatePath, rootIndex = candidate
+			candidateParts = pathParts(candidatePath)[::-1]
+			matched = 0
+			while matched < min(len(parts), len(candidateParts)) and parts[matched] == candidateParts[matched]:
+				matched += 1
+			return (-matched, rootIndex, len(candidateParts), candidatePath)
+
+		best = min(map(key, candidates))
+		return (-best[0], best[3])
+
+	def relocate(self, assetPath: str) -> Optional[Relocation]:
+		"""Existing file to archive in place of a missing asset
+
+		Args:
+			assetPath (str): Path the scene references
+
+		Returns:
+			Relocation: Where the file was found, None if it wasn't
+		"""
+		candidate = self.mapped(assetPath)
+		if candidate is not None:
+			return Relocation(assetPath, candidate, len(pathParts(assetPath)), 1, 'map', path.getsize(candidate))
+
+		parts = pathParts(assetPath)
+		if not parts or not self.index.roots:
+			return None
+		self.ensureIndex()
+		candidates = self.index.lookup(parts[-1])
+		if not candidates:
+			return None
+
+		matched, candidate = self.rank(assetPath, candidates)
+		if matched < self.minMatch:
+			return None
+		try:
+			size = path.getsize(candidate)
+		except OSError:
+			# Removed since the index was built
+			return None
+		return Relocation(assetPath, candidate, matched, len(candidates), 'index', size)
+
+	@staticmethod
+	def report(relocations: list) -> str:
+		lines = []
+		for relocation in relocations:
+			line = f'{relocation.original} -> {relocation.path}'
+			if relocation.rule == 'index':
+				line += f'  ({relocation.matched} path parts matched, {relocation.candidates} candidates)'
+			lines.append(line)
+		return '\n'.join(lines) + '\n'
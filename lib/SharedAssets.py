@@ -0,0 +1,177 @@
+import json
+import time
+
+from os import path
+from pathlib import PurePath
+from typing import Callable, Optional
+
+from lib.Callbacks import Callbacks
+from lib.MaxZipFile import ArchiveResult, MaxFileZip
+from lib.JobScheduler import JobScheduler, volumeOf
+from lib.ParallelZip import entryName
+
+# Written into every scene zip that leaves files to the common archive
+MANIFEST_NAME = 'Shared Assets.json'
+
+
+def arcName(assetPath: str) -> str:
+	# Entry name MaxFileZip gives an asset
+	return entryName(assetPath.replace(':','',1).replace(r'\\','',1))
+
+
+class SharedClaims():
+	'''
+	Ownership filter for MaxFileZip.claimedFiles, the common archive
+	owns the shared files and each scene zip everything else
+	'''
+
+	def __init__(self, sharedFiles: dict, shared: bool):
+		self.sharedFiles = sharedFiles
+		self.shared = shared
+
+	def claim(self, file: str, owner) -> bool:
+		return (file in self.sharedFiles) == self.shared
+
+
+class SharedAssetsArchiver():
+	'''
+	Per scene mode with files used by several scenes written once\n
+	Every scene is scanned first. Existing assets referenced by two or more
+	scenes go into one common archive, each scene zip keeps its unique
+	files and a manifest of the shared files it needs. The common archive
+	and the scene zips are written as jobs of a JobScheduler
+	'''
+
+	def __init__(self, inFileDict: dict, outputZipDir: PurePath, sharedZipName: str, newMaxFileZip: Callable, scheduler: Optional[JobScheduler] = None):
+		self.inFileDict = inFileDict
+		self.outputZipDir = PurePath(outputZipDir)
+		self.sharedZipFile = self.outputZipDir.joinpath(sharedZipName if sharedZipName.endswith('.zip') else sharedZipName + '.zip')
+		# Builds a configured MaxFileZip from (rows, zip file)
+		self.newMaxFileZip = newMaxFileZip
+		self.scheduler = scheduler or JobScheduler()
+		self.scanner = newMaxFileZip(inFileDict, None)
+		# shared asset -> size
+		self.sharedFiles: dict = {}
+		# row -> shared assets the scene uses, in walk order
+		self.rowShared: dict = {}
+		# row -> bytes of the files only the scene zip holds
+		self.rowBytes: dict = {}
+		# Bytes the shared files would have taken in the scene zips
+		self.savedBytes = 0
+
+	def scan(self):
+		# Asset closure of every scene, scenes are parsed once for all jobs
+		closures = {}
+		self.scanner.prefetch(self.inFileDict.values())
+		for row, inMaxFile in self.inFileDict.items():
+			assetPaths = self.scanner.collectAssetsPathsFromFile(inMaxFile)
+			if assetPaths is not None:
+				closures[row] = assetPaths
+
+		references = {}
+		for assetPaths in closures.values():
+			for assetPath in assetPaths:
+				references[assetPath] = references.get(assetPath, 0) + 1
+
+		assetStats = self.scanner.statService.statMany(references)
+		# Missing files stay with their scenes, so does every scene file
+		scenes = set(self.inFileDict.values())
+		for assetPath, count in references.items():
+			assetStat = assetStats[assetPath]
+			if count > 1 and assetStat.exists and assetPath not in scenes:
+				self.sharedFiles[assetPath] = assetStat.size
+				self.savedBytes += assetStat.size * (count - 1)
+
+		for row, inMaxFile in self.inFileDict.items():
+			assetPaths = closures.get(row, [])
+			self.rowShared[row] = [assetPath for assetPath in assetPaths if assetPath in self.sharedFiles]
+			self.rowBytes[row] = sum(assetStats[assetPath].size for assetPath in assetPaths
+				if assetPath not in self.sharedFiles and assetStats[assetPath].exists)
+
+	def reuseParsed(self, maxZip: MaxFileZip) -> MaxFileZip:
+		# The job's graph starts from the scenes the scan parsed
+		parseFn = maxZip.graph.parseFn
+		nodes = self.scanner.graph.nodes
+		maxZip.graph.parseFn = lambda file: nodes[file] if file in nodes else parseFn(file)
+		return maxZip
+
+	def manifest(self, row) -> str:
+		files = [dict(name=arcName(assetPath), path=assetPath, size=self.sharedFiles[assetPath]) for assetPath in self.rowShared[row]]
+		return json.dumps(dict(archive=self.sharedZipFile.name, files=files), indent='\t')
+
+	def main(self, **kwargs) -> ArchiveResult:
+		"""Scans the scenes, then writes the common archive and the scene zips
+
+		Returns:
+			ArchiveResult: Totals of all archives, zipFile is the common archive
+		"""
+		callbacks = Callbacks(**kwargs)
+		self.scan()
+
+		jobs = {}
+		if self.sharedFiles:
+			sharedZip = self.reuseParsed(self.newMaxFileZip(self.inFileDict, self.sharedZipFile))
+			sharedZip.claimedFiles = SharedClaims(self.sharedFiles, True)
+			sharedZip.reportMissing = False
+			# Rows belong to the scene zips, the common archive only logs
+			jobs[None] = sharedZip
+			self.scheduler.add(None, sum(self.sharedFiles.values()), volumeOf(next(iter(self.sharedFiles))))
+
+		for row, inMaxFile in self.inFileDict.items():
+			sceneZip = self.reuseParsed(self.newMaxFileZip({row: inMaxFile}, None))
+			sceneZip.claimedFiles = SharedClaims(self.sharedFiles, False)
+			if self.rowShared[row]:
+				sceneZip.extraEntries[MANIFEST_NAME] = self.manifest(row)
+			jobs[row] = sceneZip
+			self.scheduler.add(row, self.rowBytes[row], volumeOf(inMaxFile))
+
+		sharedSeconds = []
+		def runJob(row):
+			if row is not None:
+				return jobs[row].main(**kwargs)
+			start = time.monotonic()
+			sharedResult = jobs[None].main(progress_setlog=callbacks.progress_setlog)
+			sharedSeconds.append(time.monotonic() - start)
+			return sharedResult
+
+		# In the order the jobs were added, a failed job gives its exception
+		results = dict(zip(jobs, self.scheduler.runAll(runJob)))
+		if isinstance(results.get(None), Exception):
+			# Without the common archive the scene zips are incomplete
+			raise results[None]
+
+		result = ArchiveResult(str(self.sharedZipFile) if self.sharedFiles else '')
+		cycles = {}
+		for row, jobResult in results.items():
+			if isinstance(jobResult, Exception):
+				# The other scene zips are still written
+				result.errors.append(self.inFileDict[row])
+				callbacks.seterror((row, 'error'))
+				callbacks.setlog(f'{path.basename(self.inFileDict[row])} could not be archived: {jobResult}')
+				continue
+			result.errors += jobResult.errors
+			result.writtenFiles += jobResult.writtenFiles
+			result.writtenBytes += jobResult.writtenBytes
+			result.compressedBytes += jobResult.compressedBytes
+			result.reusedFiles += jobResult.reusedFiles
+			result.relocatedFiles += jobResult.relocatedFiles
+			result.parts += jobResult.parts
+			# The common archive walks every scene too, scenes, missing files and cycles are counted by the scene zips
+			if row is None:
+				continue
+			result.scenes += jobResult.scenes
+			result.missingFiles += jobResult.missingFiles
+			for cycle in jobResult.cycles:
+				cycles[tuple(cycle)] = None
+		result.errors = list(dict.fromkeys(result.errors))
+		result.cycles = [list(cycle) for cycle in cycles]
+
+		if self.sharedFiles:
+			# The common archive's own write rate prices the bytes it saved
+			sharedResult = results[None]
+			rate = sharedResult.writtenBytes / sharedSeconds[0] if sharedSeconds[0] > 0 else 0.0
+			result.savedBytes = self.savedBytes
+			result.savedSeconds = round(self.savedBytes / rate, 1) if rate > 0 else 0.0
+			callbacks.setlog(f'{path.basename(self.sharedZipFile)} holds {len(self.sharedFiles)} files used by several scenes, '
+				f'saved {self.savedBytes/1048576:.1f} MB and about {result.savedSeconds:.1f}s of writing')
+		return result
@@ -4,10 +4,15 @@ from PyQt5.QtWidgets import *
 
 from lib.DarkPalette import QtDarkPalette
 from lib.AppIcons import AppIcons
-from lib.ContextMenu import ContextMenu
 
 APPICONS = AppIcons()
 
+# Columns of the file table
+STATE_COLUMN = 0
+FILE_COLUMN = 1
+PROGRESS_COLUMN = 2
+REMOVE_COLUMN = 3
+
 #####################
 ## DELEGATES
 #####################
@@ -15,14 +20,16 @@ APPICONS = AppIcons()
 class ProgressDelegate(QStyledItemDelegate):
 	def paint(self, painter, option, index):
 		progress = index.data(Qt.DisplayRole)
-		
+
 		opt = QStyleOptionProgressBar()
 		opt.rect = option.rect.adjusted(5,5,-5,-5)
 		opt.minimum = 0
 		opt.maximum = 100
 
-		opt.progress = progress
-		opt.text = "{}%".format(progress)
+		opt.progress = int(progress)
+		# MB/s and ETA of the row while it is archived
+		detail = index.data(Qt.UserRole)
+		opt.text = "{}%  {}".format(progress, detail) if detail else "{}%".format(progress)
 		opt.textAlignment = Qt.AlignCenter
 		opt.textVisible = True
 		QApplication.style().drawControl(QStyle.CE_ProgressBar, opt, painter)
@@ -30,14 +37,14 @@ class ProgressDelegate(QStyledItemDelegate):
 class IconDelegate(QStyledItemDelegate):
 	def __init__(self, Parent=None):
 		super().__init__()
-		
+
 		self.emptyIcon = QIcon(QApplication.style().standardIcon(QStyle.SP_CustomBase))
 		self.goodIcon = APPICONS.qIconFromBase64(APPICONS.tickIconB)
 		self.errorIcon = APPICONS.qIconFromBase64(APPICONS.crossIconB)
 		self.processingIcon = APPICONS.qIconFromBase64(APPICONS.arrowIconB)
 
 		self._iconDict = {'empty': self.emptyIcon,'good': self.goodIcon, 'error': self.errorIcon, 'proc': self.processingIcon}
-	
+
 
 	def paint(self, painter, option, index):
 		d = index.data(Qt.DecorationRole)
@@ -45,110 +52,215 @@ class IconDelegate(QStyledItemDelegate):
 		#option.rect = option.rect.adjusted(5,5,-5,-5)
 		#option.rect.setSize(QSize(15,15))
 		icon.paint(painter, option.rect, Qt.AlignCenter)
-		
-class RemoveButton(QPushButton):		
+
+class RemoveButtonDelegate(QStyledItemDelegate):
+	'''
+	Paints the remove button of a row instead of a widget per row,
+	clicks are caught in editorEvent
+	'''
+	removeClicked = pyqtSignal(int)
+
 	def __init__(self, parent=None):
-		super().__init__(parent=parent)
+		super().__init__(parent)
 		self.trashIcon = APPICONS.qIconFromBase64(APPICONS.trashIconB)
-		self.setIcon(self.trashIcon)
-		self.setIconSize(self.trashIcon.actualSize(QSize(50,50)))
-		self.setFlat(True)
-		self.setMaximumWidth(40)
+		self.iconSize = self.trashIcon.actualSize(QSize(50,50))
+		self.pressedRow = -1
+
+	def paint(self, painter, option, index):
+		opt = QStyleOptionButton()
+		opt.rect = option.rect.adjusted(2,2,-2,-2)
+		opt.icon = self.trashIcon
+		opt.iconSize = self.iconSize
+		opt.features = QStyleOptionButton.Flat
+		opt.state = QStyle.State_Enabled if option.state & QStyle.State_Enabled else QStyle.State_None
+		if option.state & QStyle.State_MouseOver:
+			opt.state |= QStyle.State_MouseOver | QStyle.State_Raised
+		if index.row() == self.pressedRow:
+			opt.state |= QStyle.State_Sunken
+		QApplication.style().drawControl(QStyle.CE_PushButton, opt, painter)
+
+	def editorEvent(self, event, model, option, index):
+		if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+			self.pressedRow = index.row()
+			return True
+		if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+			clicked = self.pressedRow == index.row() and option.rect.contains(event.pos())
+			self.pressedRow = -1
+			if clicked:
+				self.removeClicked.emit(index.row())
+			return True
+		return super().editorEvent(event, model, option, index)
+
+#####################
+## MODEL
+#####################
+
+class FileTableModel(QAbstractTableModel):
+	'''
+	Rows of max files with their state, progress and MB/s + ETA text\n
+	Each column is a plain list, updates signal only the changed cell
+	'''
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.files = []
+		self.states = []
+		self.progress = []
+		self.details = []
+
+	def rowCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self.files)
+
+	def columnCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else 4
+
+	def data(self, index, role=Qt.DisplayRole):
+		row = index.row()
+		column = index.column()
+		if column == STATE_COLUMN:
+			if role == Qt.DecorationRole:
+				return self.states[row]
+		elif column == FILE_COLUMN:
+			if role in (Qt.DisplayRole, Qt.ToolTipRole):
+				return self.files[row]
+		elif column == PROGRESS_COLUMN:
+			if role == Qt.DisplayRole:
+				return self.progress[row]
+			if role == Qt.UserRole:
+				return self.details[row]
+		return None
+
+	def flags(self, index):
+		return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+	def addFiles(self, files):
+		# One insert for the whole batch
+		files = list(files)
+		if not files:
+			return
+		first = len(self.files)
+		self.beginInsertRows(QModelIndex(), first, first + len(files) - 1)
+		self.files.extend(files)
+		self.states.extend(['empty'] * len(files))
+		self.progress.extend([0] * len(files))
+		self.details.extend([None] * len(files))
+		self.endInsertRows()
 
-class FileTable(QTableWidget):
+	def removeFile(self, row):
+		self.beginRemoveRows(QModelIndex(), row, row)
+		fileName = self.files.pop(row)
+		del self.states[row], self.progress[row], self.details[row]
+		self.endRemoveRows()
+		return fileName
+
+	def setCell(self, values, row, column, value, role):
+		if values[row] == value:
+			return
+		values[row] = value
+		index = self.index(row, column)
+		self.dataChanged.emit(index, index, [role])
+
+	def setState(self, row, state):
+		self.setCell(self.states, row, STATE_COLUMN, state, Qt.DecorationRole)
+
+	def setProgress(self, row, value):
+		self.setCell(self.progress, row, PROGRESS_COLUMN, value, Qt.DisplayRole)
+
+	def setDetail(self, row, detail):
+		self.setCell(self.details, row, PROGRESS_COLUMN, detail, Qt.UserRole)
+
+	def reset(self):
+		if not self.files:
+			return
+		count = len(self.files)
+		self.states = ['empty'] * count
+		self.progress = [0] * count
+		self.details = [None] * count
+		self.dataChanged.emit(self.index(0, STATE_COLUMN), self.index(count - 1, PROGRESS_COLUMN))
+
+#####################
+## VIEW
+#####################
+
+class FileTable(QTableView):
 	PALETTE = QtDarkPalette()
 	PALETTE.setColor(QPalette.Highlight, QColor(40, 40, 40))
 	PALETTE.setColor(QPalette.HighlightedText, Qt.white)
-	
-	def __init__(self, rows, columns, Parent=None):
-		super().__init__(rows, columns, Parent)
+
+	def __init__(self, Parent=None):
+		super().__init__(Parent)
 		self.droppedFiles: set = set()
 		self.parent = self.parent()
-		
-		# Context menu
-		self.menu = ContextMenu(self)
-		
+		self.fileModel = FileTableModel(self)
+		self.setModel(self.fileModel)
+
+		# Context menu, created on first right click
+		self.menu = None
+
 		# Delegates
 		self.progDelegate = ProgressDelegate(self)
 		self.iconDelegate = IconDelegate(self)
-		
+		self.removeDelegate = RemoveButtonDelegate(self)
+		self.removeDelegate.removeClicked.connect(self.removeTableItem)
+
 		# Default settings
-		self.setItemDelegateForColumn(2, self.progDelegate)
-		self.setItemDelegateForColumn(0, self.iconDelegate)
-		self.horizontalHeader().setSectionResizeMode(1,QHeaderView.Stretch)
+		self.setItemDelegateForColumn(PROGRESS_COLUMN, self.progDelegate)
+		self.setItemDelegateForColumn(STATE_COLUMN, self.iconDelegate)
+		self.setItemDelegateForColumn(REMOVE_COLUMN, self.removeDelegate)
+		self.horizontalHeader().setSectionResizeMode(FILE_COLUMN,QHeaderView.Stretch)
 		self.horizontalHeader().hide()
 		self.verticalHeader().hide()
-		self.setColumnWidth(0,10)
-		self.setColumnWidth(2,250)
-		self.setColumnWidth(3,40)
+		# Fixed row heights, nothing is measured per row
+		self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+		self.verticalHeader().setDefaultSectionSize(30)
+		self.setColumnWidth(STATE_COLUMN,10)
+		self.setColumnWidth(PROGRESS_COLUMN,250)
+		self.setColumnWidth(REMOVE_COLUMN,40)
 		self.setSelectionBehavior(QAbstractItemView.SelectRows)
 		self.setSelectionMode(QAbstractItemView.SingleSelection)
 		self.setState(QAbstractItemView.NoState)
-		
-		# Tweaked selection style colours
-		fileTablePal = QtDarkPalette()
-		fileTablePal.setColor(QPalette.Highlight, QColor(40, 40, 40))
-		fileTablePal.setColor(QPalette.HighlightedText, Qt.white)
+		self.setMouseTracking(True)
 		self.setPalette(self.PALETTE)
 
-		self.threadpool = QThreadPool().globalInstance()
-		# self.parentPool = self.parent().threadpool
-		# assert(self.threadpool == self.parentPool)
-	
-	@pyqtSlot()
-	def removeTableItem(self):
-		row = self.currentRow()
-		fileName = self.item(row,1).data(0)
-		self.droppedFiles.remove(fileName)
-		self.removeRow(row)
-	
+	def rowCount(self):
+		return self.fileModel.rowCount()
+
+	def fileName(self, row):
+		return self.fileModel.files[row]
+
+	def fileNames(self):
+		return list(self.fileModel.files)
+
+	@pyqtSlot(int)
+	def removeTableItem(self, row):
+		fileName = self.fileModel.removeFile(row)
+		self.droppedFiles.discard(fileName)
+
 	def resetProgressBars(self):
-		for row in range(self.rowCount()):
-			self.item(row,2).setData(Qt.DisplayRole,0)
-			self.item(row,0).setData(Qt.DecorationRole,'empty')
+		self.fileModel.reset()
 
 	def setPBData(self,data):
-		self.item(data[0],2).setData(Qt.DisplayRole, data[1])
+		self.fileModel.setProgress(data[0], data[1])
+
+	def setStatsData(self, stats):
+		self.fileModel.setDetail(stats.row, stats.describe())
 
 	def setIconData(self, data):
-		self.item(data[0],0).setData(Qt.DecorationRole, data[1])
+		self.fileModel.setState(data[0], data[1])
 
 	def setFinishedData(self, data):
-		if data:
-			existingData = self.item(data[0],0).data(Qt.DecorationRole)
-			
-			if(existingData != 'error'):
-				self.item(data[0],0).setData(Qt.DecorationRole,data[1])
-		
-		if (self.threadpool.activeThreadCount()) == 0:
-			self.parent.setEnabledControlls(True)
-
+		# Worker's finished signal carries the job's result, rows send (row, state)
+		if isinstance(data, tuple):
+			if self.fileModel.states[data[0]] != 'error':
+				self.fileModel.setState(data[0], data[1])
 
 	def contextMenuEvent(self, event):
+		if self.menu is None:
+			from lib.ContextMenu import ContextMenu
+			self.menu = ContextMenu(self)
 		self.menu.showMenu(event)
 
 	def addFilesToView(self, files):
-		existingRows = self.rowCount()
-		
-		for r, (file) in enumerate(files):
-			newRow = r + existingRows
-			it_id = QTableWidgetItem()
-			it_id.setData(Qt.DecorationRole, 'empty')
-			it_file = QTableWidgetItem(file)
-			it_progress = QTableWidgetItem()
-			it_progress.setData(Qt.DisplayRole, 0)
-			it_button = QTableWidgetItem()
-			
-			self.insertRow(self.rowCount())
-			
-			for c, item in enumerate((it_id, it_file, it_progress, it_button)):
-				self.setItem(newRow, c, item)
-				# not sure why this is here but it disables
-				# row selection behaviour
-				# if c == 3: 
-				# 	item.setFlags(Qt.NoItemFlags)
-				removeButton = RemoveButton(parent=self)
-				removeButton.clicked.connect(self.removeTableItem)
-				self.setCellWidget(newRow, 3, removeButton)
-		
-		self.droppedFiles.update(files)
+		newFiles = [f for f in files if f not in self.droppedFiles]
+		self.fileModel.addFiles(newFiles)
+		self.droppedFiles.update(newFiles)
@@ -3,6 +3,9 @@ import sys
 
 from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
 
+# Callbacks lives in a Qt free module so the archiving core can run headless
+from lib.Callbacks import Callbacks
+
 
 class WorkerSignals(QObject):
 	started = pyqtSignal(tuple)
@@ -15,6 +18,7 @@ class WorkerSignals(QObject):
 	progressFormat = pyqtSignal(object)
 	progressLabel = pyqtSignal(object)
 	progressLog = pyqtSignal(str)
+	progressStats = pyqtSignal(object)
 	progressNone = pyqtSignal()
 
 class Worker(QRunnable):
@@ -39,6 +43,7 @@ class Worker(QRunnable):
 		self.kwargs['progress_setformat'] = self.signals.progressFormat
 		self.kwargs['progress_setlabel'] = self.signals.progressLabel
 		self.kwargs['progress_setlog'] = self.signals.progressLog
+		self.kwargs['progress_stats'] = self.signals.progressStats
 	
 	@pyqtSlot()
 	def run(self):
@@ -58,115 +63,3 @@ class Worker(QRunnable):
 			self.signals.result.emit(result)  # Return the result of the processing
 		finally:
 			self.signals.finished.emit(result)  # Done
-
-class Callbacks():
-	def __init__(self, **kwargs) -> None:
-		self.progress_callback = None
-		self.progress_setformat = None
-		self.progress_setlabel = None
-		self.progress_setmin = None
-		self.progress_setmax = None
-		self.progress_setlog = None
-		self.progress_setstarted = None
-		self.var = None
-		self.setupVars(**kwargs)
-	
-	def setupVars(self, **kwargs):
-		try:
-			self.progress_callback = kwargs['progress_callback']
-		except:
-			pass
-		
-		try:
-			self.progress_setstarted = kwargs['progress_started']
-		except:
-			pass
-
-		try:
-			self.progress_finished = kwargs['progress_finished']
-		except:
-			pass
-
-		try:
-			self.progress_error = kwargs['progress_error']
-		except:
-			pass
-
-		try:
-			self.progress_setformat = kwargs['progress_setformat']
-		except:
-			pass
-		
-		try:
-			self.progress_setlabel = kwargs['progress_setlabel']
-		except:
-			pass
-		
-		try:
-			self.progress_setmin = kwargs['progress_setmin']
-		except:
-			pass
-		
-		try:
-			self.progress_setmax = kwargs['progress_setmax']
-		except:
-			pass
-		
-		try:
-			self.progress_setlog = kwargs['progress_setlog']
-		except:
-			pass
-	
-	def setmax(self, var):
-		try:
-			self.progress_setmax.emit(var)
-		except:
-			pass
-	
-	def setmin(self, var):
-		try:
-			self.progress_setmin.emit(var)
-		except:
-			pass
-
-	def setlabel(self, var):
-		try:
-			self.progress_setlabel.emit(var)
-		except:
-			pass
-	
-	def setlog(self, var):
-		try:
-			self.progress_setlog.emit(var)
-		except:
-			pass
-
-	def setformat(self, var):
-		try:
-			self.progress_setformat.emit(var)
-		except:
-			pass
-	
-	def setstarted(self, var):
-		try:
-			self.progress_setstarted.emit(var)
-		except:
-			pass
-	
-	def setfinished(self, var):
-		try:
-			self.progress_finished.emit(var)
-		except:
-			pass
-	
-	def seterror(self, var):
-		try:
-			self.progress_error.emit(var)
-		except:
-			pass
-
-	def callback(self, var):
-		try:
-			self.progress_callback.emit(var)
-		except Exception as e: 
-			print(e)
\ No newline at end of file
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+
+from typing import Optional
+
+
+class Span():
+	'''
+	One timed phase, recorded when the with block ends
+	'''
+	__slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+
+	def __init__(self, tracer: 'Tracer', name: str, cat: str, args: dict):
+		self.tracer = tracer
+		self.name = name
+		self.cat = cat
+		self.args = args
+		self.start = 0.0
+
+	def set(self, **args):
+		# bytes in args is summed up per phase by Tracer.summary
+		self.args.update(args)
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		self.tracer.record(self, time.perf_counter())
+		return False
+
+class NullSpan():
+	'''
+	Shared span of a disabled tracer, records nothing
+	'''
+	__slots__ = ()
+
+	def set(self, **args):
+		pass
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, excType, excValue, tb):
+		return False
+
+NULL_SPAN = NullSpan()
+
+
+class NullTracer():
+	'''
+	Tracer used when profiling is off, every span is the same no-op object
+	'''
+	enabled = False
+
+	def span(self, name: str, cat: str = '', **args) -> NullSpan:
+		return NULL_SPAN
+
+NULL_TRACER = NullTracer()
+
+
+class Tracer():
+	'''
+	Per phase timings of archive runs\n
+	Spans are kept as Chrome trace events (chrome://tracing, Perfetto)
+	with the file and byte counts of each phase in their args
+	'''
+	enabled = True
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.origin = time.perf_counter()
+		self.events = []
+		# thread ident -> thread name
+		self.threads: dict = {}
+
+	def span(self, name: str, cat: str = '', **args) -> Span:
+		"""Times a with block
+
+		Args:
+			name (str): Phase, e.g. 'ole open' or 'deflate'
+			cat (str): Group of phases, e.g. 'parse', 'stat', 'zip'
+
+		Returns:
+			Span: Context manager, span.set() adds args such as bytes
+		"""
+		return Span(self, name, cat, args)
+
+	def record(self, span: Span, end: float):
+		thread = threading.current_thread()
+		event = dict(name=span.name, cat=span.cat, ph='X', pid=os.getpid(), tid=thread.ident,
+			ts=round((span.start - self.origin) * 1e6, 1), dur=round((end - span.start) * 1e6, 1), args=span.args)
+		with self._lock:
+			self.events.append(event)
+			self.threads.setdefault(thread.ident, thread.name)
+
+	def summary(self) -> list:
+		"""Totals of each phase, slowest first
+
+		Returns:
+			list: dicts of cat, name, count, seconds, maxSeconds and bytes
+		"""
+		phases = {}
+		with self._lock:
+			events = list(self.events)
+		for event in events:
+			phase = phases.setdefault((event['cat'], event['name']), dict(cat=event['cat'], name=event['name'], count=0, seconds=0.0, maxSeconds=0.0, bytes=0))
+			seconds = event['dur'] / 1e6
+			phase['count'] += 1
+			phase['seconds'] += seconds
+			phase['maxSeconds'] = max(phase['maxSeconds'], seconds)
+			phase['bytes'] += event['args'].get('bytes', 0)
+		return sorted(phases.values(), key=lambda phase: -phase['seconds'])
+
+	def summaryTable(self) -> str:
+		lines = [f'{"phase":28} {"count":>8} {"total s":>9} {"mean ms":>9} {"max ms":>9} {"MB":>9} {"MB/s":>8}']
+		for phase in self.summary():
+			rate = f'{phase["bytes"] / 1048576 / phase["seconds"]:8.1f}' if phase['bytes'] and phase['seconds'] > 0 else f'{"":8}'
+			lines.append(f'{phase["cat"] + " " + phase["name"]:28} {phase["count"]:8d} {phase["seconds"]:9.3f} '
+				f'{phase["seconds"] / phase["count"] * 1000:9.3f} {phase["maxSeconds"] * 1000:9.3f} {phase["bytes"] / 1048576:9.1f} {rate}')
+		return '\n'.join(lines)
+
+	def export(self, fileName: str, summaryFile: Optional[str] = None):
+		"""Writes the Chrome trace event JSON and optionally the summary table
+
+		Args:
+			fileName (str): Trace file, opens in chrome://tracing or ui.perfetto.dev
+			summaryFile (str): Text file for summaryTable
+		"""
+		with self._lock:
+			events = list(self.events)
+			threads = dict(self.threads)
+		pid = os.getpid()
+		metadata = [dict(name='thread_name', ph='M', pid=pid, tid=tid, args=dict(name=name)) for tid, name in threads.items()]
+		with open(fileName, 'w') as f:
+			json.dump(dict(traceEvents=metadata + events, displayTimeUnit='ms'), f)
+		if summaryFile is not None:
+			with open(summaryFile, 'w') as f:
+				f.write(self.summaryTable() + '\n')
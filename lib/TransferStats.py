@@ -0,0 +1,158 @@
+import threading
+import time
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+
+@dataclass
+class TransferStats():
+	# Row the numbers belong to, None for a whole archive job
+	row: object = None
+	doneBytes: int = 0
+	totalBytes: int = 0
+	percent: float = 0.0
+	bytesPerSecond: float = 0.0
+	# Seconds left at the current rate, None while the rate is unknown
+	eta: Optional[float] = None
+	final: bool = False
+
+	def describe(self) -> str:
+		if self.final:
+			return f'{self.doneBytes/1048576:.1f} MB done'
+		rate = f'{self.bytesPerSecond/1048576:.1f} MB/s'
+		if self.eta is None:
+			return rate
+		minutes, seconds = divmod(int(round(self.eta)), 60)
+		hours, minutes = divmod(minutes, 60)
+		left = f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+		return f'{rate}, {left} left'
+
+def combineStats(rowStats: Iterable[TransferStats]) -> TransferStats:
+	"""Totals of several rows, the rate is the sum of the unfinished rows
+
+	Args:
+		rowStats (Iterable[TransferStats]): Latest stats of each row
+
+	Returns:
+		TransferStats: Combined numbers with row None
+	"""
+	combined = TransferStats(final=True)
+	for stats in rowStats:
+		combined.doneBytes += stats.doneBytes
+		combined.totalBytes += stats.totalBytes
+		if not stats.final:
+			combined.final = False
+			combined.bytesPerSecond += stats.bytesPerSecond
+
+	remaining = combined.totalBytes - combined.doneBytes
+	combined.percent = 100.0 if combined.final or combined.totalBytes == 0 else round(combined.doneBytes / combined.totalBytes * 100, 2)
+	if not combined.final and combined.bytesPerSecond > 0:
+		combined.eta = remaining / combined.bytesPerSecond
+	return combined
+
+
+class RateWindow():
+	'''
+	Bytes per second over a sliding time window
+	'''
+
+	def __init__(self, window: float):
+		self.window = window
+		# (time, total bytes done)
+		self.samples = deque()
+		self.started = None
+
+	def start(self, now: float):
+		self.started = now
+
+	def add(self, now: float, doneBytes: int):
+		if self.started is None:
+			self.started = now
+		self.samples.append((now, doneBytes))
+		while len(self.samples) > 2 and now - self.samples[1][0] > self.window:
+			self.samples.popleft()
+
+	def rate(self, now: float, doneBytes: int) -> float:
+		if self.started is None:
+			return 0.0
+		# Until the window has filled the average since the start is steadier
+		since, sinceBytes = self.samples[0] if self.samples and now - self.started > self.window else (self.started, 0)
+		seconds = now - since
+		return (doneBytes - sinceBytes) / seconds if seconds > 0 else 0.0
+
+
+class TransferMeter():
+	'''
+	Byte weighted progress of an archive job\n
+	Row totals grow while scenes are scanned, done bytes are added as
+	entries are written. Rates are measured over a sliding window and
+	the ETA is the remaining bytes at that rate
+	'''
+
+	def __init__(self, window: float = 5.0, clock: Callable[[], float] = time.monotonic):
+		self.window = window
+		self.clock = clock
+		self._lock = threading.Lock()
+		# row -> [total bytes, done bytes, RateWindow, finished]
+		self.rows: dict = {}
+		self.overallRate = RateWindow(window)
+		self.totalBytes = 0
+		self.doneBytes = 0
+
+	def row(self, row) -> list:
+		# Called with the lock held
+		if row not in self.rows:
+			self.rows[row] = [0, 0, RateWindow(self.window), False]
+		return self.rows[row]
+
+	def addTotal(self, row, nbytes: int):
+		# Safe to call from the scanning thread
+		with self._lock:
+			self.row(row)[0] += nbytes
+			self.totalBytes += nbytes
+
+	def addDone(self, row, nbytes: int):
+		now = self.clock()
+		with self._lock:
+			rowMeter = self.row(row)
+			rowMeter[1] += nbytes
+			rowMeter[2].add(now, rowMeter[1])
+			self.doneBytes += nbytes
+			self.overallRate.add(now, self.doneBytes)
+
+	def start(self, row):
+		# Rates count from here, not from the first written entry
+		now = self.clock()
+		with self._lock:
+			self.row(row)[2].start(now)
+			if self.overallRate.started is None:
+				self.overallRate.start(now)
+
+	def finish(self, row):
+		with self._lock:
+			self.row(row)[3] = True
+
+	def makeStats(self, row, totalBytes: int, doneBytes: int, rateWindow: RateWindow, finished: bool) -> TransferStats:
+		stats = TransferStats(row, doneBytes, totalBytes, final=finished)
+		if finished:
+			stats.percent = 100.0
+			return stats
+
+		# The total is still growing while the scene is scanned
+		stats.percent = min(round(doneBytes / totalBytes * 100, 2), 99.0) if totalBytes > 0 else 0.0
+		stats.bytesPerSecond = rateWindow.rate(self.clock(), doneBytes)
+		if stats.bytesPerSecond > 0:
+			stats.eta = max(totalBytes - doneBytes, 0) / stats.bytesPerSecond
+		return stats
+
+	def stats(self, row) -> TransferStats:
+		with self._lock:
+			totalBytes, doneBytes, rateWindow, finished = self.row(row)
+			return self.makeStats(row, totalBytes, doneBytes, rateWindow, finished)
+
+	def overall(self, finished: bool = False) -> TransferStats:
+		with self._lock:
+			finished = finished or (bool(self.rows) and all(rowMeter[3] for rowMeter in self.rows.values()))
+			return self.makeStats(None, self.totalBytes, self.doneBytes, self.overallRate, finished)
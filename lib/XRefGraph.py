@@ -0,0 +1,144 @@
+from os import path
+from typing import Callable, Iterator, Optional
+
+from lib.Tracer import NULL_TRACER
+
+
+class XRefGraph():
+	'''
+	Dependency graph of max scenes and the XRef scenes they reference\n
+	Each scene is parsed once, edges are kept as ordered sets
+	and circular XRefs are recorded instead of followed
+	'''
+
+	def __init__(self, parseFn: Callable[[str], Optional[list]], tracer=None):
+		self.parseFn = parseFn
+		# Times the existence checks of XRefs when profiling
+		self.tracer = tracer if tracer is not None else NULL_TRACER
+		# scene -> list of OleAsset, None if not a valid max file
+		self.nodes: dict = {}
+		# scene -> {xref scene: None}, dict used as an ordered set
+		self.edges: dict = {}
+		# tuples of scenes, first and last scene are the same
+		self.cycles: list = []
+
+	@staticmethod
+	def assetPath(oleAsset) -> str:
+		# Use resolved path instead, if available
+		return oleAsset.resolvedPath if oleAsset.resolvedPath != '' else oleAsset.assetPath
+
+	def exists(self, scene: str) -> bool:
+		with self.tracer.span('exists', 'xref', file=scene):
+			return path.exists(scene)
+
+	def expand(self, scene: str):
+		self.nodes[scene] = self.parseFn(scene)
+		self.edges[scene] = {}
+
+	def resolve(self, root: str):
+		"""Parses root and every scene reachable through XRefs
+
+		Args:
+			root (str): Scene file path
+		"""
+		if root in self.edges:
+			return
+		
+		for oleAsset in (self.walkAssets(root) or ()):
+			pass
+
+	def walkAssets(self, root: str) -> Optional[Iterator]:
+		"""Transitive asset closure of a scene, yielded as it is discovered\n
+		XRef scenes are parsed when the walk reaches them, so the first
+		assets are available before deeper XRefs have been read
+
+		Args:
+			root (str): Scene file path
+
+		Returns:
+			Iterator: OleAsset iterator, None if root is not a valid max file
+		"""
+		fresh = root not in self.edges
+		if fresh:
+			self.expand(root)
+		if self.nodes[root] is None:
+			return None
+		
+		return self.walk(root, fresh)
+
+	def walk(self, root: str, fresh: bool) -> Iterator:
+		# Iterative depth first walk. Assets are unique by path and XRef contents
+		# follow straight after the XRef that references them. Edges and back edges
+		# are recorded only for scenes parsed by this walk, back edges are
+		# reported in cycles and not followed so the graph stays acyclic
+		seen = {}
+		onStack = {root: None}
+		stack = [(root, iter(self.nodes[root]), fresh)]
+
+		while stack:
+			scene, oleAssets, fresh = stack[-1]
+			for oleAsset in oleAssets:
+				assetPath = self.assetPath(oleAsset)
+				isXRef = oleAsset.assetType == 'XRef'
+				# Checked once, the edge and the descent below both need it
+				xrefExists = isXRef and (fresh or assetPath not in self.edges) and self.exists(assetPath)
+				if fresh and xrefExists:
+					if assetPath in onStack:
+						chain = list(onStack)
+						cycle = tuple(chain[chain.index(assetPath):]) + (assetPath,)
+						if cycle not in self.cycles:
+							self.cycles.append(cycle)
+						continue
+					self.edges[scene][assetPath] = None
+
+				if assetPath in seen or assetPath == root:
+					continue
+
+				seen[assetPath] = None
+				yield oleAsset
+
+				if isXRef and (assetPath in self.edges or xrefExists):
+					newScene = assetPath not in self.edges
+					if newScene:
+						self.expand(assetPath)
+					if self.nodes[assetPath] is not None:
+						onStack[assetPath] = None
+						stack.append((assetPath, iter(self.nodes[assetPath]), newScene))
+						break
+			else:
+				stack.pop()
+				del onStack[scene]
+
+	def assets(self, root: str) -> Optional[list]:
+		"""Transitive asset closure of a scene\n
+		Assets are unique by path and ordered as they are found, XRef
+		contents follow straight after the XRef that references them
+
+		Args:
+			root (str): Scene file path
+
+		Returns:
+			list: List of OleAsset, None if root is not a valid max file
+		"""
+		walk = self.walkAssets(root)
+		if walk is None:
+			return None
+		
+		return list(walk)
+
+	def forget(self, scene: str) -> bool:
+		"""Drops the asset table of a scene that no parsed scene references as an XRef\n
+		Long listings keep only the XRef scenes, a later walk parses it again
+
+		Args:
+			scene (str): Scene file path
+
+		Returns:
+			bool: True if the scene was dropped
+		"""
+		if scene not in self.edges or any(scene in xrefs for xrefs in self.edges.values()):
+			return False
+		
+		del self.nodes[scene]
+		del self.edges[scene]
+		return True
@@ -0,0 +1,193 @@
+import json
+import threading
+import zipfile
+
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from pathlib import PurePath
+from typing import Callable
+
+from lib.MaxZipFile import ArchiveResult
+from lib.ParallelZip import rawEntryFromZip, writeRawEntry
+
+# Text reports every shard writes, merged by concatenating them
+REPORTS = ('Missing Files.txt', 'Relocated Files.txt')
+
+
+class PartNamer():
+	'''
+	Hands out part file names of a sharded archive,
+	Project.zip becomes Project.part001.zip, Project.part002.zip...
+	'''
+
+	def __init__(self, outZipFile: PurePath):
+		self.outZipFile = PurePath(outZipFile)
+		self._lock = threading.Lock()
+		self.parts = []
+
+	def next(self) -> PurePath:
+		with self._lock:
+			part = self.outZipFile.with_name(f'{self.outZipFile.stem}.part{len(self.parts) + 1:03d}.zip')
+			self.parts.append(part)
+			return part
+
+class ClaimSet():
+	'''
+	Files shared by the jobs of a sharded archive,
+	the first job to claim a file writes it
+	'''
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		# file -> owning MaxFileZip
+		self.owners: dict = {}
+
+	def claim(self, file: str, owner) -> bool:
+		with self._lock:
+			return self.owners.setdefault(file, owner) is owner
+
+def manifestFileName(outZipFile: PurePath) -> PurePath:
+	outZipFile = PurePath(outZipFile)
+	return outZipFile.with_name(outZipFile.stem + '.manifest.json')
+
+def readManifest(manifestFile: str) -> dict:
+	with open(manifestFile, 'r') as f:
+		return json.load(f)
+
+def mergeShards(partFiles: list, outZipFile: str) -> dict:
+	"""Joins zip parts into one archive without decompressing\n
+	Compressed entries are copied as they are and a new central directory
+	is written, later duplicates of a name are skipped. Missing Files.txt
+	of the parts is concatenated
+
+	Args:
+		partFiles (list): Part archives in order
+		outZipFile (str): Archive to create
+
+	Returns:
+		dict: entries, bytes, duplicates and conflicts (duplicates with a different CRC)
+	"""
+	stats = dict(entries=0, bytes=0, duplicates=0, conflicts=0)
+	reports = {name: [] for name in REPORTS}
+
+	with zipfile.ZipFile(outZipFile, 'w', zipfile.ZIP_DEFLATED) as archFile:
+		for partFile in partFiles:
+			with zipfile.ZipFile(partFile) as part:
+				for zinfo in part.infolist():
+					if zinfo.filename in reports:
+						reports[zinfo.filename].append(part.read(zinfo).decode('utf-8', 'replace'))
+						continue
+
+					existing = archFile.NameToInfo.get(zinfo.filename)
+					if existing is not None:
+						stats['duplicates'] += 1
+						if existing.CRC != zinfo.CRC:
+							stats['conflicts'] += 1
+						continue
+
+					entry = rawEntryFromZip(str(partFile), zinfo)
+					try:
+						with entry.open() as rawData:
+							writeRawEntry(archFile, entry.zinfo, rawData)
+					finally:
+						entry.close()
+					stats['entries'] += 1
+					stats['bytes'] += zinfo.compress_size
+
+		for name, texts in reports.items():
+			if texts:
+				archFile.writestr(name, ''.join(texts))
+
+	return stats
+
+def mergeManifest(manifestFile: str, outZipFile: str) -> dict:
+	# Parts are listed relative to the manifest
+	manifest = readManifest(manifestFile)
+	directory = path.dirname(manifestFile)
+	return mergeShards([path.join(directory, part['file']) for part in manifest['parts']], outZipFile)
+
+
+class ShardedArchiver():
+	'''
+	Single zip mode split into shards written by parallel MaxFileZip jobs\n
+	Scenes are spread over the jobs by size, files shared between jobs are
+	written once through a ClaimSet. With maxPartBytes each job also starts
+	a new part when its current one is full. A manifest lists the parts
+	and mergeShards joins them into one archive
+	'''
+
+	def __init__(self, inFileDict: dict, outZipFile: PurePath, shards: int, maxPartBytes: int, newMaxFileZip: Callable):
+		self.inFileDict = inFileDict
+		self.outZipFile = PurePath(outZipFile)
+		self.shards = max(1, shards)
+		self.maxPartBytes = maxPartBytes
+		# Builds a configured MaxFileZip from (rows, zip file)
+		self.newMaxFileZip = newMaxFileZip
+		self.partNamer = PartNamer(self.outZipFile)
+		self.claims = ClaimSet()
+
+	def groups(self) -> list:
+		# Largest scene first into the lightest shard
+		def sceneSize(row):
+			try:
+				return path.getsize(self.inFileDict[row])
+			except OSError:
+				return 0
+
+		groups = [dict() for _ in range(self.shards)]
+		loads = [0] * self.shards
+		for row in sorted(self.inFileDict, key=sceneSize, reverse=True):
+			shard = loads.index(min(loads))
+			groups[shard][row] = self.inFileDict[row]
+			loads[shard] += sceneSize(row)
+
+		# Keep table order inside a shard
+		return [dict(sorted(group.items())) for group in groups if group]
+
+	def runShard(self, rows: dict, kwargs: dict) -> ArchiveResult:
+		maxZip = self.newMaxFileZip(rows, self.outZipFile)
+		maxZip.claimedFiles = self.claims
+		maxZip.partNamer = self.partNamer
+		maxZip.maxPartBytes = self.maxPartBytes
+		return maxZip.main(**kwargs)
+
+	def main(self, **kwargs) -> ArchiveResult:
+		"""Archives every row into shards and writes the manifest
+
+		Returns:
+			ArchiveResult: Totals of all shards, zipFile is the manifest
+		"""
+		with ThreadPoolExecutor(max_workers=self.shards) as pool:
+			futures = [pool.submit(self.runShard, rows, kwargs) for rows in self.groups()]
+			results = [future.result() for future in futures]
+
+		result = ArchiveResult(str(manifestFileName(self.outZipFile)))
+		cycles = {}
+		for shardResult in results:
+			result.scenes += shardResult.scenes
+			result.errors += shardResult.errors
+			result.writtenFiles += shardResult.writtenFiles
+			result.writtenBytes += shardResult.writtenBytes
+			result.compressedBytes += shardResult.compressedBytes
+			result.missingFiles += shardResult.missingFiles
+			result.relocatedFiles += shardResult.relocatedFiles
+			result.parts += shardResult.parts
+			for cycle in shardResult.cycles:
+				cycles[tuple(cycle)] = None
+		result.cycles = [list(cycle) for cycle in cycles]
+		result.parts = [part for part in map(str, self.partNamer.parts) if part in result.parts]
+
+		self.writeManifest(result)
+		return result
+
+	def writeManifest(self, result: ArchiveResult):
+		parts = []
+		for partFile in result.parts:
+			with zipfile.ZipFile(partFile) as part:
+				entries = len(part.infolist())
+			parts.append(dict(file=PurePath(partFile).name, entries=entries, bytes=path.getsize(partFile)))
+
+		manifest = dict(archive=self.outZipFile.name, parts=parts, scenes=result.scenes, errors=result.errors,
+			writtenFiles=result.writtenFiles, writtenBytes=result.writtenBytes, missingFiles=result.missingFiles, cycles=result.cycles)
+		with open(result.zipFile, 'w') as f:
+			json.dump(manifest, f, indent='\t')